@@ -1,51 +1,84 @@
+import sys
+
+from calculator_engine import ExpressionError, error_message, evaluate, evaluate_file
+
+OPERATORS = {'1': '+', '2': '-', '3': '*', '4': '/'}
+
+
 def menu_calculator():
     print("=== Python Calculator ===")
-    
+
     while True:
         print("\nSelect operation:")
         print("1. Addition (+)")
         print("2. Subtraction (-)")
         print("3. Multiplication (*)")
         print("4. Division (/)")
-        print("5. Exit")
-        
-        choice = input("Enter choice (1-5): ")
-        
-        if choice == '5':
+        print("5. Expression (e.g. 2 * (3 + 4) / 5)")
+        print("6. Exit")
+
+        choice = input("Enter choice (1-6): ")
+
+        if choice == '6':
             print("Goodbye!")
             break
-        
-        if choice not in ['1', '2', '3', '4']:
+
+        if choice == '5':
+            expression = input("Enter expression: ")
+            try:
+                print(f"{expression.strip()} = {evaluate(expression)}")
+            except (ArithmeticError, ExpressionError) as e:
+                print(f"Error: {error_message(e)}")
+            continue
+
+        if choice not in OPERATORS:
             print("Invalid choice")
             continue
-        
+
         try:
             num1 = float(input("Enter first number: "))
             num2 = float(input("Enter second number: "))
-            
-            if choice == '1':
-                result = num1 + num2
-                operator = "+"
-            elif choice == '2':
-                result = num1 - num2
-                operator = "-"
-            elif choice == '3':
-                result = num1 * num2
-                operator = "*"
-            elif choice == '4':
-                if num2 == 0:
-                    print("Error: Cannot divide by zero")
-                    continue
-                result = num1 / num2
-                operator = "/"
-            
+
+            operator = OPERATORS[choice]
+            # Same cached plan for every pair of numbers
+            result = evaluate(f"a {operator} b", a=num1, b=num2)
+
             print(f"{num1} {operator} {num2} = {result}")
-            
+
+        except ZeroDivisionError:
+            print("Error: Cannot divide by zero")
         except ValueError:
             print("Error: Please enter valid numbers")
         except Exception as e:
             print(f"Error: {e}")
 
+
+def run_batch_file(path):
+    '''Print the result of every expression in path ('-' for stdin), one per line
+
+    Returns True if every expression evaluated.
+    '''
+    ok = True
+    for line_number, expression, result, error in evaluate_file(path):
+        if error is None:
+            print(f"{expression} = {result}")
+        else:
+            ok = False
+            print(f"line {line_number}: {expression}: Error: {error}")
+    return ok
+
+
+def main(argv=None):
+    '''Menu calculator, or with --batch FILE evaluate a file of expressions'''
+    import argparse
+    parser = argparse.ArgumentParser(description="Python Calculator")
+    parser.add_argument("--batch", metavar="FILE", help="evaluate one expression per line of FILE ('-' for stdin)")
+    args = parser.parse_args(argv)
+    if args.batch:
+        sys.exit(0 if run_batch_file(args.batch) else 1)
+    menu_calculator()
+
+
 # Run the calculator
 if __name__ == "__main__":
-    menu_calculator() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -13,16 +13,29 @@
 2. Subtraction (-)    → Subtracts second number from first
 3. Multiplication (*) → Multiplies two numbers
 4. Division (/)      → Divides first number by second
-5. Exit              → Closes the calculator
+5. Expression        → Evaluates a full expression, e.g. 2 * (3 + 4) / 5
+6. Exit              → Closes the calculator
 ```
 
 ### **Step-by-Step Instructions:**
 1. **Run the program**
-2. **Type a number 1-5** to choose an operation
+2. **Type a number 1-6** to choose an operation
 3. **Enter first number** (can be decimal or negative)
 4. **Enter second number**
 5. **See the result** in format: `number1 operator number2 = result`
-6. **Repeat** or press `5` to exit
+6. **Repeat** or press `6` to exit
+
+### **Expressions:**
+Option 5 accepts `+ - * / // % **` (or `^` for powers) and parentheses, with the
+usual precedence: `2 + 3 * 4` is 14, `-2 ^ 2` is -4 and `2 ^ 3 ^ 2` is 512.
+
+### **Batch Mode:**
+Evaluate a file with one expression per line (blank lines and `#` comments are skipped):
+```
+python Calculator.py --batch expressions.txt
+```
+Each line prints `expression = result`; a failing line prints its error and the
+rest still run.
 
 ## **✅ Example Session**
 ```
@@ -33,23 +46,27 @@ Select operation:
 2. Subtraction (-)
 3. Multiplication (*)
 4. Division (/)
-5. Exit
-Enter choice (1-5): 1
+5. Expression (e.g. 2 * (3 + 4) / 5)
+6. Exit
+Enter choice (1-6): 1
 Enter first number: 10
 Enter second number: 5
-10 + 5 = 15
+10.0 + 5.0 = 15.0
 ```
 
 ## **⚠️ Error Messages & Solutions**
 
 | Error Message | Cause | Solution |
 |--------------|-------|----------|
-| `"Invalid choice"` | Entered number not 1-5 | Type only 1, 2, 3, 4, or 5 |
+| `"Invalid choice"` | Entered number not 1-6 | Type only 1, 2, 3, 4, 5 or 6 |
 | `"Error: Please enter valid numbers"` | Entered text instead of numbers | Enter numeric values (e.g., 5, 3.14, -2) |
 | `"Error: Cannot divide by zero"` | Tried to divide by 0 | Use any number except 0 as second number |
+| `"Error: Unexpected ')' at position 7"` | Malformed expression | Check the expression at that position |
 
 ## **🔧 Features**
 - ✅ Addition, Subtraction, Multiplication, Division
+- ✅ Full expressions with precedence and parentheses
+- ✅ Batch mode for files of expressions
 - ✅ Handles decimal numbers
 - ✅ Handles negative numbers
 - ✅ Error prevention for division by zero
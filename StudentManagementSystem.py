@@ -1,13 +1,21 @@
 """Student Management System"""
 import json
+import sys
+from contextlib import contextmanager, redirect_stdout
 from datetime import datetime
 from tabulate import tabulate
-import uuid
 import os 
-import csv
+from student_storage import JournalStorage
+from student_index import StudentIndex
+from student_stats import StudentStats, detailed_report
+from student_ids import IdAllocator, STUDENT_ID_PREFIX
+import student_io
 
 class Student:
-    def __init__(self, student_id, name, age, grade, department, email, phone):
+    # No per-instance __dict__; see student_roster.ColumnarRoster for the columnar store
+    __slots__ = ('student_id', 'name', 'age', 'grade', 'department', 'email', 'phone', 'enrollment_date')
+
+    def __init__(self, student_id, name, age, grade, department, email, phone, enrollment_date=None):
         """Initializes a student object 
         
         Args:
@@ -18,6 +26,7 @@ class Student:
             department: student's department
             email: student's email id
             phone: contact number
+            enrollment_date: stored enrollment timestamp, defaults to now
         """
         
         self.student_id = student_id
@@ -27,7 +36,7 @@ class Student:
         self.department = department
         self.email = email
         self.phone = phone
-        self.enrollment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.enrollment_date = enrollment_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
     def to_dict(self):
         '''Convert student object to dictionary'''
@@ -56,48 +65,409 @@ class Student:
         print("=" * 50) 
 
 
+class _BatchAborted(Exception):
+    '''Unwinds an atomic run_batch so its transaction rolls back'''
+
+
 class StudentManagementSystem:
     '''Main class for managing student records'''
     
-    def __init__(self, data_file='students_data.json'):
-        '''Initialize the management system'''
+    def __init__(self, data_file='students_data.json', storage=None, roster='dict', id_prefix=STUDENT_ID_PREFIX):
+        '''Initialize the management system
+        
+        Args:
+            data_file: path of the JSON data file
+            storage: storage backend, defaults to a JournalStorage on data_file
+            roster: 'dict' keeps one Student object per record, 'columnar' packs
+                records into arrays (much smaller for very large rosters), 'lazy'
+                memory-maps the snapshot and builds each Student on first access
+                (fast start for very large rosters)
+            id_prefix: prefix for newly allocated student IDs
+        '''
+        if roster not in ('dict', 'columnar', 'lazy'):
+            raise ValueError(f"Unknown roster type: {roster}")
         self.data_file = data_file
-        self.students = {}
+        self.storage = storage if storage is not None else JournalStorage(data_file)
+        self.roster = roster
+        self.students = self._new_roster()
+        self._index = None
+        self._stats = None
+        self._undo = None  # {student_id: previous record or None} while a transaction is open
         self.load_students()
+        self.ids = self._make_id_allocator(id_prefix)
+        if 'next_student_id' not in self.storage.meta and len(self.students):
+            self._record_id_high_water()
         
     def generate_student_id(self):
         '''Generate unique student ID'''
-        return "STU" + str(uuid.uuid4().hex[:6].upper())
+        with self._locked():
+            return self.ids.allocate()
+
+    def _make_id_allocator(self, prefix):
+        allocator = IdAllocator(prefix, start=self.storage.meta.get('next_student_id', 1),
+                                reserve=lambda ceiling: self.storage.set_meta('next_student_id', ceiling),
+                                exists=lambda student_id: student_id in self.students)
+        return allocator
+
+    def _record_id_high_water(self):
+        '''Data from before the allocator: start past any IDs already in its format.
+        
+        Runs once per data file. The mark is journaled, and kept in the snapshot from
+        the next compaction on, so later opens (lazy ones especially) never scan.
+        '''
+        for student_id in self.students:
+            self.ids.observe(student_id)
+        with self._locked():
+            # Another process may have recorded one meanwhile; refresh() took it in
+            if 'next_student_id' not in self.storage.meta:
+                self.storage.set_meta('next_student_id', self.ids.next_number)
+                self.storage.sync()
     
-    def load_students(self):
-        '''Load student data from JSON file'''
+    def load_students(self, verbose=True):
+        '''Load student data from the snapshot and replay the change journal'''
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as file:
-                    data = json.load(file)
-                    for student_id, student_data in data.items():
-                        if 'department' not in student_data:
-                            student_data['department'] = student_data.get('deparment', 'Unknown')
-                        student = Student(**student_data)
-                        self.students[student.student_id] = student
-                print(f"Loaded {len(self.students)} students from database")
-            else:
+            if os.path.exists(self.data_file) or os.path.exists(self.data_file + '.journal'):
+                if self.roster == 'lazy' and self._open_lazy():
+                    if verbose:
+                        print(f"Opened {len(self.students)} students from database")
+                    return
+                data = self.storage.load()
+                for student_data in data.values():
+                    student = self._student_from_record(student_data)
+                    self.students[student.student_id] = student
+                if verbose:
+                    print(f"Loaded {len(self.students)} students from database")
+            elif verbose:
                 print('No existing database found. Starting fresh...')
         except Exception as e:
             print(f"Error loading data: {e}")
-            self.students = {}
+            self.students = self._new_roster()
+
+    def _open_lazy(self):
+        '''Point self.students at a LazyRoster; False if the storage can't be opened lazily'''
+        if not hasattr(self.storage, 'open_snapshot'):
+            return False
+        with self.storage.locked():
+            return self._open_lazy_locked()
+
+    def _open_lazy_locked(self):
+        snapshot = self.storage.open_snapshot()
+        if snapshot is None:
+            return False
+        from student_roster import LazyRoster
+        pending, deleted = {}, set()
+        self.storage.replay_journal(pending, deleted)
+        self.students = LazyRoster(snapshot, pending, deleted, self._student_from_record)
+        return True
+
+    @staticmethod
+    def _student_from_record(student_data):
+        if 'department' not in student_data:
+            student_data['department'] = student_data.pop('deparment', 'Unknown')
+        return Student(**student_data)
+
+    def refresh(self):
+        '''Pick up changes other processes have made to the data file since we last looked'''
+        changes = self.storage.poll()
+        if changes is None:
+            self._reload()
+        else:
+            for entry in changes:
+                self._apply_entry(entry)
+        self.ids.advance(self.storage.meta.get('next_student_id', 1))
+
+    def _reload(self):
+        # Another process compacted, so start over from its snapshot
+        if hasattr(self.students, 'close'):
+            self.students.close()
+        self.students = self._new_roster()
+        self._index = None
+        self._stats = None
+        self.load_students(verbose=False)
+
+    def _apply_entry(self, entry):
+        if entry['op'] == 'put':
+            student = self._student_from_record(dict(entry['student']))
+            self.students[student.student_id] = student
+            if self._index is not None:
+                self._index.update(student)
+            if self._stats is not None:
+                self._stats.update(student)
+        elif entry['op'] == 'delete' and entry['student_id'] in self.students:
+            del self.students[entry['student_id']]
+            if self._index is not None:
+                self._index.remove(entry['student_id'])
+            if self._stats is not None:
+                self._stats.remove(entry['student_id'])
+
+    @contextmanager
+    def _locked(self):
+        '''Hold the data file lock, caught up with every other process's changes'''
+        with self.storage.locked():
+            self.refresh()
+            yield
+
+    def _new_roster(self):
+        if self.roster == 'columnar':
+            from student_roster import ColumnarRoster
+            return ColumnarRoster()
+        return {}
 
     def save_students(self):
-        '''Save student data to JSON file'''
+        '''Write a full snapshot of every student (compacts the journal)'''
         try:
-            data = {}
-            for sid, student in self.students.items():
-                data[sid] = student.to_dict()
-            with open(self.data_file, 'w') as file:
-                json.dump(data, file, indent=4)
+            with self._locked():
+                if hasattr(self.students, 'records'):
+                    data = self.students.records()
+                else:
+                    data = {sid: student.to_dict() for sid, student in self.students.items()}
+                self.storage.compact(data)
             print('Data saved successfully')
         except Exception as e:
             print(f"Error saving data: {e}")
+
+    def _remember(self, student_id):
+        '''Note a student's state before its first change in the open transaction'''
+        if self._undo is not None and student_id not in self._undo:
+            student = self.students.get(student_id)
+            self._undo[student_id] = student.to_dict() if student is not None else None
+
+    def _save_student(self, student):
+        '''Persist one added or changed student, journal first then memory'''
+        self._remember(student.student_id)
+        self.storage.put(student.to_dict())
+        self.students[student.student_id] = student
+        if self._index is not None:
+            self._index.update(student)
+        if self._stats is not None:
+            self._stats.update(student)
+        self._maybe_compact()
+
+    def _save_students(self, students):
+        '''Persist a batch of added or changed students with one journal write'''
+        for student in students:
+            self._remember(student.student_id)
+        self.storage.put_many([student.to_dict() for student in students])
+        for student in students:
+            self.students[student.student_id] = student
+            if self._index is not None:
+                self._index.update(student)
+            if self._stats is not None:
+                self._stats.update(student)
+        self._maybe_compact()
+
+    def _remove_student(self, student_id):
+        '''Persist the removal of one student'''
+        self._remember(student_id)
+        self.storage.delete(student_id)
+        del self.students[student_id]
+        if self._index is not None:
+            self._index.remove(student_id)
+        if self._stats is not None:
+            self._stats.remove(student_id)
+        self._maybe_compact()
+
+    @property
+    def index(self):
+        '''Secondary search indexes, built on first use and then kept up to date'''
+        if self._index is None:
+            self._index = StudentIndex(self.students.values())
+        return self._index
+
+    @property
+    def stats(self):
+        '''Running report aggregates, built on first use and then kept up to date'''
+        if self._stats is None:
+            self._stats = StudentStats(self.students.values())
+        return self._stats
+
+    def query(self, student_id=None, name=None, department=None, email=None):
+        '''Return students matching every given criterion, ordered by student ID
+        
+        Args:
+            student_id: exact student ID
+            name: case-insensitive substring of the name
+            department: case-insensitive substring of the department
+            email: case-insensitive exact email
+        '''
+        self.refresh()
+        if student_id is not None:
+            student = self.students.get(student_id.strip().upper())
+            candidates = {student.student_id} if student else set()
+        else:
+            candidates = None
+        for lookup, value in ((self.index.by_name, name), (self.index.by_department, department), (self.index.by_email, email)):
+            if value is None or candidates == set():
+                continue
+            ids = lookup(value.strip())
+            candidates = ids if candidates is None else candidates & ids
+        if candidates is None:
+            candidates = self.students.keys()
+        return [self.students[sid] for sid in sorted(candidates)]
+
+    def add(self, name, age, grade, department='', email='', phone='', student_id=None, enrollment_date=None):
+        '''Add a student and return it
+        
+        Raises:
+            ValueError: a field fails add_student's validation, or student_id is taken
+        '''
+        record = student_io.validate_record({
+            'student_id': student_id, 'name': name, 'age': age, 'grade': grade, 'department': department,
+            'email': email, 'phone': phone, 'enrollment_date': enrollment_date,
+        })
+        with self._locked():
+            if record['student_id'] is None:
+                record['student_id'] = self.ids.allocate()
+            elif record['student_id'] in self.students:
+                raise ValueError(f"Student with ID {record['student_id']} already exists!")
+            else:
+                self.ids.observe(record['student_id'])
+            student = Student(**record)
+            self._save_student(student)
+        return student
+
+    def update(self, student_id, **fields):
+        '''Change some of a student's fields and return the student
+        
+        Raises:
+            KeyError: no student has that ID
+            ValueError: an unknown field, or the result fails validation
+        '''
+        student_id = student_id.strip().upper()
+        unknown = set(fields) - set(student_io.FIELDS[1:])
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        # Merged onto the latest version under the lock, so a concurrent change to other fields survives
+        with self._locked():
+            if student_id not in self.students:
+                raise KeyError(student_id)
+            record = student_io.validate_record({**self.students[student_id].to_dict(), **fields})
+            record['student_id'] = student_id
+            # A new object rather than mutating in place, so a rollback still sees the old values
+            self._save_student(Student(**record))
+            return self.students[student_id]
+
+    def delete(self, student_id):
+        '''Remove a student and return it
+        
+        Raises:
+            KeyError: no student has that ID
+        '''
+        student_id = student_id.strip().upper()
+        with self._locked():
+            student = self.students[student_id]
+            self._remove_student(student_id)
+        return student
+
+    @contextmanager
+    def transaction(self):
+        '''Apply every change in the block as one unit
+        
+        The changes are journaled as a single entry when the block exits and
+        compaction runs at most once. If the block raises, nothing is written and
+        the in-memory roster is put back as it was. Nested blocks join the outer one.
+        The data file stays locked for the whole block, so other processes wait
+        rather than interleave.
+        '''
+        if self._undo is not None:
+            yield self
+            return
+        with self._locked():
+            self._undo = {}
+            self.storage.begin()
+            try:
+                yield self
+            except BaseException:
+                self.storage.rollback()
+                self._restore(self._undo)
+                raise
+            else:
+                self.storage.commit()
+            finally:
+                self._undo = None
+            self._maybe_compact()
+
+    def _restore(self, previous):
+        for student_id, record in previous.items():
+            if record is None:
+                if student_id in self.students:
+                    del self.students[student_id]
+                if self._index is not None:
+                    self._index.remove(student_id)
+                if self._stats is not None:
+                    self._stats.remove(student_id)
+            else:
+                student = Student(**record)
+                self.students[student_id] = student
+                if self._index is not None:
+                    self._index.update(student)
+                if self._stats is not None:
+                    self._stats.update(student)
+
+    def run_batch(self, lines, atomic=False):
+        '''Apply a stream of JSON commands in one transaction, yielding a result per command
+        
+        Each line is an object with an "op" of add, update, delete or query; the
+        other keys are that method's arguments, e.g.
+            {"op": "add", "name": "Asha", "age": 20, "grade": "A", "department": "CS"}
+            {"op": "update", "student_id": "STU1A2B3C", "grade": "B"}
+            {"op": "delete", "student_id": "STU1A2B3C"}
+            {"op": "query", "department": "cs"}
+        A failed command yields {"line", "ok": false, "error"} and the rest carry on,
+        unless atomic is set, in which case the first failure rolls the whole batch back.
+        The last result is {"committed": bool, "applied": count}.
+        '''
+        applied = 0
+        try:
+            with self.transaction():
+                for line_no, line in enumerate(lines, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        result = self._run_command(json.loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        message = f"Student with ID {e.args[0]} not found!" if isinstance(e, KeyError) else str(e)
+                        yield {'line': line_no, 'ok': False, 'error': message}
+                        if atomic:
+                            raise _BatchAborted()
+                        continue
+                    applied += 1
+                    yield {'line': line_no, 'ok': True, **result}
+        except _BatchAborted:
+            yield {'committed': False, 'applied': 0}
+            return
+        yield {'committed': True, 'applied': applied}
+
+    def _run_command(self, command):
+        if not isinstance(command, dict):
+            raise ValueError('Each command must be a JSON object')
+        command = dict(command)
+        op = command.pop('op', None)
+        if op == 'add':
+            return {'student': self.add(**command).to_dict()}
+        if op == 'update':
+            return {'student': self.update(command.pop('student_id'), **command).to_dict()}
+        if op == 'delete':
+            return {'student': self.delete(command['student_id']).to_dict()}
+        if op == 'query':
+            return {'students': [student.to_dict() for student in self.query(**command)]}
+        raise ValueError(f"Unknown op: {op!r}")
+
+    def _maybe_compact(self):
+        if self._undo is None and self.storage.needs_compaction(len(self.students)):
+            self.save_students()
+
+    def close(self):
+        '''Flush pending journal writes to disk'''
+        with self._locked():
+            # Only hand unused IDs back if no other process has reserved past ours
+            if self.storage.meta.get('next_student_id') == self.ids.ceiling:
+                high_water = self.ids.release()
+                if high_water is not None:
+                    self.storage.set_meta('next_student_id', high_water)
+        self.storage.close()
+        if hasattr(self.students, 'close'):
+            self.students.close()
             
     def add_student(self):
         '''Add a new student to the system'''
@@ -105,38 +475,28 @@ class StudentManagementSystem:
         print("ADD NEW STUDENT")
         print("=" * 50)
         
+        name = input("Enter student name: ").strip()
         try:
-            name = input("Enter student name: ").strip()
-            if not name:
-                print('Name cannot be empty')
-                return 
-                
             age = int(input('Enter age: '))
-            if age < 15 or age > 60:
-                print('Age must be between 15 and 60!') 
-                return
-
-            grade = input('Enter grade (A/B/C/D/F): ').upper().strip()
-            if grade not in ['A', 'B', 'C', 'D', 'F']:
-                print('Invalid grade! Use A, B, C, D or F')
-                return
-
-            department = input('Enter department: ').strip()
-            email = input('Enter email: ').strip()
-            phone = input('Enter phone number: ').strip()
-            
-            student_id = self.generate_student_id()
-            student = Student(student_id, name, age, grade, department, email, phone)
-            self.students[student_id] = student
-            self.save_students()
-            
-            print(f"\nStudent added successfully!")
-            print(f"Student ID: {student_id}")
-            
         except ValueError:
             print("Invalid input! Please enter correct data types.")
+            return
+        grade = input('Enter grade (A/B/C/D/F): ')
+        department = input('Enter department: ')
+        email = input('Enter email: ')
+        phone = input('Enter phone number: ')
+        
+        try:
+            student = self.add(name, age, grade, department, email, phone)
+        except ValueError as e:
+            print(e)
+            return
         except Exception as e:
             print(f"Error: {e}")
+            return
+        
+        print(f"\nStudent added successfully!")
+        print(f"Student ID: {student.student_id}")
             
     def view_all_students(self):
         '''Display all students in a table format '''
@@ -180,24 +540,19 @@ class StudentManagementSystem:
         
         if choice == '1':
             student_id = input("Enter Student ID: ").strip().upper()
-            if student_id in self.students:
-                results.append(self.students[student_id])
-            else:
+            results = self.query(student_id=student_id)
+            if not results:
                 print(f"Student with ID {student_id} not found!")
                 
         elif choice == '2':
             name = input("Enter student name: ").strip().lower()
-            for student in self.students.values():
-                if name in student.name.lower():
-                    results.append(student)
+            results = self.query(name=name)
             if not results:
                 print(f"No student found with name containing '{name}'")
                 
         elif choice == '3':
             department = input("Enter department: ").strip().lower()
-            for student in self.students.values():
-                if department in student.department.lower():
-                    results.append(student)
+            results = self.query(department=department)
             if not results:
                 print(f"No student found in department '{department}'")
         else:
@@ -235,52 +590,34 @@ class StudentManagementSystem:
         
         choice = input("\nEnter choice (1-7): ").strip()
         
+        fields = {
+            '1': ('name', "Enter new name: "),
+            '2': ('age', "Enter new age: "),
+            '3': ('grade', "Enter new grade (A/B/C/D/F): "),
+            '4': ('department', "Enter new department: "),
+            '5': ('email', "Enter new email: "),
+            '6': ('phone', "Enter new phone: "),
+        }
+        if choice == '7':
+            print("Update cancelled.")
+            return
+        if choice not in fields:
+            print("Invalid choice!")
+            return
+        
+        field, prompt = fields[choice]
         try:
-            if choice == '1':
-                new_name = input("Enter new name: ").strip()
-                if new_name:
-                    student.name = new_name
-                    print("Name updated successfully!")
-            elif choice == '2':
-                new_age = int(input("Enter new age: "))
-                if 15 <= new_age <= 60:
-                    student.age = new_age
-                    print("Age updated successfully!")
-                else:
-                    print("Age must be between 15 and 60!")
-                    return
-            elif choice == '3':
-                new_grade = input("Enter new grade (A/B/C/D/F): ").upper().strip()
-                if new_grade in ['A', 'B', 'C', 'D', 'F']:
-                    student.grade = new_grade
-                    print("Grade updated successfully!")
-                else:
-                    print("Invalid grade!")
-                    return
-            elif choice == '4':
-                student.department = input("Enter new department: ").strip()
-                print("Department updated successfully!")
-            elif choice == '5':
-                student.email = input("Enter new email: ").strip()
-                print("Email updated successfully!")
-            elif choice == '6':
-                student.phone = input("Enter new phone: ").strip()
-                print("Phone updated successfully!")
-            elif choice == '7':
-                print("Update cancelled.")
-                return
-            else:
-                print("Invalid choice!")
-                return
-            
-            self.save_students()
-            print("\nStudent information updated successfully!")
-            student.display_info()
-            
-        except ValueError:
-            print("Invalid input!")
+            student = self.update(student_id, **{field: input(prompt).strip()})
+        except ValueError as e:
+            print(e)
+            return
         except Exception as e:
             print(f"Error: {e}")
+            return
+        
+        print(f"{field.capitalize()} updated successfully!")
+        print("\nStudent information updated successfully!")
+        student.display_info()
     
     def delete_student(self):
         '''Delete a student from the system'''
@@ -300,49 +637,65 @@ class StudentManagementSystem:
         confirm = input(f"\nAre you sure you want to delete {student.name}? (yes/no): ").strip().lower()
         
         if confirm == 'yes':
-            del self.students[student_id]
-            self.save_students()
+            self.delete(student_id)
             print(f"Student {student_id} deleted successfully!")
         else:
             print("Deletion cancelled.")
     
     def generate_report(self):
-        '''Generate statistical report of students'''
+        '''Print a statistical report of students and return it as a dict'''
         if not self.students:
             print('No students found in the database')
-            return 
+            return None
+        
+        report = self.stats.summary()
         
         print("\n" + "=" * 50)
         print("STATISTICAL REPORT")
         print("=" * 50)
         
-        total_students = len(self.students)
-        
-        grade_count = {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0}
-        departments = {}
-        total_age = 0
-        
-        for student in self.students.values():
-            grade_count[student.grade] += 1
-            total_age += student.age
-            dept = student.department
-            departments[dept] = departments.get(dept, 0) + 1
-        
-        avg_age = total_age / total_students if total_students > 0 else 0
-        
-        print(f"\nTOTAL STUDENTS: {total_students}")
-        print(f"AVERAGE AGE: {avg_age:.1f} years")
+        print(f"\nTOTAL STUDENTS: {report['total']}")
+        print(f"AVERAGE AGE: {report['average_age']:.1f} years")
         
         print("\nGRADE DISTRIBUTION:")
-        for grade, count in grade_count.items():
-            percentage = (count / total_students * 100) if total_students > 0 else 0
-            print(f"   {grade}: {count} students ({percentage:.1f}%)")
+        for grade, row in report['grades'].items():
+            print(f"   {grade}: {row['count']} students ({row['percent']:.1f}%)")
         
         print("\nDEPARTMENT DISTRIBUTION:")
-        for dept, count in sorted(departments.items()):
-            percentage = (count / total_students * 100) if total_students > 0 else 0
-            print(f"   {dept}: {count} students ({percentage:.1f}%)")
+        for dept, row in report['departments'].items():
+            print(f"   {dept}: {row['count']} students ({row['percent']:.1f}%)")
+        return report
+
+    def detailed_report(self, percentiles=(10, 25, 50, 75, 90)):
+        '''Age percentiles, per-department age stats and grade-by-department
+        cross-tabs, computed with NumPy. Returns a dict, see student_stats.detailed_report'''
+        return detailed_report(self.students, percentiles)
     
+    def export_students(self, path, fmt=None, chunk_size=student_io.DEFAULT_CHUNK_SIZE):
+        '''Stream every student to path (.csv, .jsonl or .stcol); returns the count written'''
+        records = (student.to_dict() for student in self.students.values())
+        return student_io.export_records(path, records, fmt, chunk_size)
+
+    def import_students(self, path, fmt=None, chunk_size=student_io.DEFAULT_CHUNK_SIZE):
+        '''Stream students in from path (.csv, .jsonl or .stcol)
+        
+        Rows are validated like add_student; a row with an existing student ID
+        replaces that student and a row without one gets a new ID. Returns
+        (number imported, list of student_io.RowError for rejected rows).
+        '''
+        errors = []
+        imported = 0
+        for chunk in student_io.chunks(student_io.iter_valid(path, fmt, errors), chunk_size):
+            with self._locked():
+                missing = [record for record in chunk if record['student_id'] is None]
+                for record, student_id in zip(missing, self.ids.allocate_many(len(missing))):
+                    record['student_id'] = student_id
+                for record in chunk:
+                    self.ids.observe(record['student_id'])
+                self._save_students([Student(**record) for record in chunk])
+            imported += len(chunk)
+        return imported, errors
+
     def export_to_csv(self):
         '''Export student data to CSV file'''
         if not self.students:
@@ -352,18 +705,26 @@ class StudentManagementSystem:
         filename = f"students_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
         try:
-            with open(filename, 'w', newline='') as csvfile:
-                fieldnames = ['student_id', 'name', 'age', 'grade', 'department', 
-                            'email', 'phone', 'enrollment_date']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for student in self.students.values():
-                    writer.writerow(student.to_dict())
-            
+            self.export_students(filename)
             print(f"Data exported to {filename}")
         except Exception as e:
             print(f"Error exporting to CSV: {e}")
+
+    def import_from_file(self):
+        '''Import students from a CSV, JSON Lines or columnar file'''
+        path = input("Enter file to import (.csv, .jsonl or .stcol): ").strip()
+        try:
+            imported, errors = self.import_students(path)
+        except (OSError, ValueError) as e:
+            print(f"Error importing: {e}")
+            return
+        print(f"Imported {imported} student(s)")
+        if errors:
+            print(f"Skipped {len(errors)} invalid row(s):")
+            for error in errors[:20]:
+                print(f"   row {error.row}: {error.message}")
+            if len(errors) > 20:
+                print(f"   ... and {len(errors) - 20} more")
     
     def display_menu(self):
         '''Display the main menu'''
@@ -377,12 +738,48 @@ class StudentManagementSystem:
         print("5. Delete Student")
         print("6. Generate Report")
         print("7. Export to CSV")
-        print("8. Exit")
+        print("8. Import from File")
+        print("9. Exit")
         print("=" * 60)
 
 
-def main():
-    '''Main function to run the Student Management System'''
+def run_batch_file(path, data_file='students_data.json', atomic=False):
+    '''Apply the JSON Lines commands in path ('-' for stdin) and print one JSON result per line
+    
+    Returns True if the batch was committed.
+    '''
+    # Keep stdout to the JSON results only
+    with redirect_stdout(sys.stderr):
+        system = StudentManagementSystem(data_file, roster=os.getenv("STUDENT_ROSTER", "dict"))
+    stream = sys.stdin if path == '-' else open(path, 'r')
+    committed = False
+    try:
+        for result in system.run_batch(stream, atomic=atomic):
+            print(json.dumps(result))
+            committed = result.get('committed', committed)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        with redirect_stdout(sys.stderr):
+            system.close()
+    return committed
+
+
+def main(argv=None):
+    '''Main function to run the Student Management System
+    
+    With --batch FILE (or - for stdin) the commands in FILE are applied without
+    the menu, see StudentManagementSystem.run_batch.
+    '''
+    import argparse
+    parser = argparse.ArgumentParser(description="Student Management System")
+    parser.add_argument("--batch", metavar="FILE", help="apply JSON Lines commands from FILE ('-' for stdin)")
+    parser.add_argument("--atomic", action="store_true", help="roll the whole batch back on the first failed command")
+    parser.add_argument("--data-file", default="students_data.json")
+    args = parser.parse_args(argv)
+    if args.batch:
+        sys.exit(0 if run_batch_file(args.batch, args.data_file, args.atomic) else 1)
+
     print("\n" + "=" * 60)
     print("WELCOME TO STUDENT MANAGEMENT SYSTEM")
     print("Final Year College Project")
@@ -395,7 +792,6 @@ def main():
         install = input("Do you want to install it? (yes/no): ").strip().lower()
         if install == 'yes':
             import subprocess
-            import sys
             subprocess.check_call([sys.executable, "-m", "pip", "install", "tabulate"])
             print("'tabulate' installed successfully!")
             from tabulate import tabulate
@@ -403,13 +799,15 @@ def main():
             print("'tabulate' is required for table display. Exiting...")
             return
     
-    system = StudentManagementSystem()
+    system = StudentManagementSystem(args.data_file, roster=os.getenv("STUDENT_ROSTER", "dict"))
     
     while True:
         system.display_menu()
         
         try:
-            choice = input("\nEnter your choice (1-8): ").strip()
+            choice = input("\nEnter your choice (1-9): ").strip()
+            # Another process may have changed the roster while the menu was waiting
+            system.refresh()
             
             if choice == '1':
                 system.add_student()
@@ -426,19 +824,23 @@ def main():
             elif choice == '7':
                 system.export_to_csv()
             elif choice == '8':
+                system.import_from_file()
+            elif choice == '9':
                 print("\n" + "=" * 60)
                 print("Thank you for using Student Management System!")
                 print("Data saved automatically")
                 print("=" * 60)
+                system.close()
                 break
             else:
-                print("Invalid choice! Please enter a number between 1-8")
+                print("Invalid choice! Please enter a number between 1-9")
             
             input("\nPress Enter to continue...")
             
         except KeyboardInterrupt:
             print("\n\nProgram interrupted. Saving data...")
             system.save_students()
+            system.close()
             print("Goodbye!")
             break
         except Exception as e:
@@ -1,14 +1,36 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor,ProcessPoolExecutor,ThreadPoolExecutor
 from datetime import datetime,timedelta,timezone
 from typing import Optional
 from jose import JWTError,jwt
 from passlib.context import CryptContext
 
+import metrics
+
 SECRET_KEY='shjfsifj'
 ALGORITHM='HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES=30
 
+# Password work runs on its own pool so a login storm can't starve the request threadpool.
+# "process" gives true parallelism across cores; "thread" relies on bcrypt releasing the GIL.
+BCRYPT_ROUNDS=int(os.getenv("BCRYPT_ROUNDS","12"))
+PASSWORD_EXECUTOR=os.getenv("PASSWORD_EXECUTOR","thread")
+PASSWORD_WORKERS=int(os.getenv("PASSWORD_WORKERS",str(os.cpu_count() or 1)))
+# Hash/verify calls allowed in flight or queued before new ones are shed
+PASSWORD_MAX_PENDING=int(os.getenv("PASSWORD_MAX_PENDING",str(PASSWORD_WORKERS*4)))
+
+
+pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto",bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordWorkersBusy(Exception):
+    '''Raised when the password worker queue is full'''
+
 
-pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto")
+_password_executor:Optional[Executor]=None
+_pending=0
 
 def verify_password(plain_password,hashed_password):
     return pwd_context.verify(plain_password,hashed_password)
@@ -18,6 +40,50 @@ def get_password_hash(password):
     # Truncate password to 72 characters max for bcrypt
     return pwd_context.hash(password[:72])
 
+def get_password_executor()->Executor:
+    global _password_executor
+    if _password_executor is None:
+        if PASSWORD_EXECUTOR=="process":
+            _password_executor=ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        else:
+            _password_executor=ThreadPoolExecutor(max_workers=PASSWORD_WORKERS,thread_name_prefix="password")
+    return _password_executor
+
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False,cancel_futures=True)
+        _password_executor=None
+
+
+def password_queue_depth()->int:
+    return _pending
+
+
+async def _run_password_work(op,func,*args):
+    global _pending
+    if _pending>=PASSWORD_MAX_PENDING:
+        raise PasswordWorkersBusy(f"{_pending} password operations already pending")
+    _pending+=1
+    start=time.perf_counter()
+    try:
+        loop=asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(),func,*args)
+    finally:
+        _pending-=1
+        if metrics.ENABLED:
+            metrics.password_seconds.observe(time.perf_counter()-start,op)
+
+
+async def verify_password_async(plain_password,hashed_password):
+    return await _run_password_work("verify",verify_password,plain_password,hashed_password)
+
+
+async def get_password_hash_async(password):
+    return await _run_password_work("hash",get_password_hash,password)
+
+
 def create_access_token(data:dict,expires_delta:Optional[timedelta]=None):
     to_encode=data.copy()
     if expires_delta:
@@ -29,12 +95,18 @@ def create_access_token(data:dict,expires_delta:Optional[timedelta]=None):
     return encoded_jwt
 
 
-def decode_token(token:str):
+def decode_token_claims(token:str):
     try:
         payload=jwt.decode(token,SECRET_KEY,algorithms=[ALGORITHM])
-        username=payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             return None
-        return username
+        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+def decode_token(token:str):
+    payload=decode_token_claims(token)
+    if payload is None:
+        return None
+    return payload["sub"]
\ No newline at end of file
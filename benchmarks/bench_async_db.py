@@ -0,0 +1,87 @@
+"""Concurrent writer benchmark: sync session in async handlers vs AsyncSession
+
+N writers POST tasks while S idle "sockets" sleep on the event loop and record
+how late they wake up. A blocked event loop shows up as socket stall; that is
+what every open WebSocket experiences while a handler commits synchronously.
+
+Usage: python -m benchmarks.bench_async_db [--writers 50] [--requests 20] [--sockets 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+import models, schemas
+import main
+from dependencies import get_db, get_current_user
+from benchmarks.common import asgi_client, summarize, temp_app
+
+SOCKET_TICK = 0.005
+
+
+async def legacy_create_task(task: schemas.TaskCreate, current_user: schemas.CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    '''The previous create_task: synchronous commit inside an async handler'''
+    db_task = models.Task(**task.model_dump(), owner_id=current_user.id)
+    db.add(db_task)
+    db.commit()
+    db.refresh(db_task)
+    return schemas.Task.model_validate(db_task)
+
+
+async def socket_probe(stop, stalls):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(SOCKET_TICK)
+        stalls.append(time.perf_counter() - start - SOCKET_TICK)
+
+
+async def writer(client, path, headers, requests, latencies):
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post(path, json={"title": f"bench {i}"}, headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_mix(path, headers, writers, requests, sockets):
+    latencies, stalls = [], []
+    stop = asyncio.Event()
+    async with asgi_client() as client:
+        probes = [asyncio.create_task(socket_probe(stop, stalls)) for _ in range(sockets)]
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(client, path, headers, requests, latencies) for _ in range(writers)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*probes)
+    return {
+        "writes_per_sec": round(len(latencies) / elapsed, 1),
+        "request_latency": summarize(latencies),
+        "socket_stall": summarize(stalls),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--sockets", type=int, default=200)
+    args = parser.parse_args()
+
+    main.app.post("/bench/legacy-tasks/")(legacy_create_task)
+    with temp_app() as (_, headers):
+        results = {
+            "writers": args.writers,
+            "requests_per_writer": args.requests,
+            "sockets": args.sockets,
+            "before_sync_session": asyncio.run(run_mix("/bench/legacy-tasks/", headers, args.writers, args.requests, args.sockets)),
+            "after_async_session": asyncio.run(run_mix("/tasks/", headers, args.writers, args.requests, args.sockets)),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
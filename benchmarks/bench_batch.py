@@ -0,0 +1,86 @@
+"""Batch endpoint benchmark: /tasks/batch vs one request per task
+
+Creates N tasks, marks them all done and deletes them, once through the
+single-task endpoints and once through /tasks/batch, and reports wall time
+and tasks/sec for each phase.
+
+Usage: python -m benchmarks.bench_batch [--tasks 1000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import schemas
+from benchmarks.common import asgi_client, temp_app
+
+
+async def one_at_a_time(client, headers, count):
+    timings = {}
+    start = time.perf_counter()
+    ids = []
+    for i in range(count):
+        response = await client.post("/tasks/", json={"title": f"task {i}"}, headers=headers)
+        ids.append(response.json()["id"])
+    timings["create"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task_id in ids:
+        await client.put(f"/tasks/{task_id}", json={"completed": True}, headers=headers)
+    timings["mark_done"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task_id in ids:
+        await client.delete(f"/tasks/{task_id}", headers=headers)
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def batched(client, headers, count):
+    timings = {}
+    chunks = range(0, count, schemas.BATCH_MAX_ITEMS)
+    start = time.perf_counter()
+    ids = []
+    for offset in chunks:
+        size = min(schemas.BATCH_MAX_ITEMS, count - offset)
+        body = {"create": [{"title": f"task {offset + i}"} for i in range(size)]}
+        response = await client.post("/tasks/batch", json=body, headers=headers)
+        ids.extend(result["id"] for result in response.json()["results"])
+    timings["create"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in chunks:
+        body = {"update": [{"id": task_id, "completed": True} for task_id in ids[offset:offset + schemas.BATCH_MAX_ITEMS]]}
+        await client.post("/tasks/batch", json=body, headers=headers)
+    timings["mark_done"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in chunks:
+        await client.post("/tasks/batch", json={"delete": ids[offset:offset + schemas.BATCH_MAX_ITEMS]}, headers=headers)
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+def report(timings, count):
+    return {phase: {"seconds": round(elapsed, 3), "tasks_per_sec": round(count / elapsed, 1)} for phase, elapsed in timings.items()}
+
+
+async def run(headers, count):
+    async with asgi_client() as client:
+        single = await one_at_a_time(client, headers, count)
+        batch = await batched(client, headers, count)
+    return {"tasks": count, "one_at_a_time": report(single, count), "batch": report(batch, count)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    args = parser.parse_args()
+
+    with temp_app() as (_, headers):
+        results = asyncio.run(run(headers, args.tasks))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
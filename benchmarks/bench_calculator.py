@@ -0,0 +1,95 @@
+"""Calculator engine benchmark: expressions/sec parsed vs cached vs vectorized
+
+    parsed       every expression tokenized, parsed and compiled from scratch
+    cached       the same stream through evaluate(), plans memoized per string
+                 (the stream repeats --distinct expressions)
+    row_loop     one expression over N rows of operands, a plan call per row
+    vectorized   the same N rows as NumPy columns in one evaluate_columns call
+
+1% of the divisors in the row workloads are zero, so the per-element
+divide-by-zero handling is part of what is timed.
+
+Usage: python -m benchmarks.bench_calculator [--expressions 200000] [--distinct 500] [--rows 1000000]
+"""
+import argparse
+import json
+import random
+import time
+
+from calculator_engine import Plan, compile_expression, evaluate
+
+ROW_EXPRESSION = "(a + b) * c - a / d + b ^ 2 % 7"
+
+
+def random_expression(rng, depth=3):
+    if depth == 0 or rng.random() < 0.3:
+        return str(rng.choice([rng.randint(0, 100), round(rng.uniform(0, 100), 2)]))
+    left, right = random_expression(rng, depth - 1), random_expression(rng, depth - 1)
+    expression = f"{left} {rng.choice(['+', '-', '*', '/', '%'])} {right}"
+    return f"({expression})" if rng.random() < 0.5 else expression
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def run_parsed(stream):
+    for text in stream:
+        try:
+            Plan(text)()
+        except ArithmeticError:
+            pass
+
+
+def run_cached(stream):
+    for text in stream:
+        try:
+            evaluate(text)
+        except ArithmeticError:
+            pass
+
+
+def run_rows(columns):
+    plan = compile_expression(ROW_EXPRESSION)
+    for a, b, c, d in zip(*columns):
+        try:
+            plan(a=a, b=b, c=c, d=d)
+        except ArithmeticError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expressions", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    distinct = [random_expression(rng) for _ in range(args.distinct)]
+    stream = [rng.choice(distinct) for _ in range(args.expressions)]
+    columns = [[rng.uniform(-50, 50) for _ in range(args.rows)] for _ in range(3)]
+    columns.append([0.0 if rng.random() < 0.01 else rng.uniform(1, 10) for _ in range(args.rows)])
+
+    import numpy as np
+    arrays = [np.array(column) for column in columns]
+    start = time.perf_counter()
+    values, errors = compile_expression(ROW_EXPRESSION).evaluate_columns(a=arrays[0], b=arrays[1],
+                                                                         c=arrays[2], d=arrays[3])
+    vectorized = time.perf_counter() - start
+
+    results = [
+        ("parsed", args.expressions, timed(run_parsed, stream)),
+        ("cached", args.expressions, timed(run_cached, stream)),
+        ("row_loop", args.rows, timed(run_rows, columns)),
+        ("vectorized", args.rows, vectorized),
+    ]
+    for mode, count, seconds in results:
+        print(json.dumps({"mode": mode, "expressions": count, "expressions_per_sec": round(count / seconds)}))
+    print(json.dumps({"vectorized_divide_by_zero_rows": int(errors.sum()), "rows": args.rows}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Instrumentation overhead: request latency with METRICS_ENABLED=0 vs 1
+
+METRICS_ENABLED is read at import, so each setting runs in its own child
+process against a fresh temp database: N task creates, then N cached and N
+uncached (cache cleared first) GET /tasks/?limit=100 requests.
+
+Usage: python -m benchmarks.bench_metrics_overhead [--requests 1000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+async def measure(headers, count):
+    from benchmarks.common import asgi_client, summarize
+    from dependencies import task_cache
+
+    results = {}
+    async with asgi_client() as client:
+        for name in ("create", "list_cached", "list_uncached"):
+            latencies = []
+            for i in range(count):
+                if name == "list_uncached":
+                    task_cache.clear()
+                start = time.perf_counter()
+                if name == "create":
+                    await client.post("/tasks/", json={"title": f"task {i}"}, headers=headers)
+                else:
+                    await client.get("/tasks/?limit=100", headers=headers)
+                latencies.append(time.perf_counter() - start)
+            results[name] = summarize(latencies)
+    return results
+
+
+def child(count):
+    import metrics
+    from benchmarks.common import temp_app
+
+    with temp_app() as (_, headers):
+        results = asyncio.run(measure(headers, count))
+    for name, summary in results.items():
+        print(json.dumps({"metrics_enabled": metrics.ENABLED, "request": name, **summary}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.requests)
+        return
+    for enabled in ("0", "1"):
+        env = {**os.environ, "METRICS_ENABLED": enabled}
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_metrics_overhead", "--child",
+                        "--requests", str(args.requests)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Login throughput benchmark for the password worker pool
+
+Runs bcrypt verifications (what /token does per login) through the thread and
+process executors at several pool sizes and reports logins/sec and logins/sec
+per core used.
+
+Usage: python -m benchmarks.bench_password_hashing [--logins 64] [--rounds 12]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import auth
+
+
+async def run_logins(hashed, logins):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(auth.verify_password_async("benchmark", hashed) for _ in range(logins)))
+    assert all(results)
+    return time.perf_counter() - start
+
+
+def measure(executor, workers, hashed, logins):
+    auth.shutdown_password_executor()
+    auth.PASSWORD_EXECUTOR = executor
+    auth.PASSWORD_WORKERS = workers
+    auth.PASSWORD_MAX_PENDING = logins
+    # Warm the pool so process start-up isn't counted as login time
+    asyncio.run(run_logins(hashed, workers))
+    elapsed = asyncio.run(run_logins(hashed, logins))
+    auth.shutdown_password_executor()
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        "executor": executor,
+        "workers": workers,
+        "logins_per_sec": round(logins / elapsed, 2),
+        "logins_per_sec_per_core": round(logins / elapsed / cores, 2),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=auth.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)  # inherited by process workers
+    auth.pwd_context.update(bcrypt__rounds=args.rounds)
+    hashed = auth.get_password_hash("benchmark")
+
+    start = time.perf_counter()
+    for _ in range(min(args.logins, 8)):
+        auth.verify_password("benchmark", hashed)
+    inline_rate = min(args.logins, 8) / (time.perf_counter() - start)
+
+    cpus = os.cpu_count() or 1
+    sizes = sorted({1, max(1, cpus // 2), cpus})
+    results = {
+        "cpu_count": cpus,
+        "bcrypt_rounds": args.rounds,
+        "inline_logins_per_sec": round(inline_rate, 2),
+        "pools": [measure(executor, workers, hashed, args.logins) for executor in ("thread", "process") for workers in sizes],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
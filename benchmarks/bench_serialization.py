@@ -0,0 +1,73 @@
+"""Task serialization microbenchmark: rows/sec through pydantic vs the fast path
+
+Encodes N ORM task rows (built in memory, no database) to JSON the ways the
+server has done it:
+
+    ws_pydantic     schemas.Task.model_validate(row).model_dump(mode="json") per row,
+                    then json.dumps of the message (the old WebSocket path)
+    rest_pydantic   validate the list from attributes and dump_json, as FastAPI
+                    does for response_model=List[schemas.Task]
+    fast            serializers.dumps(task_dicts(rows)), used by both now
+
+Usage: python -m benchmarks.bench_serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import datetime
+import json
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+import models, schemas, serializers
+
+
+def make_rows(count):
+    start = datetime.datetime(2024, 1, 1)
+    return [models.Task(id=i, title=f"Task {i}", description=f"Description of task {i}", completed=i % 3 == 0,
+                        created_at=start + datetime.timedelta(seconds=i, microseconds=i), owner_id=1)
+            for i in range(count)]
+
+
+def ws_pydantic(rows):
+    return json.dumps({"type": "initial_tasks", "seq": 1,
+                       "tasks": [schemas.Task.model_validate(row).model_dump(mode="json") for row in rows]})
+
+
+ADAPTER = TypeAdapter(List[schemas.Task])
+
+
+def rest_pydantic(rows):
+    return ADAPTER.dump_json(ADAPTER.validate_python(rows, from_attributes=True))
+
+
+def fast(rows):
+    return serializers.dumps({"type": "initial_tasks", "seq": 1, "tasks": serializers.task_dicts(rows)})
+
+
+def best_of(function, rows, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    # Same payload either way, only the encoder differs
+    assert json.loads(fast(rows)) == json.loads(ws_pydantic(rows))
+    for name, function in (("ws_pydantic", ws_pydantic), ("rest_pydantic", rest_pydantic), ("fast", fast)):
+        seconds = best_of(function, rows, args.repeat)
+        print(json.dumps({"path": name, "rows": args.rows, "rows_per_sec": round(args.rows / seconds)}))
+    print(json.dumps({"fast_encoder": "json" if serializers.orjson is None else "orjson"}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Write-heavy concurrency benchmark across SQLite storage profiles
+
+Runs the same mix of concurrent writers (task creates and updates) against a
+fresh database for each profile in database.SQLITE_PROFILES and reports
+writes/sec and latency percentiles.
+
+Usage: python -m benchmarks.bench_sqlite_profiles [--writers 20] [--requests 25] [--profiles legacy balanced]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import database
+from benchmarks.common import asgi_client, summarize, temp_app
+
+
+async def writer(client, headers, requests, latencies, errors):
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post("/tasks/", json={"title": f"bench {i}"}, headers=headers)
+        if response.status_code == 200:
+            await client.put(f"/tasks/{response.json()['id']}", json={"completed": True}, headers=headers)
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(response.status_code)
+
+
+async def run(headers, writers, requests):
+    latencies, errors = [], []
+    async with asgi_client() as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(client, headers, requests, latencies, errors) for _ in range(writers)))
+        elapsed = time.perf_counter() - start
+    return {
+        # each iteration is two committed writes
+        "writes_per_sec": round(2 * len(latencies) / elapsed, 1),
+        "errors": len(errors),
+        "create_update_latency": summarize(latencies),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=25)
+    parser.add_argument("--profiles", nargs="+", default=list(database.SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    results = {"writers": args.writers, "requests_per_writer": args.requests, "profiles": {}}
+    for profile in args.profiles:
+        with temp_app(profile=profile) as (_, headers):
+            results["profiles"][profile] = {
+                "pragmas": database.sqlite_pragmas(profile),
+                **asyncio.run(run(headers, args.writers, args.requests)),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,105 @@
+"""Student service API benchmark: ops/sec for individual calls vs one batch
+
+Starts from a roster of N synthetic students and applies a stream of M mixed
+commands (60% add, 30% update, 10% delete) three ways:
+
+    full_save      legacy behaviour, the whole file rewritten after every change
+                   (JsonFileStorage; run on a reduced op count, it is O(roster) per op)
+    per_call       add/update/delete one call at a time on the journal
+    batch          the same commands through run_batch, one transaction
+
+Usage: python -m benchmarks.bench_student_batch [--students 10000] [--ops 20000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from StudentManagementSystem import StudentManagementSystem
+from student_storage import JsonFileStorage
+from benchmarks.bench_student_search import synthetic_students
+
+
+def commands(existing_ids, count, seed=7):
+    rng = random.Random(seed)
+    ids = list(existing_ids)
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.6 or len(ids) < 2:
+            student_id = f"NEW{i:08d}"
+            ids.append(student_id)
+            yield {"op": "add", "student_id": student_id, "name": f"Student {i}", "age": rng.randint(15, 60),
+                   "grade": rng.choice("ABCDF"), "department": "Physics", "email": f"s{i}@college.edu"}
+        elif roll < 0.9:
+            yield {"op": "update", "student_id": rng.choice(ids), "grade": rng.choice("ABCDF")}
+        else:
+            yield {"op": "delete", "student_id": ids.pop(rng.randrange(len(ids)))}
+
+
+def make_system(tmp, name, students, storage=None):
+    data_file = os.path.join(tmp, f"{name}.json")
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = StudentManagementSystem(data_file, storage=storage(data_file) if storage else None)
+        system._save_students(list(synthetic_students(students)))
+        system.save_students()
+    return system
+
+
+def per_call(system, ops):
+    for command in ops:
+        command = dict(command)
+        op = command.pop("op")
+        if op == "add":
+            system.add(**command)
+        elif op == "update":
+            system.update(command.pop("student_id"), **command)
+        else:
+            system.delete(command["student_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--full-save-ops", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_ids = [s.student_id for s in synthetic_students(args.students)]
+        ops = list(commands(base_ids, args.ops))
+        results = []
+
+        system = make_system(tmp, "full_save", args.students, JsonFileStorage)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            per_call(system, ops[:args.full_save_ops])
+        results.append(("full_save", args.full_save_ops, time.perf_counter() - start))
+        system.close()
+
+        system = make_system(tmp, "per_call", args.students)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            per_call(system, ops)
+        results.append(("per_call", len(ops), time.perf_counter() - start))
+        system.close()
+
+        system = make_system(tmp, "batch", args.students)
+        lines = [json.dumps(command) for command in ops]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            outcome = list(system.run_batch(lines))
+        results.append(("batch", len(ops), time.perf_counter() - start))
+        assert outcome[-1] == {"committed": True, "applied": len(ops)}
+        system.close()
+
+    for mode, count, seconds in results:
+        print(json.dumps({"mode": mode, "students": args.students, "ops": count,
+                          "ops_per_sec": round(count / seconds)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Student bulk I/O benchmark: export and import throughput per format
+
+Exports N synthetic students to CSV, JSON Lines and the binary columnar format,
+then imports each file into a fresh journal-backed system, reporting rows/sec
+and file size.
+
+Usage: python -m benchmarks.bench_student_io [--students 100000] [--chunk-size 10000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from StudentManagementSystem import StudentManagementSystem
+from benchmarks.bench_student_search import synthetic_students
+
+FORMATS = {"csv": ".csv", "jsonl": ".jsonl", "columnar": ".stcol"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        source = StudentManagementSystem(os.path.join(tmp, "source.json"))
+        for student in synthetic_students(args.students):
+            source.students[student.student_id] = student
+        results = []
+        for fmt, extension in FORMATS.items():
+            path = os.path.join(tmp, f"roster{extension}")
+            start = time.perf_counter()
+            source.export_students(path, chunk_size=args.chunk_size)
+            export_seconds = time.perf_counter() - start
+
+            target = StudentManagementSystem(os.path.join(tmp, f"target_{fmt}.json"))
+            start = time.perf_counter()
+            imported, errors = target.import_students(path, chunk_size=args.chunk_size)
+            import_seconds = time.perf_counter() - start
+            target.close()
+            assert imported == args.students and not errors
+            results.append({
+                "format": fmt,
+                "students": args.students,
+                "file_mb": round(os.path.getsize(path) / 1e6, 2),
+                "export_rows_per_sec": round(args.students / export_seconds),
+                "import_rows_per_sec": round(args.students / import_seconds),
+            })
+        source.close()
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Student roster memory benchmark: bytes per record for each in-memory layout
+
+Builds N synthetic students into a plain dict of Student objects and into a
+ColumnarRoster, and reports traced memory per record with tracemalloc. The
+__dict__ row uses a throwaway subclass without __slots__ to show what the
+original Student class cost.
+
+Usage: python -m benchmarks.bench_student_memory [--students 100000 1000000]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from StudentManagementSystem import Student
+from student_roster import ColumnarRoster
+from benchmarks.bench_student_search import synthetic_students
+
+
+class DictStudent(Student):
+    '''Student with an instance __dict__, like the class before __slots__'''
+
+
+def build_dict(count, cls):
+    students = {}
+    for student in synthetic_students(count):
+        copy = cls(**student.to_dict())
+        students[copy.student_id] = copy
+    return students
+
+
+def build_columnar(count):
+    return ColumnarRoster(synthetic_students(count))
+
+
+def bytes_per_record(build, count):
+    gc.collect()
+    tracemalloc.start()
+    roster = build(count)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(roster) == count
+    del roster
+    return round(size / count)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, nargs="+", default=[100_000])
+    args = parser.parse_args()
+
+    results = []
+    for count in args.students:
+        results.append({
+            "students": count,
+            "dict_of_objects_bytes": bytes_per_record(lambda n: build_dict(n, DictStudent), count),
+            "dict_of_slots_bytes": bytes_per_record(lambda n: build_dict(n, Student), count),
+            "columnar_bytes": bytes_per_record(build_columnar, count),
+        })
+        print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
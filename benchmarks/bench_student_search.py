@@ -0,0 +1,95 @@
+"""Student search benchmark: secondary indexes vs the original linear scans
+
+Builds an in-memory roster of N synthetic students and times name, department
+and email lookups through StudentManagementSystem.query against the
+scan-every-student approach search_student used before.
+
+Usage: python -m benchmarks.bench_student_search [--students 100000 1000000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from StudentManagementSystem import Student, StudentManagementSystem
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera",
+               "James", "Olivia", "Liam", "Emma", "Noah", "Sofia", "Lucas", "Mia", "Ethan", "Zara"]
+LAST_NAMES = ["Sharma", "Patel", "Singh", "Kumar", "Gupta", "Reddy", "Iyer", "Nair", "Das", "Joshi",
+              "Smith", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Moore", "Taylor", "Clark", "Lewis"]
+DEPARTMENTS = ["Computer Science", "Mechanical", "Electrical", "Civil", "Chemical", "Physics",
+               "Mathematics", "Biology", "Economics", "Commerce"]
+
+
+def synthetic_students(count, seed=42):
+    rng = random.Random(seed)
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield Student(f"STU{i:08d}", f"{first} {last} {i}", rng.randint(15, 60), rng.choice("ABCDF"),
+                      rng.choice(DEPARTMENTS), f"{first.lower()}.{last.lower()}{i}@college.edu", f"98{i:08d}")
+
+
+def scan_name(system, name):
+    name = name.lower()
+    return [s for s in system.students.values() if name in s.name.lower()]
+
+
+def scan_department(system, department):
+    department = department.lower()
+    return [s for s in system.students.values() if department in s.department.lower()]
+
+
+def scan_email(system, email):
+    email = email.lower()
+    return [s for s in system.students.values() if s.email.lower() == email]
+
+
+def per_query_ms(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return round((time.perf_counter() - start) / len(args) * 1000, 4)
+
+
+def run(count, queries):
+    with tempfile.TemporaryDirectory() as tmp:
+        system = StudentManagementSystem(os.path.join(tmp, "students.json"))
+        system.students = {student.student_id: student for student in synthetic_students(count)}
+        system.close()
+
+    rng = random.Random(7)
+    ids = rng.sample(range(count), min(queries, count))
+    names = [f"{i}" if i >= 100 else "sharma" for i in ids]
+    emails = [system.students[f"STU{i:08d}"].email for i in ids]
+    departments = [rng.choice(DEPARTMENTS) for _ in ids]
+
+    start = time.perf_counter()
+    system.index
+    build_seconds = time.perf_counter() - start
+    # Scans are slow at this size, so time fewer of them
+    scan_sample = max(1, len(ids) // 20)
+
+    return {
+        "students": count,
+        "index_build_seconds": round(build_seconds, 2),
+        "name_ms": {"scan": per_query_ms(lambda q: scan_name(system, q), names[:scan_sample]),
+                    "index": per_query_ms(lambda q: system.query(name=q), names)},
+        "department_ms": {"scan": per_query_ms(lambda q: scan_department(system, q), departments[:scan_sample]),
+                          "index": per_query_ms(lambda q: system.query(department=q), departments)},
+        "email_ms": {"scan": per_query_ms(lambda q: scan_email(system, q), emails[:scan_sample]),
+                     "index": per_query_ms(lambda q: system.query(email=q), emails)},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps([run(count, args.queries) for count in args.students], indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,62 @@
+"""Student roster startup benchmark: full load vs lazy memory-mapped load
+
+Writes an N-record snapshot, then times StudentManagementSystem construction
+with the default full load and with roster='lazy', both before the offset
+index exists (cold: one scan of the file) and once it is persisted (warm). Also
+reports the latency of the first lookup by ID in lazy mode.
+
+Usage: python -m benchmarks.bench_student_startup [--students 1000000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from StudentManagementSystem import StudentManagementSystem
+from student_storage import JournalStorage
+from benchmarks.bench_student_search import synthetic_students
+
+
+def timed_open(data_file, roster):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = StudentManagementSystem(data_file, roster=roster)
+    return system, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1_000_000)
+    parser.add_argument("--skip-full", action="store_true", help="don't time the full load")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "students.json")
+        JournalStorage(data_file).compact({s.student_id: s.to_dict() for s in synthetic_students(args.students)})
+        os.remove(data_file + ".idx")
+
+        result = {"students": args.students, "snapshot_mb": round(os.path.getsize(data_file) / 1e6, 1)}
+        for label in ("lazy_cold_s", "lazy_warm_s"):
+            system, seconds = timed_open(data_file, "lazy")
+            result[label] = round(seconds, 3)
+            system.close()
+
+        system, _ = timed_open(data_file, "lazy")
+        start = time.perf_counter()
+        system.students[f"STU{args.students // 2:08d}"]
+        result["lazy_first_lookup_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        system.close()
+
+        if not args.skip_full:
+            system, seconds = timed_open(data_file, "dict")
+            result["full_load_s"] = round(seconds, 3)
+            system.close()
+
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Task cache benchmark: GET /tasks/ and /tasks/{id} latency uncached, cached and revalidated
+
+Creates N tasks for one user, then times repeated requests three ways:
+
+    uncached      the task cache cleared before every request (the old behaviour)
+    cached        body served from the task cache
+    not_modified  If-None-Match with the current ETag, answered 304
+
+Usage: python -m benchmarks.bench_task_cache [--tasks 1000] [--requests 500] [--limit 100]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import asgi_client, summarize, temp_app
+from dependencies import task_cache
+
+
+async def timed_gets(client, url, headers, count, clear=False):
+    latencies = []
+    for _ in range(count):
+        if clear:
+            task_cache.clear()
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 304)
+    return latencies
+
+
+async def run(headers, args):
+    async with asgi_client() as client:
+        response = await client.post("/tasks/batch", json={"create": [{"title": f"task {i}"} for i in range(args.tasks)]},
+                                     headers=headers)
+        task_id = response.json()["results"][0]["id"]
+        results = {}
+        for name, url in (("list", f"/tasks/?limit={args.limit}"), ("single", f"/tasks/{task_id}")):
+            etag = (await client.get(url, headers=headers)).headers["etag"]
+            results[name] = {
+                "uncached": summarize(await timed_gets(client, url, headers, args.requests, clear=True)),
+                "cached": summarize(await timed_gets(client, url, headers, args.requests)),
+                "not_modified": summarize(await timed_gets(client, url, {**headers, "If-None-Match": etag}, args.requests)),
+            }
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with temp_app() as (_, headers):
+        results = asyncio.run(run(headers, args))
+    for endpoint, modes in results.items():
+        for mode, summary in modes.items():
+            print(json.dumps({"endpoint": endpoint, "mode": mode, **summary}))
+
+
+if __name__ == "__main__":
+    main()
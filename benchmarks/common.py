@@ -0,0 +1,129 @@
+"""Shared helpers for the API benchmarks: a temp database wired into the app"""
+import asyncio
+import os
+import statistics
+import tempfile
+from contextlib import contextmanager
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth, database, models
+import main
+from dependencies import get_db, get_async_db, task_cache, user_cache
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(latencies):
+    '''Latency summary in milliseconds'''
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+@contextmanager
+def temp_app(username="bench", profile=database.SQLITE_PROFILE):
+    '''Point the app's session dependencies at a throwaway SQLite file with one user,
+    using the given storage profile. Yields (sync sessionmaker, auth headers for that user).'''
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        sync_engine = database.make_engine(f"sqlite:///{db_path}", profile)
+        async_engine = database.make_async_engine(f"sqlite:///{db_path}", profile)
+        models.Base.metadata.create_all(bind=sync_engine)
+        BenchSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+        BenchAsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+        def bench_db():
+            db = BenchSession()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def bench_async_db():
+            async with BenchAsyncSession() as db:
+                yield db
+
+        main.app.dependency_overrides[get_db] = bench_db
+        main.app.dependency_overrides[get_async_db] = bench_async_db
+        # The NDJSON stream and /ws open their own sessions rather than using the dependencies
+        session_factories = main.SessionLocal, main.AsyncSessionLocal
+        main.SessionLocal, main.AsyncSessionLocal = BenchSession, BenchAsyncSession
+        # Cached users and tasks from an earlier run would share ids with this database
+        user_cache.clear()
+        task_cache.clear()
+
+        headers = add_user(BenchSession, username)
+        try:
+            yield BenchSession, headers
+        finally:
+            main.app.dependency_overrides.clear()
+            main.SessionLocal, main.AsyncSessionLocal = session_factories
+            asyncio.run(async_engine.dispose())
+            sync_engine.dispose()
+
+
+def add_user(session_factory, username, password=None):
+    '''Create a user (password defaults to the username), returns auth headers for them'''
+    with session_factory() as db:
+        db.add(models.User(username=username, hashed_password=auth.get_password_hash(password or username)))
+        db.commit()
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+
+
+def asgi_client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+class ASGIWebSocket:
+    '''In-process WebSocket client for the app (httpx only speaks HTTP to ASGI apps)
+
+    async with ASGIWebSocket("/ws", "token=...") as ws: await ws.receive_text()
+    '''
+
+    def __init__(self, path, query_string="", app=None):
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(),
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self.app = app or main.app
+        self._to_app = asyncio.Queue()
+        self._to_client = asyncio.Queue()
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self.app(self.scope, self._to_app.get, self._to_client.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._to_client.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+        return self
+
+    async def receive_text(self):
+        message = await self._to_client.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket closed with code {message.get('code')}")
+        return message["text"] if message.get("text") is not None else message["bytes"].decode()
+
+    async def send_text(self, text):
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def __aexit__(self, *exc_info):
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
@@ -0,0 +1,112 @@
+"""Multi-process stress test for the shared student data file
+
+Starts N writer processes on one data file. Each process adds its own
+students, deletes some of them, and repeatedly increments a shared counter
+(kept in a student's phone field) through a read-modify-write transaction.
+Small compaction thresholds make the processes compact under each other
+throughout. Afterwards the file is reloaded and checked:
+
+    - every add that wasn't deleted is present, and every delete stuck
+    - the counter equals the total number of increments (no lost updates)
+    - every allocated student ID is unique
+
+Exits non-zero on any lost update.
+
+Usage: python -m benchmarks.stress_student_writers [--processes 8] [--ops 200] [--roster dict]
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from StudentManagementSystem import StudentManagementSystem
+from student_storage import JournalStorage
+
+COUNTER_ID = "COUNTER"
+
+
+def open_system(data_file, roster="dict"):
+    storage = JournalStorage(data_file, compact_min=50, compact_ratio=0.2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return StudentManagementSystem(data_file, storage=storage, roster=roster)
+
+
+def writer(data_file, worker, ops, roster, results):
+    added, deleted = [], []
+    try:
+        system = open_system(data_file, roster)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(ops):
+                student = system.add(f"Worker {worker} student {i}", 20, "ABCDF"[i % 5], f"Dept {worker}")
+                added.append(student.student_id)
+                if i % 5 == 4:
+                    deleted.append(system.delete(added[-2]).student_id)
+                with system.transaction():
+                    count = int(system.students[COUNTER_ID].phone)
+                    system.update(COUNTER_ID, phone=str(count + 1))
+            system.close()
+    finally:
+        # Always report back, so a failed worker can't leave the parent waiting
+        results.put((added, deleted))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="adds and counter increments per process")
+    parser.add_argument("--roster", default="dict", choices=["dict", "columnar", "lazy"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "students.json")
+        system = open_system(data_file)
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.add("Shared counter", 20, "A", phone="0", student_id=COUNTER_ID)
+            system.save_students()
+        system.close()
+
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=writer, args=(data_file, n, args.ops, args.roster, results))
+                   for n in range(args.processes)]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        outcomes = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+        seconds = time.perf_counter() - start
+
+        system = open_system(data_file)
+        added = [sid for ids, _ in outcomes for sid in ids]
+        deleted = {sid for _, ids in outcomes for sid in ids}
+        expected = set(added) - deleted
+        present = set(system.students) - {COUNTER_ID}
+        counter = int(system.students[COUNTER_ID].phone)
+        system.close()
+
+    report = {
+        "processes": args.processes,
+        "ops_per_process": args.ops,
+        "seconds": round(seconds, 2),
+        "duplicate_ids": len(added) - len(set(added)),
+        "missing_students": len(expected - present),
+        "resurrected_students": len(present & deleted),
+        "unexpected_students": len(present - expected),
+        "counter": counter,
+        "expected_counter": args.processes * args.ops,
+        "failed_workers": sum(1 for process in workers if process.exitcode != 0),
+    }
+    print(json.dumps(report))
+    ok = (report["duplicate_ids"] == report["missing_students"] == report["resurrected_students"]
+          == report["unexpected_students"] == report["failed_workers"] == 0
+          and counter == report["expected_counter"])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Load-test suite for the Task Manager API, with a stored baseline to gate regressions
+
+Boots the app against a temporary SQLite file (in process, over ASGI) and runs:
+
+    login_burst  concurrent POST /token for several users, as many at a time as the
+                 password pool admits (PASSWORD_MAX_PENDING); latency is of successful
+                 logins, 429 sheds are reported and gated as shed_rate
+    crud_mix     concurrent clients, each its own user, issuing a seeded mix of
+                 list/read/create/update/delete on /tasks/
+    ws_fanout    N /ws clients spread over U users while one writer creates tasks for
+                 each user in turn; latency runs from just before the POST to the
+                 task_created frame (concurrent writes are crud_mix's job)
+
+Each scenario reports throughput and p50/p95/p99 latency, as the median of
+--runs repetitions (each on a fresh database). The whole run is one
+JSON document on stdout (and --output). With --compare, results are checked
+against a baseline recorded with --save-baseline on the same machine and
+settings; a throughput drop or p50/p95 rise past --tolerance, or a shed_rate
+rise past --shed-tolerance, exits 1. The password pool is pinned to
+--password-workers so baselines don't depend on the CPU count.
+
+Usage: python -m benchmarks.suite [--scenarios login_burst,crud_mix,ws_fanout]
+           [--compare] [--save-baseline] [--baseline benchmarks/baseline.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import auth
+import metrics
+import main as app_main
+from benchmarks.common import ASGIWebSocket, add_user, asgi_client, summarize, temp_app
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Relative weights of the crud_mix operations
+CRUD_MIX = {"list": 40, "read": 25, "create": 15, "update": 15, "delete": 5}
+
+
+def result(latencies, elapsed, completed=None, **extra):
+    completed = len(latencies) if completed is None else completed
+    return {"requests": completed, "seconds": round(elapsed, 3),
+            "throughput_per_sec": round(completed / elapsed, 2) if elapsed else 0.0,
+            **summarize(latencies), **extra}
+
+
+async def login_burst(args, session_factory):
+    users = [f"login{i}" for i in range(args.login_users)]
+    for username in users:
+        add_user(session_factory, username)
+    latencies, statuses = [], {}
+    limit = asyncio.Semaphore(args.login_concurrency)
+
+    async def login(client, username):
+        async with limit:
+            start = time.perf_counter()
+            response = await client.post("/token", data={"username": username, "password": username})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async with asgi_client() as client:
+        # Warm the password pool so thread/process start-up isn't counted
+        await login(client, users[0])
+        latencies.clear()
+        statuses.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(login(client, users[i % len(users)]) for i in range(args.logins)))
+        elapsed = time.perf_counter() - start
+    unexpected = {code: count for code, count in statuses.items() if code not in (200, 429)}
+    if unexpected:
+        raise RuntimeError(f"login_burst: unexpected responses {unexpected}")
+    shed = statuses.get(429, 0)
+    return result(latencies, elapsed, shed=shed, shed_rate=round(shed / args.logins, 3) if args.logins else 0.0)
+
+
+async def crud_client(client, headers, rng, ops, latencies):
+    response = await client.post("/tasks/batch", headers=headers,
+                                 json={"create": [{"title": f"seed {i}"} for i in range(50)]})
+    task_ids = [item["id"] for item in response.json()["results"]]
+    names, weights = list(CRUD_MIX), list(CRUD_MIX.values())
+    for i in range(ops):
+        op = rng.choices(names, weights)[0]
+        if op != "list" and op != "create" and not task_ids:
+            op = "create"
+        start = time.perf_counter()
+        if op == "list":
+            response = await client.get("/tasks/?limit=50", headers=headers)
+        elif op == "read":
+            response = await client.get(f"/tasks/{rng.choice(task_ids)}", headers=headers)
+        elif op == "create":
+            response = await client.post("/tasks/", headers=headers, json={"title": f"task {i}", "description": "x" * 40})
+            task_ids.append(response.json()["id"])
+        elif op == "update":
+            response = await client.put(f"/tasks/{rng.choice(task_ids)}", headers=headers,
+                                        json={"completed": rng.random() < 0.5})
+        else:
+            task_id = task_ids.pop(rng.randrange(len(task_ids)))
+            response = await client.delete(f"/tasks/{task_id}", headers=headers)
+        latencies[op].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"crud_mix: {op} returned {response.status_code}: {response.text}")
+
+
+async def crud_mix(args, session_factory):
+    clients = [add_user(session_factory, f"crud{i}") for i in range(args.clients)]
+    latencies = {op: [] for op in CRUD_MIX}
+    rngs = [random.Random(args.seed * 1000 + i) for i in range(args.clients)]
+    async with asgi_client() as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(crud_client(client, headers, rng, args.ops, latencies)
+                               for headers, rng in zip(clients, rngs)))
+        elapsed = time.perf_counter() - start
+    every = [seconds for op_latencies in latencies.values() for seconds in op_latencies]
+    return result(every, elapsed, operations={op: summarize(op_latencies) for op, op_latencies in latencies.items()})
+
+
+async def ws_reader(ws, expected, sent_at, latencies):
+    received = 0
+    while received < expected:
+        text = await ws.receive_text()
+        if text in ("ping", "pong"):
+            continue
+        message = json.loads(text)
+        if message["type"] == "task_created":
+            latencies.append(time.perf_counter() - sent_at[message["task"]["title"]])
+            received += 1
+
+
+async def ws_fanout(args, session_factory):
+    users = [f"ws{i}" for i in range(args.ws_users)]
+    headers = [add_user(session_factory, username) for username in users]
+    tokens = [auth.create_access_token({"sub": username}) for username in users]
+    sockets = [ASGIWebSocket("/ws", f"token={tokens[i % len(users)]}") for i in range(args.ws_clients)]
+    latencies, sent_at = [], {}
+
+    async with contextlib.AsyncExitStack() as stack:
+        for ws in sockets:
+            await stack.enter_async_context(ws)
+            if json.loads(await ws.receive_text())["type"] != "initial_tasks":
+                raise RuntimeError("ws_fanout: no initial snapshot")
+
+        async with asgi_client() as client:
+            start = time.perf_counter()
+            readers = [asyncio.create_task(ws_reader(ws, args.events, sent_at, latencies)) for ws in sockets]
+            for i in range(args.events):
+                for username, user_headers in zip(users, headers):
+                    title = f"{username} event {i}"
+                    sent_at[title] = time.perf_counter()
+                    response = await client.post("/tasks/", headers=user_headers, json={"title": title})
+                    if response.status_code != 200:
+                        raise RuntimeError(f"ws_fanout: create returned {response.status_code}")
+            await asyncio.wait_for(asyncio.gather(*readers), timeout=args.ws_timeout)
+            elapsed = time.perf_counter() - start
+    return result(latencies, elapsed, events=args.events * len(users))
+
+
+SCENARIOS = {"login_burst": login_burst, "crud_mix": crud_mix, "ws_fanout": ws_fanout}
+
+
+def median_result(runs):
+    '''Median of every number across the results of repeated runs'''
+    first = runs[0]
+    if isinstance(first, dict):
+        return {key: median_result([run[key] for run in runs]) for key in first}
+    if isinstance(first, (int, float)):
+        return round(statistics.median(runs), 2)
+    return first
+
+
+def settings(args):
+    '''Everything a baseline has to share with a run for the two to be comparable'''
+    return {
+        "scenarios": args.scenarios,
+        "runs": args.runs,
+        "seed": args.seed,
+        "logins": args.logins, "login_users": args.login_users, "login_concurrency": args.login_concurrency,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "password_executor": auth.PASSWORD_EXECUTOR, "password_workers": args.password_workers,
+        "clients": args.clients, "ops": args.ops,
+        "ws_clients": args.ws_clients, "ws_users": args.ws_users, "events": args.events,
+        "metrics_enabled": metrics.ENABLED,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(scenario, args, session_factory):
+    await app_main.manager.broker.start()
+    try:
+        return await scenario(args, session_factory)
+    finally:
+        await app_main.manager.broker.stop()
+
+
+def run(args):
+    results = {}
+    for name in args.scenarios:
+        runs = []
+        for _ in range(args.runs):
+            # A fresh database per run so none of them measures another's leftovers;
+            # the endpoints' own prints would otherwise interleave with the JSON on stdout
+            with temp_app(f"suite_{name}") as (session_factory, _), contextlib.redirect_stdout(sys.stderr):
+                runs.append(asyncio.run(run_scenario(SCENARIOS[name], args, session_factory)))
+        results[name] = median_result(runs)
+        print(f"{name}: {results[name]['throughput_per_sec']}/s p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+    auth.shutdown_password_executor()
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": settings(args),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance, min_delta_ms, shed_tolerance):
+    '''Regressions of report against baseline, as human-readable strings'''
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        floor = previous["throughput_per_sec"] * (1 - tolerance)
+        if current["throughput_per_sec"] < floor:
+            regressions.append(f"{name}: throughput {current['throughput_per_sec']}/s < "
+                               f"{previous['throughput_per_sec']}/s - {tolerance:.0%}")
+        for key in ("p50_ms", "p95_ms"):
+            ceiling = max(previous[key] * (1 + tolerance), previous[key] + min_delta_ms)
+            if current[key] > ceiling:
+                regressions.append(f"{name}: {key} {current[key]} > {previous[key]} + {tolerance:.0%}")
+        if "shed_rate" in previous and current["shed_rate"] > previous["shed_rate"] + shed_tolerance:
+            regressions.append(f"{name}: shed_rate {current['shed_rate']} > {previous['shed_rate']} + {shed_tolerance}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per scenario, the median is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--login-users", type=int, default=8)
+    parser.add_argument("--login-concurrency", type=int, default=None,
+                        help="logins in flight at once (default PASSWORD_MAX_PENDING, so none should shed)")
+    parser.add_argument("--password-workers", type=int, default=1, help="password pool size, pinned for comparability")
+    parser.add_argument("--bcrypt-rounds", type=int, default=auth.BCRYPT_ROUNDS)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="operations per crud_mix client")
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-users", type=int, default=5)
+    parser.add_argument("--events", type=int, default=50, help="tasks created per ws_fanout user")
+    parser.add_argument("--ws-timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="exit 1 if this run regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="latency rises below this are never regressions")
+    parser.add_argument("--shed-tolerance", type=float, default=0.05, help="allowed rise in login shed_rate")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            parser.error(f"no baseline at {args.baseline}, record one with --save-baseline")
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)  # inherited by process workers
+    auth.pwd_context.update(bcrypt__rounds=args.bcrypt_rounds)
+    auth.shutdown_password_executor()
+    auth.PASSWORD_WORKERS = args.password_workers
+    auth.PASSWORD_MAX_PENDING = args.password_workers * 4
+    if args.login_concurrency is None:
+        args.login_concurrency = auth.PASSWORD_MAX_PENDING
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+
+    if baseline is not None:
+        if baseline["meta"]["settings"] != report["meta"]["settings"]:
+            print(f"Baseline {args.baseline} was recorded with different settings, not comparable", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms, args.shed_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,343 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+
+class TTLCache:
+    '''Thread-safe LRU cache whose entries also expire after a time-to-live'''
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        '''Return the cached value, or None if missing or expired'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        '''Store a value; ttl overrides the default time-to-live for this entry'''
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        '''Drop every entry whose value matches predicate, returns how many were dropped'''
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Rough in-memory footprint of one cached task dict beyond its strings
+TASK_OVERHEAD_BYTES = 400
+# ... and of one cached response beyond its body
+RESPONSE_OVERHEAD_BYTES = 200
+
+
+def _task_bytes(task: dict) -> int:
+    return TASK_OVERHEAD_BYTES + len(task["title"]) + len(task["description"] or "")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    '''True if an If-None-Match header names etag (weak comparison, as RFC 9110 asks for)'''
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class _UserTasks:
+    __slots__ = ("tasks", "items", "responses", "size", "stamp", "expires_at", "seq")
+
+    def __init__(self, stamp: int, expires_at: float):
+        self.tasks: Optional[Dict[int, dict]] = None  # every task of the user, in (created_at, id) order
+        self.items: Dict[int, dict] = {}  # tasks loaded one at a time
+        self.responses: Dict[Hashable, CachedResponse] = {}
+        self.size = 0
+        self.stamp = stamp  # clock of the last write seen for this user
+        self.expires_at = expires_at
+        self.seq: Optional[int] = None  # change-log seq the entry reflects, if check_seq() tracks it
+
+
+class TaskCache:
+    '''Per-user cache of task dicts and encoded task responses with their ETags.
+
+    Entries are LRU by user and evicted once the approximate size of all of them
+    passes max_bytes. Mutation handlers write through: put/remove patch the
+    user's task dicts and drop their encoded responses, since any write can change
+    a page. Reads call begin() before going to the database and pass the token to
+    the store_* methods, which refuse to cache a result if the user was written to
+    in between. invalidate() drops a user outright (e.g. on a write made by another
+    worker), and the TTL bounds staleness from writes this process never hears of.
+
+    With several workers those invalidations can be lost, so reads first pass the
+    user's latest change-log seq to check_seq(); from then on the entry only stays
+    while every write it sees follows on from the seq it reflects.
+    '''
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, _UserTasks]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._clock = 0
+        # Clock of the latest write to a user with no entry (or whose entry was dropped)
+        self._untracked = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def begin(self) -> int:
+        '''Token for a read that may fill the cache, take it before querying'''
+        with self._lock:
+            return self._clock
+
+    def _entry(self, user_id: int) -> Optional[_UserTasks]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry.expires_at <= time.monotonic():
+                self._drop(user_id)
+                return None
+            self._entries.move_to_end(user_id)
+        return entry
+
+    def _fillable(self, user_id: int, token: int) -> Optional[_UserTasks]:
+        '''The user's entry, created if needed, or None if it was written since token'''
+        entry = self._entry(user_id)
+        if entry is None:
+            if self._untracked > token:
+                return None
+            entry = self._entries[user_id] = _UserTasks(self._untracked, time.monotonic() + self.ttl)
+        return entry if entry.stamp <= token else None
+
+    def _drop(self, user_id: int):
+        entry = self._entries.pop(user_id)
+        self._bytes -= entry.size
+        # Later fills can't tell what this entry saw, so they have to respect its writes
+        self._untracked = max(self._untracked, entry.stamp)
+
+    def _resize(self, entry: _UserTasks, delta: int):
+        entry.size += delta
+        self._bytes += delta
+
+    def _evict(self):
+        # Run once an operation is done with its entry, which may itself be the one to go
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _written(self, user_id: int, seq: Optional[int], previous_seq: Optional[int]) -> Optional[_UserTasks]:
+        self._clock += 1
+        entry = self._entry(user_id)
+        if entry is not None and entry.seq is not None:
+            if seq is not None and previous_seq == entry.seq:
+                entry.seq = seq
+            else:
+                # A write we never heard of came in between, the entry can't be patched
+                self._drop(user_id)
+                entry = None
+        if entry is None:
+            self._untracked = self._clock
+            return None
+        entry.stamp = self._clock
+        self._resize(entry, -sum(len(cached.body) + RESPONSE_OVERHEAD_BYTES for cached in entry.responses.values()))
+        entry.responses.clear()
+        return entry
+
+    def check_seq(self, user_id: int, seq: int):
+        '''Drop the user's entry unless it reflects change-log seq; data cached for the
+        user afterwards is taken to reflect seq (read it before querying)'''
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is not None and entry.seq == seq:
+                return
+            self._clock += 1
+            self._untracked = self._clock
+            if entry is not None:
+                self._drop(user_id)
+            entry = self._entries[user_id] = _UserTasks(self._untracked, time.monotonic() + self.ttl)
+            entry.seq = seq
+
+    def response(self, user_id: int, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entry(user_id)
+            cached = entry.responses.get(key) if entry is not None else None
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return cached
+
+    def store_response(self, user_id: int, key: Hashable, body: bytes, headers: Dict[str, str], token: int) -> CachedResponse:
+        '''Wrap body with its ETag, caching it unless the user was written since token'''
+        cached = CachedResponse(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', headers)
+        with self._lock:
+            entry = self._fillable(user_id, token)
+            if entry is not None:
+                previous = entry.responses.get(key)
+                entry.responses[key] = cached
+                self._resize(entry, len(body) - (len(previous.body) if previous else -RESPONSE_OVERHEAD_BYTES))
+                self._evict()
+        return cached
+
+    def tasks(self, user_id: int) -> Optional[List[dict]]:
+        '''Every task of the user in (created_at, id) order, if cached'''
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None or entry.tasks is None:
+                return None
+            return list(entry.tasks.values())
+
+    def store_tasks(self, user_id: int, tasks: List[dict], token: int):
+        size = sum(_task_bytes(task) for task in tasks)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            entry = self._fillable(user_id, token)
+            if entry is not None:
+                # The full list covers the one-at-a-time loads
+                previous = sum(_task_bytes(task) for task in (entry.tasks or entry.items).values())
+                entry.tasks = {task["id"]: task for task in tasks}
+                entry.items = {}
+                self._resize(entry, size - previous)
+                self._evict()
+
+    def task(self, user_id: int, task_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                return None
+            if entry.tasks is not None:
+                return entry.tasks.get(task_id)
+            return entry.items.get(task_id)
+
+    def store_task(self, user_id: int, task: dict, token: int):
+        with self._lock:
+            entry = self._fillable(user_id, token)
+            if entry is not None and entry.tasks is None:
+                self._set_item(entry, task)
+                self._evict()
+
+    def _set_item(self, entry: _UserTasks, task: dict):
+        previous = entry.items.get(task["id"])
+        entry.items[task["id"]] = task
+        self._resize(entry, _task_bytes(task) - (_task_bytes(previous) if previous else 0))
+
+    def put(self, user_id: int, task: dict, seq: Optional[int] = None, previous_seq: Optional[int] = None):
+        '''Write-through for a created or updated task (seq and previous_seq from its event)'''
+        with self._lock:
+            entry = self._written(user_id, seq, previous_seq)
+            if entry is None:
+                return
+            if entry.tasks is None:
+                self._set_item(entry, task)
+            else:
+                previous = entry.tasks.get(task["id"])
+                if previous is not None:
+                    entry.tasks[task["id"]] = task
+                    self._resize(entry, _task_bytes(task) - _task_bytes(previous))
+                elif not entry.tasks or self._sort_key(task) > self._sort_key(next(reversed(entry.tasks.values()))):
+                    entry.tasks[task["id"]] = task
+                    self._resize(entry, _task_bytes(task))
+                else:
+                    # Lands mid-list; cheaper to reload than to re-sort
+                    self._resize(entry, -sum(_task_bytes(cached) for cached in entry.tasks.values()))
+                    entry.tasks = None
+                    self._set_item(entry, task)
+            self._evict()
+
+    @staticmethod
+    def _sort_key(task: dict):
+        return task["created_at"], task["id"]
+
+    def remove(self, user_id: int, task_id: int, seq: Optional[int] = None, previous_seq: Optional[int] = None):
+        '''Write-through for a deleted task'''
+        with self._lock:
+            entry = self._written(user_id, seq, previous_seq)
+            if entry is None:
+                return
+            for tasks in (entry.tasks, entry.items):
+                if tasks is not None and task_id in tasks:
+                    self._resize(entry, -_task_bytes(tasks.pop(task_id)))
+
+    def invalidate(self, user_id: int):
+        '''Forget everything cached for a user'''
+        with self._lock:
+            self._clock += 1
+            self._untracked = self._clock
+            if user_id in self._entries:
+                self._drop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._untracked = self._clock
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,301 @@
+"""Calculator expression engine: tokenizer, parser, cached evaluation plans, batch and NumPy modes"""
+import math
+import os
+import re
+from functools import lru_cache
+
+PLAN_CACHE_SIZE = int(os.getenv("CALC_PLAN_CACHE_SIZE", "4096"))
+
+_TOKEN = re.compile(r"""
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>\*\*|//|[-+*/%^()])
+  | (?P<space>\s+)
+""", re.VERBOSE)
+
+# Binary operators: precedence and whether they group to the right. Unary +/- sit
+# between * and **, so -2 ** 2 is -(2 ** 2) as in Python.
+_BINARY = {'+': (1, False), '-': (1, False), '*': (2, False), '/': (2, False), '//': (2, False),
+           '%': (2, False), '**': (4, True), '^': (4, True)}
+_UNARY_PRECEDENCE = 3
+# Numbers, variables and calls in generated source, never parenthesized
+_ATOM = 5
+# Operators that can divide by zero: checked per element in the vectorized plan
+_DIVISION = {'/': 'divide', '//': 'floor_divide', '%': 'mod'}
+
+
+class ExpressionError(ValueError):
+    '''An expression that can't be parsed or compiled, is evaluated without all its
+    variables, or has no real-valued result'''
+
+    def __init__(self, message, position=None):
+        super().__init__(message if position is None else f"{message} at position {position + 1}")
+        self.position = position
+
+
+def tokenize(text):
+    '''Split text into (kind, value, position) tuples, kind being number, name or op'''
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ExpressionError(f"Unexpected character {text[position]!r}", position)
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group(), position))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    '''Precedence-climbing parser producing nested tuples:
+    ('num', value), ('var', name), ('neg', operand) or (operator, left, right)'''
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None, len(self.text))
+
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError("Empty expression")
+        node = self.expression(1)
+        kind, value, position = self.peek()
+        if kind is not None:
+            raise ExpressionError(f"Unexpected {value!r}", position)
+        return node
+
+    def expression(self, min_precedence):
+        node = self.unary()
+        while True:
+            kind, value, _ = self.peek()
+            if kind != 'op' or value not in _BINARY or _BINARY[value][0] < min_precedence:
+                return node
+            precedence, right_assoc = _BINARY[value]
+            self.pos += 1
+            right = self.expression(precedence if right_assoc else precedence + 1)
+            node = ('**' if value == '^' else value, node, right)
+
+    def unary(self):
+        kind, value, _ = self.peek()
+        if kind == 'op' and value in '+-':
+            self.pos += 1
+            operand = self.expression(_UNARY_PRECEDENCE)
+            return ('neg', operand) if value == '-' else operand
+        return self.primary()
+
+    def primary(self):
+        kind, value, position = self.peek()
+        if kind is None:
+            raise ExpressionError("Unexpected end of expression", position)
+        self.pos += 1
+        if kind == 'number':
+            number = float(value)
+            if math.isinf(number):
+                raise ExpressionError(f"Number {value} is too large", position)
+            return ('num', number)
+        if kind == 'name':
+            return ('var', value)
+        if value == '(':
+            node = self.expression(1)
+            kind, value, position = self.peek()
+            if value != ')':
+                raise ExpressionError("Missing ')'", position)
+            self.pos += 1
+            return node
+        raise ExpressionError(f"Unexpected {value!r}", position)
+
+
+def parse(text):
+    '''Parse an arithmetic expression into a tree, see _Parser'''
+    try:
+        return _Parser(text).parse()
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply") from None
+
+
+def _source(node, params, vectorized):
+    '''Python source for a parsed tree; variables become the positional params.
+    Returns (source, precedence) and only parenthesizes where Python's own precedence
+    differs from the tree, since CPython refuses sources nested ~200 parentheses deep.'''
+    kind = node[0]
+    if kind == 'num':
+        return repr(node[1]), _ATOM
+    if kind == 'var':
+        return params.setdefault(node[1], f"_v{len(params)}"), _ATOM
+    if kind == 'neg':
+        operand, precedence = _source(node[1], params, vectorized)
+        return f"-{_wrap(operand, precedence < _UNARY_PRECEDENCE)}", _UNARY_PRECEDENCE
+    precedence, right_assoc = _BINARY[kind]
+    if not right_assoc and not (vectorized and kind in _DIVISION):
+        return _chain_source(node, precedence, params, vectorized), precedence
+    left, left_precedence = _source(node[1], params, vectorized)
+    right, right_precedence = _source(node[2], params, vectorized)
+    if vectorized and kind in _DIVISION:
+        return f"_checked(_errors, _np.{_DIVISION[kind]}, {left}, {right})", _ATOM
+    return f"{_wrap(left, left_precedence <= precedence)} {kind} {_wrap(right, right_precedence < precedence)}", precedence
+
+
+def _chain_source(node, precedence, params, vectorized):
+    '''Source for a left-leaning run of same-precedence operators (a + b - c + ...),
+    walked in a loop so a long sum doesn't recurse once per term'''
+    operations = []
+    while (node[0] in _BINARY and _BINARY[node[0]] == (precedence, False)
+           and not (vectorized and node[0] in _DIVISION)):
+        operations.append((node[0], node[2]))
+        node = node[1]
+    left, left_precedence = _source(node, params, vectorized)
+    parts = [_wrap(left, left_precedence < precedence)]
+    for kind, operand in reversed(operations):
+        right, right_precedence = _source(operand, params, vectorized)
+        parts.append(f"{kind} {_wrap(right, right_precedence <= precedence)}")
+    return " ".join(parts)
+
+
+def _wrap(source, needed):
+    return f"({source})" if needed else source
+
+
+def _compile(tree, vectorized, extra_params='', namespace=None):
+    '''Turn a parsed tree into (variable names, function), raising ExpressionError
+    for trees too big or deep for Python to compile'''
+    params = {}
+    try:
+        source, _ = _source(tree, params, vectorized)
+        function = eval(f"lambda {extra_params}{', '.join(params.values())}: {source}",
+                        {'__builtins__': {}, **(namespace or {})})
+    except (SyntaxError, RecursionError, MemoryError):
+        raise ExpressionError("Expression is too long or nested too deeply") from None
+    return tuple(params), function
+
+
+def _checked(errors, operation, left, right):
+    '''Vectorized division with the divide-by-zero check done per element.
+    Elements with a zero divisor come out as NaN and are recorded in errors.'''
+    np = _numpy()
+    zero = np.equal(right, 0)
+    if not np.any(zero):
+        return operation(left, right)
+    errors.append(zero)
+    return np.where(zero, np.nan, operation(left, np.where(zero, 1.0, right)))
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("'numpy' is required for vectorized evaluation") from None
+    return np
+
+
+class Plan:
+    '''A compiled expression: the parsed tree turned into a Python function once,
+    so evaluating it again costs one call instead of a tokenize/parse/walk.
+
+    Calling the plan evaluates it for one set of variable values. evaluate_columns
+    evaluates it over NumPy arrays in one pass, compiled separately on first use.
+    '''
+    __slots__ = ('text', 'variables', '_tree', '_scalar', '_vector')
+
+    def __init__(self, text):
+        self.text = text
+        self._tree = parse(text)
+        self.variables, self._scalar = _compile(self._tree, vectorized=False)
+        self._vector = None
+
+    def _arguments(self, values, convert):
+        try:
+            return [convert(values[name]) for name in self.variables]
+        except KeyError as e:
+            raise ExpressionError(f"No value given for '{e.args[0]}'") from None
+
+    def __call__(self, **values):
+        '''Evaluate for one set of variables
+
+        Raises:
+            ZeroDivisionError: dividing by zero
+            OverflowError: the result doesn't fit in a float
+            ExpressionError: the result isn't a real number, e.g. (-8) ^ 0.5
+        '''
+        try:
+            result = self._scalar(*self._arguments(values, float))
+        except TypeError:
+            # A complex intermediate reached // or %, which Python refuses for complex
+            result = None
+        if not isinstance(result, float):
+            raise ExpressionError("Result is not a real number")
+        return result
+
+    def evaluate_columns(self, **columns):
+        '''Evaluate over arrays of operands (anything np.asarray takes, broadcast together)
+
+        Returns (values, errors): a float array of results and a boolean array that
+        is True where that element divided by zero; those results are NaN.
+        '''
+        np = _numpy()
+        if self._vector is None:
+            _, self._vector = _compile(self._tree, True, '_errors, ', {'_np': np, '_checked': _checked})
+        arrays = self._arguments(columns, lambda column: np.asarray(column, dtype=np.float64))
+        errors = []
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            values = self._vector(errors, *arrays)
+        shape = np.broadcast_shapes(*(array.shape for array in arrays))
+        values = np.array(np.broadcast_to(values, shape), dtype=np.float64)
+        mask = np.zeros(shape, dtype=bool)
+        for zero in errors:
+            mask |= zero
+        return values, mask
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_expression(text):
+    '''Plan for text, memoized per expression string'''
+    return Plan(text)
+
+
+def evaluate(text, **variables):
+    '''Evaluate one expression through its cached plan'''
+    return compile_expression(text)(**variables)
+
+
+def evaluate_columns(text, **columns):
+    '''Vectorized evaluate, see Plan.evaluate_columns'''
+    return compile_expression(text).evaluate_columns(**columns)
+
+
+def error_message(error):
+    '''The calculator's wording for an evaluation error'''
+    if isinstance(error, ZeroDivisionError):
+        return "Cannot divide by zero"
+    if isinstance(error, OverflowError):
+        return "Result is too large"
+    return str(error)
+
+
+def evaluate_many(lines, **variables):
+    '''Evaluate one expression per line; blank lines and # comments are skipped
+
+    Yields (line_number, expression, result, error) for each expression. A failed
+    expression has result None and an error message; the rest carry on.
+    '''
+    for line_number, line in enumerate(lines, 1):
+        expression = line.strip()
+        if not expression or expression.startswith('#'):
+            continue
+        try:
+            yield line_number, expression, evaluate(expression, **variables), None
+        except (ArithmeticError, ExpressionError) as e:
+            yield line_number, expression, None, error_message(e)
+
+
+def evaluate_file(path, **variables):
+    '''evaluate_many over a file of expressions ('-' for stdin)'''
+    import sys
+    if path == '-':
+        yield from evaluate_many(sys.stdin, **variables)
+        return
+    with open(path, 'r') as file:
+        yield from evaluate_many(file, **variables)
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from fastapi import WebSocket
+
+import metrics
+import pubsub
+import serializers
+
+# Messages buffered per socket before the slow-consumer policy kicks in
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+# drop: discard the oldest queued message
+# coalesce: collapse the backlog into one resync_required message, the client then reloads
+# disconnect: close the socket, the client reconnects and gets a fresh snapshot
+SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")
+SLOW_CONSUMER_POLICIES = ("drop", "coalesce", "disconnect")
+
+log = logging.getLogger("task_manager.websocket")
+
+RESYNC_MESSAGE = json.dumps({"type": "resync_required"})
+# How long a closing socket gets to send what's queued ahead of its last message
+FINISH_TIMEOUT = float(os.getenv("WS_FINISH_TIMEOUT", "5"))
+
+
+def _seq(text: str) -> Optional[int]:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    return message.get("seq") if isinstance(message, dict) else None
+
+
+class SocketSender:
+    '''Owns all sends to one WebSocket through a bounded queue and a writer task.
+
+    A new sender holds live messages until release() queues the socket's snapshot
+    or delta, so no event can overtake the state it applies to. When a send fails or
+    the policy disconnects, the socket is closed and on_close unregisters it.'''
+
+    def __init__(self, websocket: WebSocket, queue_size: int = SEND_QUEUE_SIZE, policy: str = SLOW_CONSUMER_POLICY,
+                 on_close: Optional[Callable[[], None]] = None):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.websocket = websocket
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+        self._held: Optional[List[str]] = []
+        self._held_overflow = False
+        self._closing: Optional[asyncio.Task] = None  # the disconnect policy's close, kept until done
+        self.on_close = on_close
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def stop(self):
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    def release(self, first: str, seq: Optional[int] = None):
+        '''Queue first (the snapshot or delta, as of seq), then the live messages held
+        since connect that it doesn't already cover'''
+        held, self._held = self._held or [], None
+        self.offer(first)
+        if self._held_overflow:
+            self.offer(RESYNC_MESSAGE)
+            return
+        for text in held:
+            held_seq = _seq(text)
+            if seq is None or held_seq is None or held_seq > seq:
+                self.offer(text)
+
+    async def finish(self, text: str, timeout: float = FINISH_TIMEOUT):
+        '''Send a last message behind everything already queued, then stop the writer.
+        Live messages still held are dropped, the socket is going away.'''
+        self._held = None
+        self.offer(text)
+        writer = self._writer
+        if writer is None or self.closed:
+            return
+        try:
+            # None tells the writer to return once it has sent what's ahead of it
+            await asyncio.wait_for(self.queue.put(None), timeout)
+            await asyncio.wait_for(writer, timeout)
+        except Exception:
+            pass
+        self.stop()
+
+    def offer(self, text: str) -> bool:
+        '''Queue an already-encoded message without waiting for delivery'''
+        if self.closed:
+            return False
+        if self._held is not None:
+            if self.queue.maxsize and len(self._held) >= self.queue.maxsize:
+                # Too much happened while the snapshot loaded, have the client reload
+                self._held.clear()
+                self._held_overflow = True
+            elif not self._held_overflow:
+                self._held.append(text)
+            return True
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.dropped += 1
+        if metrics.ENABLED:
+            metrics.ws_dropped.inc(1, self.policy)
+        if self.policy == "drop":
+            self.queue.get_nowait()
+            self.queue.put_nowait(text)
+        elif self.policy == "coalesce":
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+        else:
+            self.closed = True
+            self._closing = asyncio.create_task(self._close(code=1013))
+            self._closing.add_done_callback(self._closed)
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                if text is None:
+                    return
+                if metrics.ENABLED:
+                    start = time.perf_counter()
+                    await self.websocket.send_text(text)
+                    metrics.ws_send_seconds.observe(time.perf_counter() - start)
+                else:
+                    await self.websocket.send_text(text)
+        except Exception:
+            # A socket we can't write to is gone; don't leave it registered until the
+            # receive loop happens to notice
+            self._writer = None
+            await self._close(code=1011)
+
+    def _closed(self, task: asyncio.Task):
+        self._closing = None
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Closing a slow WebSocket failed", exc_info=task.exception())
+
+    async def _close(self, code: int):
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+        if self.on_close is not None:
+            self.on_close()
+
+
+class ConnectionManager:
+    def __init__(self, queue_size: int = SEND_QUEUE_SIZE, policy: str = SLOW_CONSUMER_POLICY, broker=None):
+        self.active_connections: Dict[int, Dict[WebSocket, SocketSender]] = {}
+        self.queue_size = queue_size
+        self.policy = policy
+        # Published messages come back through broadcast_text, in this and every other worker
+        self.broker = broker if broker is not None else pubsub.create_broker()
+        self.broker.set_handler(self.broadcast_text)
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> SocketSender:
+        '''Register a socket for live messages, which are held until sender.release()'''
+        # The endpoint has already accepted the socket so it can report auth errors
+        sender = SocketSender(websocket, self.queue_size, self.policy,
+                              on_close=lambda: self.disconnect(websocket, user_id))
+        sender.start()
+        self.active_connections.setdefault(user_id, {})[websocket] = sender
+        return sender
+
+    def disconnect(self, websocket: WebSocket, user_id: int):
+        if user_id in self.active_connections:
+            sender = self.active_connections[user_id].pop(websocket, None)
+            if sender is not None:
+                sender.stop()
+            if not self.active_connections[user_id]:
+                del self.active_connections[user_id]
+
+    def broadcast_text(self, text: str, user_id: int) -> int:
+        '''Queue pre-encoded text on every socket of a user, returns how many accepted it'''
+        senders = self.active_connections.get(user_id)
+        if not senders:
+            return 0
+        if not metrics.ENABLED:
+            return sum(sender.offer(text) for sender in list(senders.values()))
+        start = time.perf_counter()
+        accepted = sum(sender.offer(text) for sender in list(senders.values()))
+        metrics.ws_fanout_seconds.observe(time.perf_counter() - start)
+        metrics.ws_fanout_sockets.observe(len(senders))
+        return accepted
+
+    def stats(self) -> dict:
+        '''Connection and send-queue totals, read by /metrics'''
+        senders = [sender for user_senders in self.active_connections.values() for sender in user_senders.values()]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(senders),
+            "queued": sum(sender.queue.qsize() for sender in senders),
+        }
+
+    def publish(self, message: dict, user_id: int, previous_seq: Optional[int] = None):
+        '''Queue a message for every socket of a user without waiting, safe to call from
+        plain callbacks on the event loop. previous_seq is the user's seq before the
+        message's first change, for gap detection in other workers.'''
+        # Encoded once for all of the user's sockets; delivery happens on each writer task
+        if user_id in self.active_connections or self.broker.cross_process:
+            self.broker.publish(serializers.dumps_text(message), user_id, message.get("seq"), previous_seq)
@@ -0,0 +1,259 @@
+import base64
+import os
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models, schemas
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+# Changes kept per user for WebSocket resync; older cursors get a full snapshot
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", "1000"))
+
+
+def user_by_username_stmt(username: str):
+    return select(models.User).filter(models.User.username == username).limit(1)
+
+
+def task_stmt(task_id: int, owner_id: int):
+    return select(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == owner_id).limit(1)
+
+
+def all_tasks_stmt(owner_id: int):
+    return select(models.Task).filter(models.Task.owner_id == owner_id).order_by(models.Task.created_at, models.Task.id)
+
+
+def tasks_by_ids_stmt(owner_id: int, task_ids):
+    return (
+        select(models.Task)
+        .filter(models.Task.owner_id == owner_id, models.Task.id.in_(task_ids))
+        .order_by(models.Task.created_at, models.Task.id)
+    )
+
+
+def owned_task_ids_stmt(owner_id: int, task_ids):
+    return select(models.Task.id).filter(models.Task.owner_id == owner_id, models.Task.id.in_(task_ids))
+
+
+def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
+    return db.execute(user_by_username_stmt(username)).scalars().first()
+
+
+def get_task(db: Session, task_id: int, owner_id: int) -> Optional[models.Task]:
+    return db.execute(task_stmt(task_id, owner_id)).scalars().first()
+
+
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[models.User]:
+    result = await db.execute(user_by_username_stmt(username))
+    return result.scalars().first()
+
+
+async def get_task_async(db: AsyncSession, task_id: int, owner_id: int) -> Optional[models.Task]:
+    result = await db.execute(task_stmt(task_id, owner_id))
+    return result.scalars().first()
+
+
+async def get_all_tasks_async(db: AsyncSession, owner_id: int) -> List[models.Task]:
+    result = await db.execute(all_tasks_stmt(owner_id))
+    return list(result.scalars())
+
+
+def trim_change_log_stmt(owner_id: int):
+    cutoff = (
+        select(models.TaskChange.seq)
+        .filter(models.TaskChange.owner_id == owner_id)
+        .order_by(models.TaskChange.seq.desc())
+        .offset(CHANGE_LOG_SIZE)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return delete(models.TaskChange).filter(models.TaskChange.owner_id == owner_id, models.TaskChange.seq <= cutoff)
+
+
+def update_tasks_stmt(owner_id: int, task_ids, fields: dict):
+    return (
+        update(models.Task)
+        .filter(models.Task.owner_id == owner_id, models.Task.id.in_(task_ids))
+        .values(fields)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_tasks_stmt(owner_id: int, task_ids):
+    return (
+        delete(models.Task)
+        .filter(models.Task.owner_id == owner_id, models.Task.id.in_(task_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_task_batch_async(db: AsyncSession, owner_id: int, batch: schemas.TaskBatch):
+    '''Apply a batch in the caller's transaction with one statement per operation kind
+    (one per distinct field set for updates). Returns (created, updated, deleted ids,
+    missing ids) where missing are update/delete ids the user doesn't own.'''
+    requested_ids = {item.id for item in batch.update} | set(batch.delete)
+    owned = set()
+    if requested_ids:
+        owned = set((await db.execute(owned_task_ids_stmt(owner_id, requested_ids))).scalars())
+
+    created = []
+    if batch.create:
+        result = await db.execute(
+            insert(models.Task).returning(models.Task),
+            [{**task.model_dump(), "owner_id": owner_id} for task in batch.create],
+        )
+        created = list(result.scalars())
+
+    # "Mark all done" style batches share one field set and become a single UPDATE
+    groups = {}
+    for item in batch.update:
+        if item.id not in owned:
+            continue
+        fields = {var: value for var, value in item.model_dump(exclude={"id"}).items() if value is not None}
+        groups.setdefault(tuple(sorted(fields.items())), []).append(item.id)
+    for fields, ids in groups.items():
+        if fields:
+            await db.execute(update_tasks_stmt(owner_id, ids, dict(fields)))
+    updated_ids = [task_id for ids in groups.values() for task_id in ids]
+    updated = []
+    if updated_ids:
+        result = await db.execute(
+            tasks_by_ids_stmt(owner_id, updated_ids).execution_options(populate_existing=True)
+        )
+        updated = list(result.scalars())
+
+    deleted = [task_id for task_id in batch.delete if task_id in owned]
+    if deleted:
+        await db.execute(delete_tasks_stmt(owner_id, deleted))
+
+    return created, updated, deleted, requested_ids - owned
+
+
+def latest_seq_stmt(owner_id: int):
+    return select(func.max(models.TaskChange.seq)).filter(models.TaskChange.owner_id == owner_id)
+
+
+def latest_seqs_stmt(owner_ids):
+    '''Latest seq of each owner that has one, as (owner_id, seq) rows'''
+    return (
+        select(models.TaskChange.owner_id, func.max(models.TaskChange.seq))
+        .filter(models.TaskChange.owner_id.in_(owner_ids))
+        .group_by(models.TaskChange.owner_id)
+    )
+
+
+def change_log_bounds_stmt(owner_id: int):
+    return select(func.min(models.TaskChange.seq), func.count()).filter(models.TaskChange.owner_id == owner_id)
+
+
+def changes_since_stmt(owner_id: int, since: int):
+    return (
+        select(models.TaskChange.seq, models.TaskChange.task_id)
+        .filter(models.TaskChange.owner_id == owner_id, models.TaskChange.seq > since)
+        .order_by(models.TaskChange.seq)
+    )
+
+
+def get_latest_seq(db: Session, owner_id: int) -> int:
+    return db.execute(latest_seq_stmt(owner_id)).scalar() or 0
+
+
+async def get_latest_seq_async(db: AsyncSession, owner_id: int) -> int:
+    result = await db.execute(latest_seq_stmt(owner_id))
+    return result.scalar() or 0
+
+
+async def get_changes_since_async(db: AsyncSession, owner_id: int, since: int) -> Optional[Tuple[List[models.Task], Set[int], int]]:
+    '''Return (changed tasks, deleted task ids, latest seq) for changes after since,
+    or None when since has fallen out of the retained log'''
+    oldest, retained = (await db.execute(change_log_bounds_stmt(owner_id))).one()
+    # The log is only ever trimmed down to CHANGE_LOG_SIZE, so a shorter log is complete
+    if retained >= CHANGE_LOG_SIZE and since < oldest:
+        return None
+
+    rows = (await db.execute(changes_since_stmt(owner_id, since))).all()
+    if not rows:
+        return [], set(), since
+
+    task_ids = {row.task_id for row in rows}
+    result = await db.execute(tasks_by_ids_stmt(owner_id, task_ids))
+    # Only the current state matters, several changes to one task collapse into it
+    tasks = list(result.scalars())
+    deleted = task_ids - {task.id for task in tasks}
+    return tasks, deleted, rows[-1].seq
+
+
+def encode_cursor(task: models.Task) -> str:
+    '''Encode the (created_at, id) keyset position of a task as an opaque cursor'''
+    raw = f"{task.created_at.isoformat()}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    '''Decode a cursor produced by encode_cursor, raises ValueError if malformed'''
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(task_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at is stored as naive UTC, so aware query values are normalized to match
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def filter_tasks_stmt(
+    owner_id: int,
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    '''Build the owner-scoped task query in (created_at, id) order with optional filters'''
+    query = select(models.Task).filter(models.Task.owner_id == owner_id)
+    if completed is not None:
+        query = query.filter(models.Task.completed == completed)
+    if created_after is not None:
+        query = query.filter(models.Task.created_at > _naive_utc(created_after))
+    if created_before is not None:
+        query = query.filter(models.Task.created_at < _naive_utc(created_before))
+    if title_prefix:
+        query = query.filter(models.Task.title.startswith(title_prefix, autoescape=True))
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        # Row-value comparison lets the (owner_id, created_at, id) index seek straight to the cursor
+        query = query.filter(tuple_(models.Task.created_at, models.Task.id) > tuple_(last_created_at, last_id))
+    return query.order_by(models.Task.created_at, models.Task.id)
+
+
+def get_tasks(db: Session, owner_id: int, **filters) -> List[models.Task]:
+    '''Every matching task, unpaginated'''
+    return list(db.execute(filter_tasks_stmt(owner_id, **filters)).scalars())
+
+
+def get_tasks_page(db: Session, owner_id: int, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Tuple[List[models.Task], Optional[str]]:
+    '''Return one keyset page of tasks and the cursor for the next page (None on the last page)'''
+    tasks = list(db.execute(filter_tasks_stmt(owner_id, **filters).limit(limit + 1)).scalars())
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        return tasks, encode_cursor(tasks[-1])
+    return tasks, None
+
+
+def iter_tasks(db: Session, owner_id: int, limit: Optional[int] = None, batch_size: int = STREAM_BATCH_SIZE,
+               **filters) -> Iterator[models.Task]:
+    '''Yield matching tasks (at most limit, if given) from a server-side cursor, batch_size rows at a time'''
+    query = filter_tasks_stmt(owner_id, **filters)
+    if limit is not None:
+        query = query.limit(limit)
+    yield from db.execute(query.execution_options(yield_per=batch_size)).scalars()
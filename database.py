@@ -1,17 +1,122 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+import metrics
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./task_manager.db")
+
+# Storage profiles for SQLite, applied as PRAGMAs on every new connection.
+# legacy is SQLite's own defaults (rollback journal, synchronous=FULL).
+SQLITE_PROFILES = {
+    "legacy": {},
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -20000,  # negative means KiB, so ~20MB of page cache
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    # Can lose the last transactions on power loss (never corrupts the file)
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "balanced")
+
+# Individual PRAGMAs can be overridden on top of the profile, e.g. SQLITE_BUSY_TIMEOUT=10000
+SQLITE_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def sqlite_pragmas(profile: str = SQLITE_PROFILE) -> dict:
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PRAGMAS:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+def async_url(url: str) -> str:
+    '''Swap the sync driver for its asyncio counterpart, whichever driver the URL names'''
+    url = make_url(url)
+    drivers = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+    backend = url.get_backend_name()
+    if backend in drivers:
+        url = url.set(drivername=f"{backend}+{drivers[backend]}")
+    return url.render_as_string(hide_password=False)
+
+
+def _engine_options(url: str) -> dict:
+    url = make_url(url)
+    options = {}
+    # In-memory SQLite gets a single-connection pool that takes no sizing arguments
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def _apply_pragmas(sync_engine, pragmas: dict):
+    if sync_engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = SQLITE_PROFILE):
+    engine = create_engine(url, **_engine_options(url))
+    _apply_pragmas(engine, sqlite_pragmas(profile))
+    metrics.instrument_engine(engine)
+    return engine
+
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = SQLITE_PROFILE):
+    engine = create_async_engine(async_url(url), **_engine_options(async_url(url)))
+    _apply_pragmas(engine.sync_engine, sqlite_pragmas(profile))
+    metrics.instrument_engine(engine.sync_engine)
+    return engine
+
+
+engine=make_engine()
+
+
+SessionLocal=sessionmaker(autocommit=False,autoflush=False,bind=engine)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./task_manager.db"
+# Async handlers use this so commits don't block the event loop (and every open WebSocket)
+async_engine=make_async_engine()
 
-engine=create_engine(SQLALCHEMY_DATABASE_URL
-                     ,connect_args={
-                         'check_same_thread': False
-                     })
+# expire_on_commit=False keeps committed objects readable without a lazy reload
+AsyncSessionLocal=async_sessionmaker(bind=async_engine,autoflush=False,expire_on_commit=False)
 
 
-SessionLocal=sessionmaker(autocommit=False,autoflush=False,bind=engine)\
-    
-    
-Base=declarative_base()
\ No newline at end of file
+Base=declarative_base()
@@ -1,11 +1,28 @@
+import os
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from database import SessionLocal   
-import auth, models, schemas
+from database import SessionLocal, AsyncSessionLocal
+from cache import TaskCache, TTLCache
+import auth, crud, models, schemas
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# token -> schemas.CurrentUser, so authenticated requests skip the users lookup
+user_cache = TTLCache(max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+TASK_CACHE_MAX_BYTES = int(os.getenv("TASK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TASK_CACHE_TTL_SECONDS = float(os.getenv("TASK_CACHE_TTL_SECONDS", "300"))
+
+# user id -> their tasks and encoded task responses, patched by the mutation handlers
+task_cache = TaskCache(max_bytes=TASK_CACHE_MAX_BYTES, ttl=TASK_CACHE_TTL_SECONDS)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -13,19 +30,47 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    token_data = auth.decode_token(token)
-    if not token_data:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def invalidate_user(user_id: int):
+    '''Drop every cached token for a user, call after changing or deleting them'''
+    user_cache.invalidate_where(lambda cached: cached.id == user_id)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    # Bulk query.update()/delete() skip mapper events; call invalidate_user() for those
+    invalidate_user(target.id)
+
+def _load_current_user(token: str, db: Session) -> schemas.CurrentUser:
+    claims = auth.decode_token_claims(token)
+    if not claims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(models.User).filter(models.User.username == token_data).first()
+    user = crud.get_user_by_username(db, claims["sub"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    current_user = schemas.CurrentUser.model_validate(user)
+    # Never serve a token from the cache past its own expiry
+    ttl = USER_CACHE_TTL_SECONDS
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        user_cache.set(token, current_user, ttl=ttl)
+    return current_user
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.CurrentUser:
+    # Sessions connect lazily, so a cache hit never touches the database
+    current_user = user_cache.get(token)
+    if current_user is not None:
+        return current_user
+    return _load_current_user(token, db)
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import event, inspect, insert, select
+from sqlalchemy.orm import Session
+
+import crud, models
+from serializers import task_dict
+
+CREATED, UPDATED, DELETED = "created", "updated", "deleted"
+
+log = logging.getLogger("task_manager.events")
+
+
+class TaskEvent(NamedTuple):
+    seq: int
+    owner_id: int
+    task_id: int
+    op: str  # CREATED, UPDATED or DELETED
+    task: Optional[dict]  # the task as committed, None for deletes
+    previous_seq: int = 0  # the owner's latest seq before this event, 0 if none
+
+
+Subscriber = Callable[[List[TaskEvent]], object]
+
+
+class EventBus:
+    '''Hands the task events of each commit, in seq order, to subscribers.
+
+    Inline subscribers run in the committing thread before commit() returns, for
+    state that must never lag behind a response (the write-through task cache).
+    Deferred subscribers are scheduled on the event loop and run once the request
+    that made the change has moved on; neither kind may block.'''
+
+    def __init__(self):
+        self.inline: List[Subscriber] = []
+        self.deferred: List[Subscriber] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.errors = 0
+
+    def subscribe(self, subscriber: Subscriber, inline: bool = False):
+        (self.inline if inline else self.deferred).append(subscriber)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        '''Loop that deferred subscribers run on when a commit happens on another thread'''
+        self.loop = loop
+
+    def publish(self, events: List[TaskEvent]):
+        for subscriber in self.inline:
+            self._call(subscriber, events)
+        if not self.deferred:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            loop.call_soon(self._deliver, events)
+        elif self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._deliver, events)
+        else:
+            # No loop to hand off to (scripts, one-off jobs), deliver from this thread
+            self._deliver(events)
+
+    def _deliver(self, events: List[TaskEvent]):
+        for subscriber in self.deferred:
+            self._call(subscriber, events)
+
+    def _call(self, subscriber: Subscriber, events: List[TaskEvent]):
+        # The transaction is already committed, a failing subscriber must not fail the request
+        try:
+            subscriber(events)
+        except Exception:
+            self.errors += 1
+            log.exception("Task event subscriber %r failed", subscriber)
+
+
+bus = EventBus()
+
+
+def committed(session) -> List[TaskEvent]:
+    '''Events published by the session's last commit (works for sync and async sessions)'''
+    return session.info.get(_COMMITTED, [])
+
+
+# Per-transaction state, kept in Session.info
+_PENDING = "task_events.pending"  # task id -> [owner_id, op], in the order first seen
+_STALE = "task_events.stale"  # ids changed by a bulk UPDATE and not reloaded since
+_READY = "task_events.ready"  # logged events waiting for the commit to succeed
+_COMMITTED = "task_events.committed"
+
+
+def _record(session: Session, owner_id: int, task_id: int, op: str):
+    '''Fold one change into the transaction's pending changes, one entry per task'''
+    changes = session.info.setdefault(_PENDING, {})
+    previous = changes.get(task_id)
+    if previous is None:
+        changes[task_id] = [owner_id, op]
+    elif op == DELETED:
+        if previous[1] == CREATED:
+            # Never visible outside the transaction
+            del changes[task_id]
+        else:
+            previous[1] = DELETED
+    elif previous[1] == DELETED:
+        previous[1] = UPDATED
+    # A created or updated task that changes again keeps its op
+
+
+@event.listens_for(Session, "after_flush")
+def _capture_flush(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here, with ids assigned
+    for task in session.new:
+        if isinstance(task, models.Task):
+            _record(session, task.owner_id, task.id, CREATED)
+    for task in session.dirty:
+        if isinstance(task, models.Task) and session.is_modified(task, include_collections=False):
+            _record(session, task.owner_id, task.id, UPDATED)
+    for task in session.deleted:
+        if isinstance(task, models.Task):
+            _record(session, task.owner_id, task.id, DELETED)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _capture_bulk(orm_execute_state):
+    '''ORM-enabled insert()/update()/delete() on Task skip the flush, so look up the rows
+    they touch here. Core statements on a Connection bypass the session and go unseen.'''
+    state = orm_execute_state
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is None or mapper.class_ is not models.Task:
+        return
+    session = state.session
+
+    if state.is_insert:
+        return _capture_insert(state)
+
+    op = UPDATED if state.is_update else DELETED
+    rows = session.execute(targets_stmt(state.statement, state.parameters)).all()
+    for task_id, owner_id in rows:
+        _record(session, owner_id, task_id, op)
+    if state.is_update:
+        session.info.setdefault(_STALE, set()).update(task_id for task_id, _ in rows)
+
+
+def targets_stmt(statement, parameters=None):
+    '''(id, owner_id) of the tasks a bulk UPDATE or DELETE on Task is about to touch'''
+    query = select(models.Task.id, models.Task.owner_id)
+    if isinstance(parameters, list):
+        # Bulk UPDATE by primary key: one parameter set per row
+        return query.filter(models.Task.id.in_([params["id"] for params in parameters]))
+    if statement.whereclause is not None:
+        query = query.filter(statement.whereclause)
+    return query
+
+
+def reload_stmt(task_ids):
+    '''Reload changed tasks the session doesn't hold current copies of'''
+    return select(models.Task).filter(models.Task.id.in_(task_ids)).execution_options(populate_existing=True)
+
+
+def _capture_insert(state):
+    '''Run a bulk INSERT and record the rows it created from its own RETURNING rows'''
+    statement = state.statement
+    if not statement._returning:
+        # Nobody reads the rows of a plain INSERT, so return what we need
+        statement = statement.returning(models.Task.id, models.Task.owner_id)
+    rows = state.invoke_statement(statement=statement).freeze()
+    for row in rows().all():
+        task = next((value for value in row if isinstance(value, models.Task)), None)
+        if task is not None:
+            _record(state.session, task.owner_id, task.id, CREATED)
+        elif "id" in row._mapping and "owner_id" in row._mapping:
+            _record(state.session, row._mapping["owner_id"], row._mapping["id"], CREATED)
+        else:
+            raise ValueError("A bulk INSERT into tasks must return the Task or its id and owner_id")
+    return rows()
+
+
+@event.listens_for(models.Task, "load")
+@event.listens_for(models.Task, "refresh")
+def _reloaded(target, context, attrs=None):
+    # A full reload after a bulk UPDATE (e.g. populate_existing) means the object is current again
+    stale = context.session.info.get(_STALE)
+    if stale and attrs is None:
+        stale.discard(target.id)
+
+
+@event.listens_for(Session, "before_commit")
+def _log_changes(session):
+    '''Append the transaction's changes to the change log, giving each its seq'''
+    session.info.pop(_COMMITTED, None)
+    # Runs ahead of the commit's own flush, so flush here to see every change
+    session.flush()
+    if not session.info.get(_PENDING):
+        return
+    Task = models.Task
+
+    changes: Dict[int, list] = session.info.pop(_PENDING, {})
+    stale = session.info.pop(_STALE, set())
+    if not changes:
+        return
+
+    # Most changed tasks are already in the session, current; load the rest in one query
+    tasks = {}
+    missing = []
+    for task_id, (_, op) in changes.items():
+        if op == DELETED:
+            continue
+        task = session.identity_map.get(inspect(Task).identity_key_from_primary_key((task_id,)))
+        if task is None or task_id in stale or inspect(task).expired_attributes:
+            missing.append(task_id)
+        else:
+            tasks[task_id] = task_dict(task)
+    if missing:
+        result = session.execute(reload_stmt(missing))
+        tasks.update((task.id, task_dict(task)) for task in result.scalars())
+
+    entries = [(owner_id, task_id, op if op == DELETED or task_id in tasks else DELETED)
+               for task_id, (owner_id, op) in changes.items()]
+    owners = {owner_id for owner_id, _, _ in entries}
+    # The transaction holds the write lock by now, so nothing can land in between
+    latest = dict(session.execute(crud.latest_seqs_stmt(owners)).all())
+    # One INSERT; AUTOINCREMENT hands out seqs in VALUES order, RETURNING may not keep it
+    seqs = sorted(session.execute(
+        insert(models.TaskChange).returning(models.TaskChange.seq),
+        [{"owner_id": owner_id, "task_id": task_id, "op": op} for owner_id, task_id, op in entries],
+    ).scalars())
+    for owner_id in owners:
+        session.execute(crud.trim_change_log_stmt(owner_id))
+    ready = []
+    for seq, (owner_id, task_id, op) in zip(seqs, entries):
+        ready.append(TaskEvent(seq, owner_id, task_id, op, tasks.get(task_id) if op != DELETED else None,
+                               latest.get(owner_id) or 0))
+        latest[owner_id] = seq
+    session.info[_READY] = ready
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    events = session.info.pop(_READY, None)
+    if events:
+        session.info[_COMMITTED] = events
+        bus.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    for key in (_PENDING, _STALE, _READY):
+        session.info.pop(key, None)
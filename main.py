@@ -1,20 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, status, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Header, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-import auth, models, schemas
-from typing import List, Dict, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+import auth, crud, events, metrics, models, schemas, serializers
+from typing import List, Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
 import asyncio
-import json
 
-import dependencies
-from database import engine, Base, SessionLocal
-from dependencies import get_db, get_current_user
+from connection_manager import ConnectionManager
+from database import engine, SessionLocal, AsyncSessionLocal
+from cache import etag_matches
+from dependencies import get_db, get_async_db, get_current_user, task_cache, user_cache
+from serializers import FastJSONResponse, task_dict, task_dicts
 
 models.Base.metadata.create_all(bind=engine)
+models.create_missing_indexes(engine)
 
-app = FastAPI(title="Task Manager API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Commits from sync endpoints run on threadpool threads and hand their events back here
+    events.bus.bind(asyncio.get_running_loop())
+    await manager.broker.start()
+    yield
+    await manager.broker.stop()
+    auth.shutdown_password_executor()
+
+app = FastAPI(title="Task Manager API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -23,63 +38,165 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.exception_handler(auth.PasswordWorkersBusy)
+async def password_workers_busy_handler(request, exc: auth.PasswordWorkersBusy):
+    # Shed login/register load instead of queueing it behind every other request
+    return JSONResponse(status_code=429, content={"detail": "Too many login attempts, retry shortly"}, headers={"Retry-After": "1"})
+
 @app.get("/")
 def read_root():
     from fastapi.responses import FileResponse
     return FileResponse("static/index.html")
 
+def cached_json(cached, if_none_match: Optional[str]) -> Response:
+    '''Send a cached body, or 304 Not Modified if the client already has it'''
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache", **cached.headers}
+    if if_none_match and etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+def check_cached_tasks(db: Session, user_id: int):
+    '''With several workers, invalidations travel as datagrams that can be lost; compare
+    the user's change-log seq so a missed one costs a reload instead of stale data'''
+    if manager.broker.cross_process:
+        task_cache.check_seq(user_id, crud.get_latest_seq(db, user_id))
+
+def stream_tasks(owner_id: int, filters: dict, limit: Optional[int] = None):
+    '''Yield tasks as NDJSON lines from a dedicated session so memory stays flat'''
+    db = SessionLocal()
+    try:
+        for task in crud.iter_tasks(db, owner_id, limit, **filters):
+            yield serializers.dumps(task_dict(task)) + b"\n"
+    finally:
+        db.close()
+
 @app.get("/tasks/", response_model=List[schemas.Task])
-def get_tasks(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    tasks = db.query(models.Task).filter(models.Task.owner_id == current_user.id).all()
-    return tasks
+def get_tasks(
+    limit: Optional[int] = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = None,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    '''List tasks ordered by (created_at, id). Without limit or cursor every matching
+    task is returned, as before pagination existed. With either, one page comes back
+    (limit defaults to DEFAULT_PAGE_SIZE) and the next page cursor is returned in the
+    X-Next-Cursor header; stream=true returns the matching tasks as NDJSON instead, every
+    one of them or the first limit.
+    Pages carry an ETag; a matching If-None-Match gets 304 straight from the cache.'''
+    filters = dict(
+        completed=completed,
+        created_after=created_after,
+        created_before=created_before,
+        title_prefix=title_prefix,
+        cursor=cursor,
+    )
+    if cursor:
+        try:
+            crud.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
-        
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
-        self.active_connections[user_id].add(websocket)
-        
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-            
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except WebSocketDisconnect:
-                    pass
+    if stream:
+        return StreamingResponse(stream_tasks(current_user.id, filters, limit), media_type="application/x-ndjson")
+
+    if cursor and limit is None:
+        limit = crud.DEFAULT_PAGE_SIZE
+    key = ("page", limit, cursor, completed, created_after, created_before, title_prefix)
+    check_cached_tasks(db, current_user.id)
+    cached = task_cache.response(current_user.id, key)
+    if cached is None:
+        cache_token = task_cache.begin()
+        if limit is None:
+            tasks, next_cursor = crud.get_tasks(db, current_user.id, **filters), None
+        else:
+            tasks, next_cursor = crud.get_tasks_page(db, current_user.id, limit=limit, **filters)
+        # Rows are encoded straight to bytes; response_model only documents the shape
+        cached = task_cache.store_response(current_user.id, key, serializers.dumps(task_dicts(tasks)),
+                                           {"X-Next-Cursor": next_cursor} if next_cursor else {}, cache_token)
+    return cached_json(cached, if_none_match)
 
 manager = ConnectionManager()
+# Another worker's write to a user's tasks reaches us as a published event; drop our copy
+manager.broker.on_remote(task_cache.invalidate)
+
+def write_through(task_events: List[events.TaskEvent]):
+    for task_event in task_events:
+        if task_event.task is None:
+            task_cache.remove(task_event.owner_id, task_event.task_id, task_event.seq, task_event.previous_seq)
+        else:
+            task_cache.put(task_event.owner_id, task_event.task, task_event.seq, task_event.previous_seq)
+
+def notify_sockets(task_events: List[events.TaskEvent]):
+    '''One WebSocket message per user per commit: the typed event for a single change,
+    otherwise a changes delta in the same shape as a resync'''
+    by_owner = {}
+    for task_event in task_events:
+        by_owner.setdefault(task_event.owner_id, []).append(task_event)
+    for owner_id, owner_events in by_owner.items():
+        if len(owner_events) == 1:
+            task_event = owner_events[0]
+            if task_event.op == events.DELETED:
+                message = {"type": "task_deleted", "seq": task_event.seq, "task_id": task_event.task_id}
+            else:
+                message = {"type": f"task_{task_event.op}", "seq": task_event.seq, "task": task_event.task}
+        else:
+            message = {
+                "type": "changes",
+                "seq": owner_events[-1].seq,
+                "tasks": [task_event.task for task_event in owner_events if task_event.task is not None],
+                "deleted": [task_event.task_id for task_event in owner_events if task_event.task is None]
+            }
+        manager.publish(message, owner_id, owner_events[0].previous_seq)
+
+# Every committed task change, from any handler or bulk statement, is logged with a seq
+# by the events pipeline and then lands here: the cache before commit() returns, the
+# sockets on the event loop afterwards
+events.bus.subscribe(write_through, inline=True)
+events.bus.subscribe(notify_sockets)
+
+metrics.registry.add(metrics.Gauge("websocket_connections", "Open WebSocket connections", lambda: manager.stats()["connections"]))
+metrics.registry.add(metrics.Gauge("websocket_users", "Users with at least one open WebSocket", lambda: manager.stats()["users"]))
+metrics.registry.add(metrics.Gauge("websocket_send_queue_depth", "Messages waiting in WebSocket send queues", lambda: manager.stats()["queued"]))
+metrics.registry.add(metrics.Gauge("password_queue_depth", "Password hash/verify calls in flight or queued", auth.password_queue_depth))
+for name, cache in (("user", user_cache), ("task", task_cache)):
+    metrics.registry.add(metrics.Gauge(f"{name}_cache_hits_total", f"{name} cache hits", lambda cache=cache: cache.hits, type="counter"))
+    metrics.registry.add(metrics.Gauge(f"{name}_cache_misses_total", f"{name} cache misses", lambda cache=cache: cache.misses, type="counter"))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    '''Prometheus text exposition of the metrics in metrics.registry'''
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.post('/register', response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud.get_user_by_username_async(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     new_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    await db.commit()
+    return schemas.User(id=new_user.id, username=new_user.username)
 
 @app.post('/token', response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await crud.get_user_by_username_async(db, form_data.username)
+    if not user or not await auth.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token = auth.create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -87,32 +204,57 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 @app.post("/tasks/", response_model=schemas.Task)
 async def create_task(
     task: schemas.TaskCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_task = models.Task(**task.model_dump(), owner_id=current_user.id)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    # Caching and the WebSocket event happen in the events pipeline on commit
+    await db.commit()
+    return FastJSONResponse(task_dict(db_task))
 
-    # Notify via WebSocket
-    await manager.send_personal_message({
-        "type": "task_created",
-        "task": schemas.Task.model_validate(db_task).model_dump()
-    }, current_user.id)
+@app.post("/tasks/batch", response_model=schemas.TaskBatchResult)
+async def batch_tasks(
+    batch: schemas.TaskBatch,
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    '''Apply many creates, updates and deletes in one transaction and one WebSocket event'''
+    created, updated, deleted, missing = await crud.apply_task_batch_async(db, current_user.id, batch)
+    await db.commit()
+    task_events = events.committed(db)
+    seq = task_events[-1].seq if task_events else None
 
-    return db_task
+    created_tasks = task_dicts(created)
+    updated_tasks = {task.id: task_dict(task) for task in updated}
+    results = [{"op": "create", "id": task["id"], "status": "ok", "task": task} for task in created_tasks]
+    for item in batch.update:
+        task = updated_tasks.get(item.id)
+        results.append({"op": "update", "id": item.id, "status": "ok" if task else "not_found", "task": task})
+    for task_id in batch.delete:
+        results.append({"op": "delete", "id": task_id, "status": "not_found" if task_id in missing else "ok", "task": None})
+    return FastJSONResponse({"seq": seq, "results": results})
 
 @app.get('/tasks/{task_id}', response_model=schemas.Task)
-def read_task(task_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+def read_task(task_id: int, if_none_match: Optional[str] = Header(None), current_user: schemas.CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    key = ("task", task_id)
+    check_cached_tasks(db, current_user.id)
+    cached = task_cache.response(current_user.id, key)
+    if cached is None:
+        cache_token = task_cache.begin()
+        task = task_cache.task(current_user.id, task_id)
+        if task is None:
+            row = crud.get_task(db, task_id, current_user.id)
+            if not row:
+                raise HTTPException(status_code=404, detail="Task not found")
+            task = task_dict(row)
+            task_cache.store_task(current_user.id, task, cache_token)
+        cached = task_cache.store_response(current_user.id, key, serializers.dumps(task), {}, cache_token)
+    return cached_json(cached, if_none_match)
 
 @app.put('/tasks/{task_id}', response_model=schemas.Task)
-async def update_task(task_id: int, task_update: schemas.TaskUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
+async def update_task(task_id: int, task_update: schemas.TaskUpdate, current_user: schemas.CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    task = await crud.get_task_async(db, task_id, current_user.id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -120,29 +262,22 @@ async def update_task(task_id: int, task_update: schemas.TaskUpdate, current_use
         if value is not None:
             setattr(task, var, value)
     
-    db.commit()
-    db.refresh(task)
-
-    # Notify via WebSocket
-    await manager.send_personal_message({
-        "type": "task_updated",
-        "task": schemas.Task.model_validate(task).model_dump()
-    }, current_user.id)
-
-    return task
+    await db.commit()
+    return FastJSONResponse(task_dict(task))
 
 @app.delete('/tasks/{task_id}')
-def delete_task(task_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
+async def delete_task(task_id: int, current_user: schemas.CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    task = await crud.get_task_async(db, task_id, current_user.id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await db.commit()
     return {"detail": "Task deleted successfully"}
 
 @app.websocket('/ws')
-async def websocket_endpoint(websocket: WebSocket, token: str = None):
-    '''WebSocket connection requires a valid JWT token as query parameter'''
+async def websocket_endpoint(websocket: WebSocket, token: str = None, since: Optional[int] = None):
+    '''WebSocket connection requires a valid JWT token as query parameter.
+    Reconnecting clients pass the last seq they saw as since= and get only the changes after it.'''
     
     await websocket.accept()
     
@@ -151,29 +286,57 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
         await websocket.close(code=1008)
         return
     
-    db = SessionLocal()
     user = None
+    sender = None
     try:
-        token_data = auth.decode_token(token)
-        if not token_data or not token_data.username:
+        username = auth.decode_token(token)
+        if not username:
             await websocket.send_json({"type": "error", "message": "Invalid token"})
             await websocket.close(code=1008)
             return
-        user = db.query(models.User).filter(models.User.username == token_data.username).first()
-        if not user:
-            await websocket.send_json({"type": "error", "message": "User not found"})
-            await websocket.close(code=1008)
-            return
-        
-        await manager.connect(websocket, user.id)
-        print(f"WebSocket connected for user: {user.username}")
+        # Only hold a session for the initial load, not for the socket's lifetime
+        async with AsyncSessionLocal() as db:
+            user = await crud.get_user_by_username_async(db, username)
+            if not user:
+                await websocket.send_json({"type": "error", "message": "User not found"})
+                await websocket.close(code=1008)
+                return
+
+            # Connect before reading so no live event falls between the read and the
+            # subscription; the sender holds those events until the snapshot is queued
+            sender = await manager.connect(websocket, user.id)
+            print(f"WebSocket connected for user: {user.username}")
+
+            changes = None
+            if since is not None:
+                changes = await crud.get_changes_since_async(db, user.id, since)
+            if changes is not None:
+                tasks, deleted, seq = changes
+                message = {
+                    "type": "changes",
+                    "seq": seq,
+                    "tasks": task_dicts(tasks),
+                    "deleted": sorted(deleted)
+                }
+            else:
+                # Read the seq first: anything committed after it is in the snapshot and resent live
+                seq = await crud.get_latest_seq_async(db, user.id)
+                if manager.broker.cross_process:
+                    task_cache.check_seq(user.id, seq)
+                tasks = task_cache.tasks(user.id)
+                if tasks is None:
+                    cache_token = task_cache.begin()
+                    tasks = task_dicts(await crud.get_all_tasks_async(db, user.id))
+                    task_cache.store_tasks(user.id, tasks, cache_token)
+                message = {
+                    "type": "initial_tasks",
+                    "seq": seq,
+                    "tasks": tasks
+                }
         
-        # Send initial tasks
-        tasks = db.query(models.Task).filter(models.Task.owner_id == user.id).all()
-        await websocket.send_json({
-            "type": "initial_tasks", 
-            "tasks": [schemas.Task.model_validate(task).model_dump() for task in tasks]
-        })
+        # Every send goes through the socket's writer queue, encoded once up front; live
+        # events held since connect follow, minus those the snapshot/delta already covers
+        sender.release(serializers.dumps_text(message), seq)
         
         # Keep connection alive with ping
         while True:
@@ -182,10 +345,10 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
                 data = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
                 # Echo back or handle ping
                 if data == "ping":
-                    await websocket.send_text("pong")
+                    sender.offer("pong")
             except asyncio.TimeoutError:
                 # Send ping to keep connection alive
-                await websocket.send_text("ping")
+                sender.offer("ping")
             except WebSocketDisconnect:
                 print(f"WebSocket disconnected for user: {user.username}")
                 break
@@ -195,10 +358,14 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
                 
     except Exception as e:
         print(f"WebSocket error: {e}")
-        await websocket.send_json({"type": "error", "message": f"WebSocket error: {str(e)}"})
+        error = {"type": "error", "message": f"WebSocket error: {str(e)}"}
+        if sender is not None:
+            # The writer task may be mid-send, so the error queues behind it
+            await sender.finish(serializers.dumps_text(error))
+        else:
+            await websocket.send_json(error)
     finally:
         if user:
             manager.disconnect(websocket, user.id)
-        db.close()
 # Force reload
 # Force reload 2
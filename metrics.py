@@ -0,0 +1,230 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# METRICS_ENABLED=0 installs no middleware or SQL hooks; the remaining call sites
+# check ENABLED first, so the cost when off is one attribute read
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Requests slower than this are logged with the SQL they issued; unset or 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger("task_manager.slow_requests")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    '''Prometheus histogram; bucket counts are kept per bucket and summed on render'''
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    bucket_label = f'le="{le}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, bucket_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-1])}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    '''Gauge read at scrape time: function returns a number, or {label values tuple: number}'''
+
+    def __init__(self, name: str, help: str, function: Callable, labels: Sequence[str] = (), type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.label_names = tuple(labels)
+        self.type = type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        value = self.function()
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(number)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.add(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")))
+http_request_queries = registry.add(Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request", ("route",), COUNT_BUCKETS))
+http_request_db_seconds = registry.add(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ("route",)))
+db_query_seconds = registry.add(Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements"))
+password_seconds = registry.add(Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time including the wait for a password worker", ("op",),
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+ws_send_seconds = registry.add(Histogram(
+    "websocket_send_duration_seconds", "Time to hand one message to a WebSocket"))
+ws_fanout_seconds = registry.add(Histogram(
+    "websocket_fanout_duration_seconds", "Time to queue one event on every socket of a user"))
+ws_fanout_sockets = registry.add(Histogram(
+    "websocket_fanout_sockets", "Sockets an event was queued on", (), COUNT_BUCKETS))
+ws_dropped = registry.add(Counter(
+    "websocket_messages_dropped_total", "Messages hit by the slow-consumer policy", ("policy",)))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, capture: bool):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if capture else None
+
+
+# Stats of the HTTP request being handled; sync endpoints run on threadpool copies of
+# the context, which still point at the same RequestStats object
+_request = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._metrics_start
+    db_query_seconds.observe(seconds)
+    stats = _request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        if stats.statements is not None:
+            stats.statements.append((statement, seconds))
+
+
+def instrument_engine(engine):
+    '''Time every SQL statement run on a sync engine (pass async_engine.sync_engine for async)'''
+    if ENABLED:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    '''ASGI middleware recording latency, status and SQL use of every HTTP request.
+    Routes are labelled by their template (/tasks/{task_id}), unmatched paths as "unmatched".'''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(capture=SLOW_REQUEST_MS > 0)
+        token = _request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            _request.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_seconds.observe(seconds, scope["method"], route, status)
+            http_request_queries.observe(stats.queries, route)
+            http_request_db_seconds.observe(stats.db_seconds, route)
+            if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(scope, route, status, seconds, stats)
+
+
+def _log_slow(scope, route, status, seconds, stats):
+    lines = [f"{scope['method']} {scope['path']} ({route}) -> {status} in {seconds * 1000:.1f} ms, "
+             f"{stats.queries} queries, {stats.db_seconds * 1000:.1f} ms in SQL"]
+    lines.extend(f"  {statement_seconds * 1000:8.2f} ms  {' '.join(statement.split())}"
+                 for statement, statement_seconds in stats.statements)
+    slow_log.warning("\n".join(lines))
+
+
+def render() -> str:
+    return registry.render()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime,ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime,ForeignKey,Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -19,4 +19,34 @@ class Task(Base):
     completed=Column(Boolean,default=False)
     created_at=Column(DateTime,default=datetime.datetime.utcnow)
     owner_id=Column(Integer,ForeignKey("users.id"))
-    owner=relationship("User",back_populates="tasks")
\ No newline at end of file
+    owner=relationship("User",back_populates="tasks")
+
+    __table_args__=(
+        # Every handler scopes by owner; listings are ordered by (created_at, id)
+        Index('ix_tasks_owner_created','owner_id','created_at','id'),
+        Index('ix_tasks_owner_completed_created','owner_id','completed','created_at','id'),
+    )
+
+
+class TaskChange(Base):
+    '''Bounded per-user change log; seq lets reconnecting WebSockets resume from a cursor'''
+    __tablename__='task_changes'
+    seq=Column(Integer,primary_key=True)
+    owner_id=Column(Integer,ForeignKey("users.id"),nullable=False)
+    task_id=Column(Integer,nullable=False)
+    op=Column(String,nullable=False)
+    created_at=Column(DateTime,default=datetime.datetime.utcnow)
+
+    __table_args__=(
+        Index('ix_task_changes_owner_seq','owner_id','seq'),
+        # Never reuse a seq, even after the newest row is deleted
+        {'sqlite_autoincrement':True},
+    )
+
+
+def create_missing_indexes(bind):
+    '''create_all skips tables that already exist, so add any indexes an older
+    task_manager.db is missing'''
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind,checkfirst=True)
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+# memory: events only reach sockets held by this process (single worker)
+# unix: every worker binds a datagram socket in PUBSUB_DIR and publishes to all of them
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+PUBSUB_DIR = os.getenv("PUBSUB_DIR", os.path.join(tempfile.gettempdir(), "task_manager_pubsub"))
+
+# Larger events are replaced by a resync_required message for other workers
+MAX_DATAGRAM_SIZE = 200 * 1024
+
+RESYNC_MESSAGE = json.dumps({"type": "resync_required"})
+
+log = logging.getLogger("task_manager.pubsub")
+
+Handler = Callable[[str, int], object]
+RemoteListener = Callable[[int], object]
+
+
+class InProcessBroker:
+    '''Delivers published messages straight to this process's handler'''
+
+    # Whether other processes may hold subscribers, i.e. publish even with no local sockets
+    cross_process = False
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.remote_listeners: List[RemoteListener] = []
+
+    def set_handler(self, handler: Handler):
+        self.handler = handler
+
+    def on_remote(self, listener: RemoteListener):
+        '''Also call listener(user_id) for every message published by another process,
+        e.g. to drop per-process caches of that user's data'''
+        self.remote_listeners.append(listener)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, text: str, user_id: int, seq: Optional[int] = None, previous_seq: Optional[int] = None):
+        '''Deliver text to the user's sockets. seq and previous_seq are the change-log
+        range the message covers, letting other processes notice one they missed.'''
+        if self.handler is not None:
+            self.handler(text, user_id)
+
+
+class UnixSocketBroker(InProcessBroker):
+    '''Fans messages out to every worker on this machine over Unix datagram sockets.
+
+    Each worker binds <directory>/<pid>.sock. Publishing delivers locally and then
+    sends one datagram to every other socket file in the directory, so workers can
+    come and go without a central broker process.
+
+    Datagrams can be dropped (a peer's full receive buffer), so each carries the
+    user's seq and the seq before it. A receiver whose last seen seq for the user
+    doesn't match previous_seq missed something and hands its sockets
+    resync_required instead, so the clients reload.'''
+
+    cross_process = True
+
+    def __init__(self, directory: str = PUBSUB_DIR):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_sock.setblocking(False)
+        self.send_errors = 0
+        self.gaps = 0
+        self._last_seq: Dict[int, int] = {}  # user id -> latest seq published or received
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * MAX_DATAGRAM_SIZE)
+        self._sock.setblocking(False)
+        self._sock.bind(self.path)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    async def stop(self):
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def publish(self, text: str, user_id: int, seq: Optional[int] = None, previous_seq: Optional[int] = None):
+        super().publish(text, user_id)
+        self._seen(user_id, seq)
+        envelope = {"user_id": user_id, "text": text, "seq": seq, "previous_seq": previous_seq}
+        datagram = json.dumps(envelope).encode()
+        if len(datagram) > MAX_DATAGRAM_SIZE:
+            datagram = json.dumps({**envelope, "text": RESYNC_MESSAGE}).encode()
+        for peer in self._peers():
+            try:
+                self._send_sock.sendto(datagram, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a worker that died without cleaning up
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except OSError as e:
+                # Peer's receive buffer is full; drop rather than block the publisher.
+                # The peer notices the gap at the user's next event and resyncs
+                self.send_errors += 1
+                log.warning("Dropped event for user %s to %s: %s", user_id, peer, e)
+
+    def _peers(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names
+                if name.endswith(".sock") and os.path.join(self.directory, name) != self.path]
+
+    def _on_readable(self):
+        while True:
+            try:
+                datagram = self._sock.recv(MAX_DATAGRAM_SIZE + 1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                message = json.loads(datagram)
+                user_id, text = message["user_id"], message["text"]
+            except (ValueError, KeyError):
+                continue
+            if self._missed(user_id, message.get("previous_seq")):
+                self.gaps += 1
+                log.warning("Missed events for user %s before seq %s, asking clients to resync",
+                            user_id, message.get("seq"))
+                text = RESYNC_MESSAGE
+            self._seen(user_id, message.get("seq"))
+            for listener in self.remote_listeners:
+                listener(user_id)
+            if self.handler is not None:
+                self.handler(text, user_id)
+
+    def _missed(self, user_id: int, previous_seq: Optional[int]) -> bool:
+        # Nothing seen for the user yet means nothing to compare against
+        last = self._last_seq.get(user_id)
+        return previous_seq is not None and last is not None and previous_seq != last
+
+    def _seen(self, user_id: int, seq: Optional[int]):
+        if seq is not None:
+            self._last_seq[user_id] = max(seq, self._last_seq.get(user_id, 0))
+
+
+def create_broker(backend: str = PUBSUB_BACKEND):
+    if backend == "memory":
+        return InProcessBroker()
+    if backend == "unix":
+        return UnixSocketBroker()
+    raise ValueError(f"Unknown pub/sub backend: {backend}")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class TaskBase(BaseModel):
@@ -22,6 +22,32 @@ class Task(TaskBase):
     owner_id:int
     class Config:
         from_attributes=True
+
+
+# Upper bound on each operation list in one /tasks/batch request
+BATCH_MAX_ITEMS=1000
+
+
+class TaskBatchUpdate(TaskUpdate):
+    id:int
+
+
+class TaskBatch(BaseModel):
+    create:List[TaskCreate]=Field(default_factory=list,max_length=BATCH_MAX_ITEMS)
+    update:List[TaskBatchUpdate]=Field(default_factory=list,max_length=BATCH_MAX_ITEMS)
+    delete:List[int]=Field(default_factory=list,max_length=BATCH_MAX_ITEMS)
+
+
+class TaskBatchItemResult(BaseModel):
+    op:Literal["create","update","delete"]
+    id:int
+    status:Literal["ok","not_found"]
+    task:Optional[Task]=None
+
+
+class TaskBatchResult(BaseModel):
+    seq:Optional[int]=None
+    results:List[TaskBatchItemResult]
         
 class UserBase(BaseModel):
     username:str
@@ -37,6 +63,15 @@ class User(UserBase):
         from_attributes=True
 
 
+class CurrentUser(BaseModel):
+    '''Lightweight identity of the authenticated user, cached per token'''
+    id:int
+    username:str
+    class Config:
+        from_attributes=True
+        frozen=True
+
+
 class Token(BaseModel):
     access_token:str
     token_type:str
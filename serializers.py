@@ -0,0 +1,54 @@
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder, same output just slower
+    orjson = None
+
+
+def task_dict(task) -> dict:
+    '''schemas.Task fields of an ORM task (or anything with those attributes) without
+    pydantic; datetimes are left for the encoder'''
+    # Same key order as schemas.Task, so the bytes match what pydantic produced
+    return {
+        "title": task.title,
+        "description": task.description,
+        "completed": task.completed,
+        "id": task.id,
+        "created_at": task.created_at,
+        "owner_id": task.owner_id,
+    }
+
+
+def task_dicts(tasks: Iterable) -> List[dict]:
+    return [task_dict(task) for task in tasks]
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    '''Compact JSON bytes, with datetimes as ISO 8601 like pydantic's JSON mode'''
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def dumps_text(value: Any) -> str:
+    '''dumps as str, for WebSocket text frames'''
+    return dumps(value).decode()
+
+
+class FastJSONResponse(JSONResponse):
+    '''JSONResponse rendered with dumps. Handlers return it with plain dicts to skip
+    FastAPI's response_model validation; response_model still documents the shape.'''
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
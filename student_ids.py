@@ -0,0 +1,100 @@
+"""Student ID allocation"""
+import os
+import threading
+
+STUDENT_ID_PREFIX = os.getenv("STUDENT_ID_PREFIX", "STU")
+STUDENT_ID_WIDTH = int(os.getenv("STUDENT_ID_WIDTH", "8"))
+ID_BLOCK_SIZE = int(os.getenv("STUDENT_ID_BLOCK_SIZE", "1000"))
+
+
+class IdAllocator:
+    '''Monotonic student IDs: prefix + zero-padded sequence number, e.g. STU00000042.
+
+    Numbers come out of a block reserved up front and only the block's upper
+    bound is persisted (through the reserve callback), so a bulk add costs a
+    counter bump per ID and one metadata write per block. A crash can skip the
+    rest of a block (a clean close hands it back) but never hands a number out
+    twice. The original IDs (STU + 6 hex characters) are shorter than any ID
+    made here, so the two never collide; exists is still consulted so an
+    imported ID in the new format is skipped.
+    '''
+
+    def __init__(self, prefix=STUDENT_ID_PREFIX, width=STUDENT_ID_WIDTH, start=1,
+                 block_size=ID_BLOCK_SIZE, reserve=None, exists=None):
+        '''
+        Args:
+            start: next sequence number to hand out (the persisted high-water mark)
+            reserve: called with the new upper bound before a block is used
+            exists: called with a candidate ID, True if it is already taken
+        '''
+        self.prefix = prefix
+        self.width = width
+        self.block_size = block_size
+        self._reserve = reserve
+        self._exists = exists
+        self._next = start
+        self._ceiling = start
+        self._floor = start
+        self._lock = threading.Lock()
+
+    def format(self, number):
+        return f"{self.prefix}{number:0{self.width}d}"
+
+    def parse(self, student_id):
+        '''Sequence number of an ID this allocator could have made, else None'''
+        digits = student_id[len(self.prefix):]
+        if student_id.startswith(self.prefix) and len(digits) >= self.width and digits.isdigit():
+            return int(digits)
+        return None
+
+    @property
+    def next_number(self):
+        '''Sequence number the next new ID starts from'''
+        return self._next
+
+    @property
+    def ceiling(self):
+        '''Upper bound of the numbers reserved so far'''
+        return self._ceiling
+
+    def advance(self, high_water):
+        '''Skip numbers another process has reserved; takes effect at the next block'''
+        with self._lock:
+            self._floor = max(self._floor, high_water)
+
+    def observe(self, student_id):
+        '''Move past an ID that was assigned elsewhere (e.g. given explicitly on import)'''
+        number = self.parse(student_id)
+        if number is not None:
+            with self._lock:
+                self._next = max(self._next, number + 1)
+
+    def release(self):
+        '''Hand back the unused rest of the current block on a clean shutdown
+        
+        Returns the new high-water mark to persist, or None if nothing was reserved.
+        '''
+        with self._lock:
+            if self._next >= self._ceiling:
+                return None
+            self._ceiling = self._next
+            return self._ceiling
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        '''Return count new IDs, reserving enough numbers for all of them at once'''
+        ids = []
+        with self._lock:
+            while len(ids) < count:
+                if self._next >= self._ceiling:
+                    self._next = max(self._next, self._floor)
+                    self._ceiling = self._next + max(self.block_size, count - len(ids))
+                    if self._reserve is not None:
+                        self._reserve(self._ceiling)
+                student_id = self.format(self._next)
+                self._next += 1
+                if self._exists is None or not self._exists(student_id):
+                    ids.append(student_id)
+        return ids
@@ -0,0 +1,116 @@
+"""In-memory secondary indexes for student search"""
+from array import array
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StudentIndex:
+    '''Department, email and name indexes kept in step with the roster.
+
+    - department: lower-cased department -> set of student ids
+    - email: lower-cased email -> set of student ids (exact match)
+    - name: trigram -> array of doc numbers, for substring search. Postings are
+      compact integer arrays; a changed or deleted student leaves a dead doc
+      number behind that searches skip, and the postings are rebuilt once dead
+      docs outnumber live ones.
+    '''
+
+    def __init__(self, students=()):
+        self._departments = {}
+        self._emails = {}
+        self._trigrams = {}
+        self._doc_names = []  # doc number -> lower-cased name, None once dead
+        self._doc_ids = []    # doc number -> student id
+        self._docs = {}       # student id -> (doc number, department key, email key)
+        self._dead = 0
+        for student in students:
+            self.add(student)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, student):
+        sid = student.student_id
+        if sid in self._docs:
+            self.remove(sid)
+        department = student.department.lower()
+        email = student.email.lower()
+        name = student.name.lower()
+        doc = len(self._doc_names)
+        self._doc_names.append(name)
+        self._doc_ids.append(sid)
+        for gram in _trigrams(name):
+            postings = self._trigrams.get(gram)
+            if postings is None:
+                postings = self._trigrams[gram] = array('I')
+            postings.append(doc)
+        self._departments.setdefault(department, set()).add(sid)
+        self._emails.setdefault(email, set()).add(sid)
+        self._docs[sid] = (doc, department, email)
+
+    def remove(self, student_id):
+        entry = self._docs.pop(student_id, None)
+        if entry is None:
+            return
+        doc, department, email = entry
+        self._doc_names[doc] = None
+        self._dead += 1
+        for key, mapping in ((department, self._departments), (email, self._emails)):
+            ids = mapping[key]
+            ids.discard(student_id)
+            if not ids:
+                del mapping[key]
+        if self._dead > len(self._docs):
+            self._rebuild_names()
+
+    def update(self, student):
+        '''Re-index a student whose fields may have changed'''
+        self.add(student)
+
+    def _rebuild_names(self):
+        live = [(self._doc_ids[doc], self._doc_names[doc]) for doc, _, _ in self._docs.values()]
+        self._trigrams = {}
+        self._doc_names = []
+        self._doc_ids = []
+        self._dead = 0
+        for sid, name in live:
+            doc = len(self._doc_names)
+            self._doc_names.append(name)
+            self._doc_ids.append(sid)
+            for gram in _trigrams(name):
+                postings = self._trigrams.get(gram)
+                if postings is None:
+                    postings = self._trigrams[gram] = array('I')
+                postings.append(doc)
+            entry = self._docs[sid]
+            self._docs[sid] = (doc, entry[1], entry[2])
+
+    def by_name(self, text):
+        '''Ids of students whose name contains text (case-insensitive)'''
+        text = text.lower()
+        if len(text) < 3:
+            # Too short for a trigram; the names list is still far cheaper than the objects
+            docs = range(len(self._doc_names))
+        else:
+            postings = [self._trigrams.get(gram) for gram in _trigrams(text)]
+            if not all(postings):
+                return set()
+            # Verifying the rarest trigram's docs is enough, no need to intersect
+            docs = min(postings, key=len)
+        names = self._doc_names
+        return {self._doc_ids[doc] for doc in docs if names[doc] is not None and text in names[doc]}
+
+    def by_department(self, text):
+        '''Ids of students whose department contains text (case-insensitive)'''
+        text = text.lower()
+        # Departments are few, so substring matching over the keys stays cheap
+        matches = set()
+        for key, ids in self._departments.items():
+            if text in key:
+                matches |= ids
+        return matches
+
+    def by_email(self, email):
+        return set(self._emails.get(email.lower(), ()))
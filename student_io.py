@@ -0,0 +1,246 @@
+"""Streaming bulk import/export for the student roster
+
+Three formats, chosen by file extension:
+
+    .csv    header row plus one row per student
+    .jsonl  one JSON object per line
+    .stcol  binary columnar: a magic header followed by row groups of up to
+            chunk_size students, each column stored contiguously (one-byte age
+            and grade codes, dictionary-encoded departments, length-prefixed
+            UTF-8 for the string columns)
+
+Readers yield one raw record at a time and writers consume any iterable of
+records, so memory stays at one chunk regardless of file size. Every record is
+checked with validate_record, which applies the same rules as add_student.
+"""
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+
+FIELDS = ('student_id', 'name', 'age', 'grade', 'department', 'email', 'phone', 'enrollment_date')
+MIN_AGE, MAX_AGE = 15, 60
+GRADES = ('A', 'B', 'C', 'D', 'F')
+DEFAULT_CHUNK_SIZE = 10_000
+
+COLUMNAR_MAGIC = b'STCOL1\n'
+_STRING_COLUMNS = ('student_id', 'name', 'email', 'phone', 'enrollment_date')
+
+
+class RowError:
+    '''A rejected input row: its position in the file and why'''
+    __slots__ = ('row', 'message')
+
+    def __init__(self, row, message):
+        self.row = row
+        self.message = message
+
+    def __repr__(self):
+        return f"RowError(row={self.row}, message={self.message!r})"
+
+
+def validate_record(record):
+    '''Return a normalized copy of record or raise ValueError (add_student's rules)'''
+    name = str(record.get('name') or '').strip()
+    if not name:
+        raise ValueError('Name cannot be empty')
+    try:
+        age = int(record.get('age'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid age: {record.get('age')!r}") from None
+    if age < MIN_AGE or age > MAX_AGE:
+        raise ValueError(f'Age must be between {MIN_AGE} and {MAX_AGE}!')
+    grade = str(record.get('grade') or '').upper().strip()
+    if grade not in GRADES:
+        raise ValueError('Invalid grade! Use A, B, C, D or F')
+    return {
+        'student_id': str(record.get('student_id') or '').strip().upper() or None,
+        'name': name,
+        'age': age,
+        'grade': grade,
+        'department': str(record.get('department') or '').strip(),
+        'email': str(record.get('email') or '').strip(),
+        'phone': str(record.get('phone') or '').strip(),
+        'enrollment_date': record.get('enrollment_date') or None,
+    }
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    formats = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.stcol': 'columnar'}
+    if extension not in formats:
+        raise ValueError(f"Can't tell the format of {path}, use .csv, .jsonl or .stcol")
+    return formats[extension]
+
+
+def chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -- CSV / JSON Lines -------------------------------------------------------
+
+def read_csv(path):
+    '''Yield (row number, record) for each data row; row 1 is the first after the header'''
+    with open(path, 'r', newline='') as file:
+        for row, record in enumerate(csv.DictReader(file), start=1):
+            yield row, record
+
+
+def write_csv(path, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    count = 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+        for chunk in chunks(records, chunk_size):
+            writer.writerows([[record.get(field, '') for field in FIELDS] for record in chunk])
+            count += len(chunk)
+    return count
+
+
+def read_jsonl(path):
+    '''Yield (line number, record); an unparseable line yields its ValueError instead'''
+    with open(path, 'r') as file:
+        for row, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, e
+                continue
+            yield row, record
+
+
+def write_jsonl(path, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    count = 0
+    with open(path, 'w') as file:
+        for chunk in chunks(records, chunk_size):
+            file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in chunk))
+            count += len(chunk)
+    return count
+
+
+# -- Binary columnar ---------------------------------------------------------
+
+def _le(column):
+    # The file is little-endian whatever the host
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _write_strings(file, values):
+    encoded = [(value or '').encode('utf-8') for value in values]
+    file.write(_le(array('I', map(len, encoded))).tobytes())
+    blob = b''.join(encoded)
+    file.write(struct.pack('<I', len(blob)))
+    file.write(blob)
+
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated columnar file')
+    return data
+
+
+def _read_array(file, typecode, count):
+    column = array(typecode)
+    column.frombytes(_read_exact(file, column.itemsize * count))
+    return _le(column)
+
+
+def _read_strings(file, count):
+    lengths = _read_array(file, 'I', count)
+    (size,) = struct.unpack('<I', _read_exact(file, 4))
+    blob = _read_exact(file, size)
+    values, offset = [], 0
+    for length in lengths:
+        values.append(blob[offset:offset + length].decode('utf-8'))
+        offset += length
+    return values
+
+
+def write_columnar(path, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Write validated records as row groups of up to chunk_size students'''
+    grade_codes = {grade: code for code, grade in enumerate(GRADES)}
+    count = 0
+    with open(path, 'wb') as file:
+        file.write(COLUMNAR_MAGIC)
+        for chunk in chunks(records, chunk_size):
+            departments = {}
+            department_codes = array('H', (departments.setdefault(r['department'], len(departments)) for r in chunk))
+            file.write(struct.pack('<II', len(chunk), len(departments)))
+            file.write(array('B', (r['age'] for r in chunk)).tobytes())
+            file.write(array('B', (grade_codes[r['grade']] for r in chunk)).tobytes())
+            _write_strings(file, list(departments))
+            file.write(_le(department_codes).tobytes())
+            for field in _STRING_COLUMNS:
+                _write_strings(file, [r.get(field) for r in chunk])
+            count += len(chunk)
+    return count
+
+
+def read_columnar(path):
+    '''Yield (row number, record), decoding one row group at a time'''
+    with open(path, 'rb') as file:
+        if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a student columnar file")
+        row = 0
+        while True:
+            header = file.read(8)
+            if not header:
+                return
+            if len(header) != 8:
+                raise ValueError('Truncated columnar file')
+            count, department_count = struct.unpack('<II', header)
+            ages = _read_array(file, 'B', count)
+            grades = _read_array(file, 'B', count)
+            department_values = _read_strings(file, department_count)
+            departments = _read_array(file, 'H', count)
+            strings = {field: _read_strings(file, count) for field in _STRING_COLUMNS}
+            for i in range(count):
+                row += 1
+                grade = grades[i]
+                yield row, {
+                    'student_id': strings['student_id'][i],
+                    'name': strings['name'][i],
+                    'age': ages[i],
+                    'grade': GRADES[grade] if grade < len(GRADES) else grade,
+                    'department': department_values[departments[i]],
+                    'email': strings['email'][i],
+                    'phone': strings['phone'][i],
+                    'enrollment_date': strings['enrollment_date'][i],
+                }
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl, 'columnar': read_columnar}
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'columnar': write_columnar}
+
+
+def iter_valid(path, fmt=None, errors=None):
+    '''Yield validated records from path; rejected rows are appended to errors as RowError'''
+    reader = READERS[fmt or detect_format(path)]
+    for row, record in reader(path):
+        try:
+            if isinstance(record, Exception):
+                raise ValueError(f"Invalid JSON: {record}")
+            yield validate_record(record)
+        except ValueError as e:
+            if errors is not None:
+                errors.append(RowError(row, str(e)))
+
+
+def export_records(path, records, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Stream records (dicts with FIELDS) to path; returns the number written'''
+    return WRITERS[fmt or detect_format(path)](path, records, chunk_size)
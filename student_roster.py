@@ -0,0 +1,285 @@
+"""Columnar, array-backed roster for very large student lists
+
+ColumnarRoster is a drop-in replacement for the {student_id: Student} dict used
+by StudentManagementSystem. Instead of one Python object per student it keeps
+one column per field:
+
+    age          array('B')  1 byte
+    grade        array('B')  1 byte, index into GRADES
+    department   array('I')  4 bytes, code into a table of distinct departments
+    enrollment   array('q')  8 bytes, seconds since the epoch
+    id, name, email, phone   lists of str
+
+Looking a student up returns a RosterStudent, a Student whose attributes read
+and write the columns, so existing code keeps working unchanged.
+
+Traced memory per record (python -m benchmarks.bench_student_memory, 100k
+synthetic students, CPython 3.11, 64-bit), strings included:
+
+    dict of Student with __dict__    ~504 bytes
+    dict of Student with __slots__   ~464 bytes
+    ColumnarRoster                   ~374 bytes
+
+What remains is mostly the id, name, email and phone strings themselves.
+"""
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+
+from StudentManagementSystem import Student
+
+GRADES = "ABCDF"
+_GRADE_CODES = {grade: code for code, grade in enumerate(GRADES)}
+_EPOCH = datetime(1970, 1, 1)
+ENROLLMENT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _to_epoch(text):
+    # Hand-rolled parse is several times faster than strptime on bulk loads
+    try:
+        moment = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                          int(text[11:13]), int(text[14:16]), int(text[17:19]))
+    except (ValueError, TypeError, IndexError):
+        return None
+    return int((moment - _EPOCH).total_seconds())
+
+
+def _from_epoch(seconds):
+    return (_EPOCH + timedelta(seconds=seconds)).strftime(ENROLLMENT_FORMAT)
+
+
+class RosterStudent(Student):
+    '''A Student whose fields live in a ColumnarRoster row'''
+    __slots__ = ('_roster',)
+
+    def __init__(self, roster, student_id):
+        self._roster = roster
+        self.student_id = student_id
+
+    def _row(self):
+        return self._roster._rows[self.student_id]
+
+    name = property(lambda self: self._roster._names[self._row()],
+                    lambda self, value: self._roster._names.__setitem__(self._row(), value))
+    age = property(lambda self: self._roster._ages[self._row()],
+                   lambda self, value: self._roster._ages.__setitem__(self._row(), value))
+    grade = property(lambda self: GRADES[self._roster._grades[self._row()]],
+                     lambda self, value: self._roster._grades.__setitem__(self._row(), _GRADE_CODES[value]))
+    department = property(lambda self: self._roster._department_values[self._roster._departments[self._row()]],
+                          lambda self, value: self._roster._departments.__setitem__(self._row(), self._roster._department_code(value)))
+    email = property(lambda self: self._roster._emails[self._row()],
+                     lambda self, value: self._roster._emails.__setitem__(self._row(), value))
+    phone = property(lambda self: self._roster._phones[self._row()],
+                     lambda self, value: self._roster._phones.__setitem__(self._row(), value))
+    enrollment_date = property(lambda self: self._roster._enrollment_text(self._row()),
+                               lambda self, value: self._roster._set_enrollment(self._row(), value))
+
+
+class ColumnarRoster(MutableMapping):
+    '''Mapping of student_id -> RosterStudent backed by per-field columns'''
+
+    def __init__(self, students=()):
+        self._rows = {}
+        self._ids = []
+        self._names = []
+        self._ages = array('B')
+        self._grades = array('B')
+        self._departments = array('I')
+        self._department_values = []
+        self._department_codes = {}
+        self._emails = []
+        self._phones = []
+        self._enrolled = array('q')
+        # Enrollment strings that aren't in ENROLLMENT_FORMAT, kept verbatim by row
+        self._enrolled_raw = {}
+        for student in students:
+            self[student.student_id] = student
+
+    def _department_code(self, department):
+        code = self._department_codes.get(department)
+        if code is None:
+            code = self._department_codes[department] = len(self._department_values)
+            self._department_values.append(department)
+        return code
+
+    def _set_enrollment(self, row, text):
+        seconds = _to_epoch(text)
+        if seconds is None:
+            self._enrolled[row] = 0
+            self._enrolled_raw[row] = text
+        else:
+            self._enrolled[row] = seconds
+            self._enrolled_raw.pop(row, None)
+
+    def _enrollment_text(self, row):
+        raw = self._enrolled_raw.get(row)
+        return raw if raw is not None else _from_epoch(self._enrolled[row])
+
+    def __getitem__(self, student_id):
+        if student_id not in self._rows:
+            raise KeyError(student_id)
+        return RosterStudent(self, student_id)
+
+    def __setitem__(self, student_id, student):
+        if isinstance(student, RosterStudent) and student._roster is self and student.student_id == student_id:
+            return  # a view of this row, its writes already landed in the columns
+        row = self._rows.get(student_id)
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(student_id)
+            self._names.append(student.name)
+            self._ages.append(student.age)
+            self._grades.append(_GRADE_CODES[student.grade])
+            self._departments.append(self._department_code(student.department))
+            self._emails.append(student.email)
+            self._phones.append(student.phone)
+            self._enrolled.append(0)
+            self._rows[student_id] = row
+        else:
+            self._names[row] = student.name
+            self._ages[row] = student.age
+            self._grades[row] = _GRADE_CODES[student.grade]
+            self._departments[row] = self._department_code(student.department)
+            self._emails[row] = student.email
+            self._phones[row] = student.phone
+        self._set_enrollment(row, student.enrollment_date)
+
+    def __delitem__(self, student_id):
+        row = self._rows.pop(student_id)
+        last = len(self._ids) - 1
+        # Move the last row into the hole so every column stays dense
+        if row != last:
+            moved_id = self._ids[last]
+            for column in (self._ids, self._names, self._ages, self._grades, self._departments,
+                           self._emails, self._phones, self._enrolled):
+                column[row] = column[last]
+            raw = self._enrolled_raw.pop(last, None)
+            if raw is not None:
+                self._enrolled_raw[row] = raw
+            else:
+                self._enrolled_raw.pop(row, None)
+            self._rows[moved_id] = row
+        else:
+            self._enrolled_raw.pop(row, None)
+        for column in (self._ids, self._names, self._ages, self._grades, self._departments,
+                       self._emails, self._phones, self._enrolled):
+            column.pop()
+
+    def columns(self):
+        '''Raw (ages, grade codes, department codes, department values) columns, row-aligned'''
+        return self._ages, self._grades, self._departments, self._department_values
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, student_id):
+        return student_id in self._rows
+
+
+class LazyRoster(MutableMapping):
+    '''Mapping of student_id -> Student over a memory-mapped snapshot.
+
+    Only the snapshot's offset index is read at startup; a Student is parsed and
+    built the first time it is looked up, then kept. Journal entries newer than
+    the snapshot are held as plain dicts until accessed the same way. Iteration
+    yields snapshot students in ID order, then ones added since.
+    '''
+
+    def __init__(self, snapshot, pending, deleted, factory):
+        '''
+        Args:
+            snapshot: student_storage.SnapshotIndex for the snapshot file
+            pending: {student_id: student_dict} replayed from the journal
+            deleted: ids the journal deleted after the snapshot was written
+            factory: builds a Student from a stored dict
+        '''
+        self._snapshot = snapshot
+        self._pending = pending
+        self._factory = factory
+        self._students = {}
+        self._deleted = {student_id for student_id in deleted if snapshot.find(student_id) is not None}
+        # Ids in the roster that the snapshot doesn't have
+        self._added = {student_id for student_id in pending if snapshot.find(student_id) is None}
+        self._count = len(snapshot) - len(self._deleted) + len(self._added)
+
+    def __getitem__(self, student_id):
+        student = self._students.get(student_id)
+        if student is not None:
+            return student
+        record = self._pending.pop(student_id, None)
+        if record is None:
+            if student_id in self._deleted or student_id in self._added:
+                raise KeyError(student_id)
+            position = self._snapshot.find(student_id)
+            if position is None:
+                raise KeyError(student_id)
+            record = self._snapshot.record(position)
+        student = self._students[student_id] = self._factory(record)
+        return student
+
+    def __contains__(self, student_id):
+        if student_id in self._students or student_id in self._pending:
+            return True
+        if student_id in self._deleted or student_id in self._added:
+            return False
+        return self._snapshot.find(student_id) is not None
+
+    def __setitem__(self, student_id, student):
+        if student_id not in self:
+            self._count += 1
+            if student_id not in self._deleted:
+                self._added.add(student_id)
+        self._students[student_id] = student
+        self._pending.pop(student_id, None)
+        self._deleted.discard(student_id)
+
+    def __delitem__(self, student_id):
+        if student_id not in self:
+            raise KeyError(student_id)
+        self._students.pop(student_id, None)
+        self._pending.pop(student_id, None)
+        if student_id in self._added:
+            self._added.discard(student_id)
+        else:
+            self._deleted.add(student_id)
+        self._count -= 1
+
+    def __iter__(self):
+        deleted = self._deleted
+        for student_id in self._snapshot.ids:
+            if student_id not in deleted:
+                yield student_id
+        yield from list(self._added)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def materialized(self):
+        '''How many Student objects have been built so far'''
+        return len(self._students)
+
+    def records(self):
+        '''{student_id: student_dict} for every student, without building Student objects'''
+        records = {}
+        snapshot = self._snapshot
+        for position, student_id in enumerate(snapshot.ids):
+            if student_id not in self._deleted:
+                records[student_id] = self._record(student_id, position)
+        for student_id in self._added:
+            records[student_id] = self._record(student_id)
+        return records
+
+    def _record(self, student_id, position=None):
+        student = self._students.get(student_id)
+        if student is not None:
+            return student.to_dict()
+        if student_id in self._pending:
+            return self._pending[student_id]
+        return self._snapshot.record(position)
+
+    def close(self):
+        self._snapshot.close()
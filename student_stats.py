@@ -0,0 +1,150 @@
+"""Roster statistics: running aggregates plus a NumPy batch report"""
+
+
+class StudentStats:
+    '''Grade histogram, department counts and age totals kept in step with the roster.
+
+    Each add/update/delete adjusts the counters in O(1), so a summary never walks
+    the roster. The grade, department and age counted for every student are
+    remembered so an update or delete can take back exactly what was added.
+    '''
+
+    def __init__(self, students=()):
+        self.grades = {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0}
+        self.departments = {}
+        self.age_sum = 0
+        self._counted = {}  # student id -> (grade, department, age)
+        for student in students:
+            self.add(student)
+
+    def __len__(self):
+        return len(self._counted)
+
+    def add(self, student):
+        sid = student.student_id
+        if sid in self._counted:
+            self.remove(sid)
+        entry = (student.grade, student.department, student.age)
+        self._counted[sid] = entry
+        grade, department, age = entry
+        self.grades[grade] = self.grades.get(grade, 0) + 1
+        self.departments[department] = self.departments.get(department, 0) + 1
+        self.age_sum += age
+
+    def remove(self, student_id):
+        entry = self._counted.pop(student_id, None)
+        if entry is None:
+            return
+        grade, department, age = entry
+        self.grades[grade] -= 1
+        self.departments[department] -= 1
+        if not self.departments[department]:
+            del self.departments[department]
+        self.age_sum -= age
+
+    def update(self, student):
+        '''Recount a student whose fields may have changed'''
+        self.add(student)
+
+    def summary(self):
+        '''Totals, average age and grade/department counts with percentages'''
+        total = len(self._counted)
+
+        def distribution(counts):
+            return {key: {'count': count, 'percent': round(count / total * 100, 1) if total else 0.0}
+                    for key, count in counts.items()}
+
+        return {
+            'total': total,
+            'average_age': self.age_sum / total if total else 0.0,
+            'grades': distribution(self.grades),
+            'departments': distribution(dict(sorted(self.departments.items()))),
+        }
+
+
+def _columns(students, np):
+    '''(ages, grade codes, department codes, grade labels, department labels) as arrays'''
+    from student_roster import ColumnarRoster, GRADES
+    if isinstance(students, ColumnarRoster):
+        ages, grades, departments, department_values = students.columns()
+        return (np.frombuffer(ages, dtype=np.uint8).astype(np.int64),
+                np.frombuffer(grades, dtype=np.uint8).astype(np.int64),
+                np.frombuffer(departments, dtype=f'u{departments.itemsize}').astype(np.int64),
+                list(GRADES), list(department_values))
+
+    grade_codes = {grade: code for code, grade in enumerate(GRADES)}
+    department_codes = {}
+    count = len(students)
+    ages = np.empty(count, dtype=np.int64)
+    grades = np.empty(count, dtype=np.int64)
+    departments = np.empty(count, dtype=np.int64)
+    for row, student in enumerate(students.values()):
+        ages[row] = student.age
+        grades[row] = grade_codes.setdefault(student.grade, len(grade_codes))
+        departments[row] = department_codes.setdefault(student.department, len(department_codes))
+    return ages, grades, departments, list(grade_codes), list(department_codes)
+
+
+def detailed_report(students, percentiles=(10, 25, 50, 75, 90)):
+    '''Richer statistics computed in one vectorized pass (requires NumPy)
+
+    Args:
+        students: {student_id: Student} mapping or a ColumnarRoster
+        percentiles: age percentiles to report
+
+    Returns:
+        dict with 'total', 'age' (mean/std/min/max/percentiles), 'age_by_department'
+        (count/mean/median), 'grade_by_department' (department -> grade -> count,
+        the full cross-tab) and 'grade_share_by_department' (same, as percentages)
+    '''
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("'numpy' is required for the detailed report") from None
+
+    ages, grades, departments, grade_labels, department_labels = _columns(students, np)
+    total = len(ages)
+    if not total:
+        return {'total': 0, 'age': {}, 'age_by_department': {}, 'grade_by_department': {},
+                'grade_share_by_department': {}}
+
+    n_grades, n_departments = len(grade_labels), len(department_labels)
+    crosstab = np.bincount(departments * n_grades + grades,
+                           minlength=n_departments * n_grades).reshape(n_departments, n_grades)
+    per_department = crosstab.sum(axis=1)
+    age_sums = np.bincount(departments, weights=ages, minlength=n_departments)
+
+    # Medians per department from one sort by (department, age)
+    order = np.lexsort((ages, departments))
+    sorted_ages = ages[order]
+    starts = np.concatenate(([0], np.cumsum(per_department)[:-1]))
+
+    age_by_department = {}
+    grade_by_department = {}
+    grade_share = {}
+    for code in np.argsort(department_labels):
+        count = int(per_department[code])
+        if not count:
+            continue  # a department code whose students have all been reassigned
+        name = department_labels[code]
+        group = sorted_ages[starts[code]:starts[code] + count]
+        age_by_department[name] = {'count': count, 'mean': float(age_sums[code] / count),
+                                   'median': float(np.median(group))}
+        grade_by_department[name] = {grade_labels[g]: int(crosstab[code, g]) for g in range(n_grades)}
+        grade_share[name] = {grade_labels[g]: round(float(crosstab[code, g] / count * 100), 1)
+                             for g in range(n_grades)}
+
+    values = np.percentile(ages, percentiles)
+    return {
+        'total': total,
+        'age': {
+            'mean': float(ages.mean()),
+            'std': float(ages.std()),
+            'min': int(ages.min()),
+            'max': int(ages.max()),
+            'percentiles': {p: float(v) for p, v in zip(percentiles, values)},
+        },
+        'age_by_department': age_by_department,
+        'grade_by_department': grade_by_department,
+        'grade_share_by_department': grade_share,
+    }
@@ -0,0 +1,583 @@
+"""Storage backends for the Student Management System"""
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:  # Windows locks a byte range with msvcrt instead
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Snapshot key holding storage metadata (e.g. the ID allocator's high-water mark)
+# rather than a student; student IDs never start with an underscore
+META_KEY = '_meta'
+
+
+class FileLock:
+    '''Exclusive lock on <data_file>.lock, shared by every process using the data
+    file: flock where there is one, otherwise (Windows) msvcrt.locking on its first
+    byte. Reentrant within a process.'''
+
+    def __init__(self, path):
+        if fcntl is None and msvcrt is None:
+            raise RuntimeError("No file locking on this platform; the student data file can't be shared safely")
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                self._lock_byte()
+        self._depth += 1
+        return self
+
+    def _lock_byte(self):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                # LK_LOCK retries for about 10 seconds before giving up; keep waiting like flock
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _file_id(path):
+    '''Identity of the file at path; changes when it is rewritten or replaced'''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class JsonFileStorage:
+    '''Original format: the whole roster rewritten as one JSON document on every change'''
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.meta = {}
+        self._lock = FileLock(data_file + '.lock')
+        self._snapshot_id = None
+
+    def locked(self):
+        return self._lock
+
+    def load(self):
+        '''Return {student_id: student_dict} for every stored student'''
+        with self._lock:
+            self._snapshot_id = _file_id(self.data_file)
+            if self._snapshot_id is None:
+                return {}
+            with open(self.data_file, 'r') as file:
+                records = json.load(file)
+        self.meta = records.pop(META_KEY, {})
+        return records
+
+    def poll(self):
+        '''[] if the file is as we last saw it, None if another process rewrote it'''
+        with self._lock:
+            return [] if _file_id(self.data_file) == self._snapshot_id else None
+
+    def set_meta(self, key, value):
+        self.meta[key] = value
+
+    def put(self, record):
+        pass
+
+    def put_many(self, records):
+        pass
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def delete(self, student_id):
+        pass
+
+    def needs_compaction(self, student_count):
+        # Every change is only persisted by a full rewrite
+        return True
+
+    def compact(self, records):
+        if self.meta:
+            records = {META_KEY: self.meta, **records}
+        with self._lock:
+            with open(self.data_file, 'w') as file:
+                json.dump(records, file, indent=4)
+            self._snapshot_id = _file_id(self.data_file)
+
+    def sync(self):
+        pass
+
+    def close(self):
+        self._lock.close()
+
+
+class JournalStorage:
+    '''Snapshot file plus an append-only change journal.
+
+    Each add/update/delete appends one JSON line to <data_file>.journal, so an edit
+    costs O(1) I/O. fsync is batched: every fsync_every entries or fsync_interval
+    seconds, whichever comes first. Once the journal outgrows compact_ratio of the
+    roster, the caller compacts it into a new snapshot. The snapshot is written to a
+    temp file and atomically renamed over the old one, then the journal is
+    truncated. Replaying is idempotent, so a crash between those two steps is safe.
+
+    Several processes can share the files. Every read and write of them happens
+    under an flock on <data_file>.lock. Each process remembers which snapshot it
+    loaded and how far into the journal it has read; poll() uses those as a
+    version check and returns the entries other processes appended since. If the
+    snapshot was replaced by someone else's compaction, poll() asks for a full
+    reload. The caller holds locked() across read-modify-write sequences so a
+    change is always made against the latest state.'''
+
+    def __init__(self, data_file, fsync_every=64, fsync_interval=1.0, compact_min=1000, compact_ratio=0.5):
+        self.data_file = data_file
+        self.journal_file = data_file + '.journal'
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_min = compact_min
+        self.compact_ratio = compact_ratio
+        self.journal_entries = 0
+        self.meta = {}
+        self._journal = None
+        self._batch = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = FileLock(data_file + '.lock')
+        self._snapshot_id = None  # _file_id of the snapshot this process loaded
+        self._journal_offset = 0  # bytes of the journal this process has applied
+
+    def locked(self):
+        '''Context manager holding the cross-process lock'''
+        return self._lock
+
+    def load(self):
+        '''Return {student_id: student_dict} from the snapshot with the journal replayed'''
+        records = {}
+        with self._lock:
+            self._snapshot_id = _file_id(self.data_file)
+            if self._snapshot_id is not None:
+                with open(self.data_file, 'r') as file:
+                    records = json.load(file)
+            self.meta = records.pop(META_KEY, {})
+            self.replay_journal(records)
+        return records
+
+    def replay_journal(self, records, deleted=None):
+        '''Apply the journal to records; ids it deletes are also added to deleted if given'''
+        self.journal_entries = 0
+        self._journal_offset = 0
+        with self._lock:
+            if not os.path.exists(self.journal_file):
+                return
+            with open(self.journal_file, 'rb') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(records, entry, deleted)
+                    self.journal_entries += len(entry['entries']) if entry['op'] == 'batch' else 1
+                    self._journal_offset += len(line)
+            if self._journal_offset < os.path.getsize(self.journal_file):
+                # Drop a torn final line from a crash mid-append so new entries start clean
+                os.truncate(self.journal_file, self._journal_offset)
+
+    def poll(self):
+        '''Changes other processes have written since this one last loaded or polled
+        
+        Returns the new put/delete entries in order (meta entries are applied to
+        self.meta), or None when the snapshot has been replaced by a compaction
+        elsewhere and the caller has to load() again.
+        '''
+        with self._lock:
+            if _file_id(self.data_file) != self._snapshot_id:
+                return None
+            try:
+                size = os.path.getsize(self.journal_file)
+            except OSError:
+                size = 0
+            if size < self._journal_offset:
+                return None
+            changes = []
+            if size == self._journal_offset:
+                return changes
+            with open(self.journal_file, 'rb') as journal:
+                journal.seek(self._journal_offset)
+                for line in journal:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._collect(entry, changes)
+                    self.journal_entries += len(entry['entries']) if entry['op'] == 'batch' else 1
+                    self._journal_offset += len(line)
+            return changes
+
+    def _collect(self, entry, changes):
+        if entry['op'] == 'batch':
+            for sub_entry in entry['entries']:
+                self._collect(sub_entry, changes)
+        elif entry['op'] == 'meta':
+            self.meta[entry['key']] = entry['value']
+        else:
+            changes.append(entry)
+
+    def _apply(self, records, entry, deleted=None):
+        if entry['op'] == 'batch':
+            for sub_entry in entry['entries']:
+                self._apply(records, sub_entry, deleted)
+        elif entry['op'] == 'meta':
+            self.meta[entry['key']] = entry['value']
+        elif entry['op'] == 'put':
+            student_id = entry['student']['student_id']
+            records[student_id] = entry['student']
+            if deleted is not None:
+                deleted.discard(student_id)
+        elif entry['op'] == 'delete':
+            records.pop(entry['student_id'], None)
+            if deleted is not None:
+                deleted.add(entry['student_id'])
+
+    def open_snapshot(self):
+        '''Memory-map the snapshot for lazy loading, see SnapshotIndex
+        
+        Returns None when there is no snapshot or it isn't in the one-record-per-line
+        layout compact writes (e.g. an old indented file), so the caller should load
+        it in full instead.
+        '''
+        with self._lock:
+            snapshot = SnapshotIndex.open(self.data_file, self.data_file + '.idx')
+            if snapshot is not None:
+                self.meta = snapshot.meta
+                self._snapshot_id = _file_id(self.data_file)
+        return snapshot
+
+    def put(self, record):
+        self._append({'op': 'put', 'student': record})
+
+    def put_many(self, records):
+        '''Journal a batch of puts with one write and at most one fsync'''
+        self._append_many([{'op': 'put', 'student': record} for record in records])
+
+    def delete(self, student_id):
+        self._append({'op': 'delete', 'student_id': student_id})
+
+    def set_meta(self, key, value):
+        self.meta[key] = value
+        self._append({'op': 'meta', 'key': key, 'value': value})
+
+    def begin(self):
+        '''Buffer entries until commit instead of writing them'''
+        if self._batch is None:
+            self._batch = []
+
+    def commit(self):
+        '''Write the buffered entries as one journal line and fsync it.
+        
+        A single line means a crash mid-write loses the whole batch on replay
+        (the torn line is dropped), never part of it.
+        '''
+        entries, self._batch = self._batch, None
+        if entries:
+            self._write([{'op': 'batch', 'entries': entries}], len(entries))
+            self.sync()
+
+    def rollback(self):
+        self._batch = None
+
+    def _append(self, entry):
+        self._append_many([entry])
+
+    def _append_many(self, entries):
+        if not entries:
+            return
+        if self._batch is not None:
+            self._batch.extend(entries)
+            return
+        self._write(entries, len(entries))
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def _write(self, lines, entry_count):
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a')
+            size = self._repair_tail()
+            self._journal.write(''.join(json.dumps(line, separators=(',', ':')) + '\n' for line in lines))
+            self._journal.flush()
+            if size == self._journal_offset:
+                # Nothing unseen before our lines, so there's no need to read them back in poll
+                self._journal_offset = os.fstat(self._journal.fileno()).st_size
+        self.journal_entries += entry_count
+        self._unsynced += entry_count
+
+    def _repair_tail(self):
+        '''Cut off a torn line left by a process that died mid-append; returns the journal size'''
+        size = os.fstat(self._journal.fileno()).st_size
+        if not size:
+            return size
+        with open(self.journal_file, 'rb') as journal:
+            journal.seek(size - 1)
+            if journal.read(1) == b'\n':
+                return size
+            journal.seek(0)
+            size = journal.read().rfind(b'\n') + 1
+        os.truncate(self.journal_file, size)
+        return size
+
+    def sync(self):
+        '''fsync any journal entries written since the last sync'''
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def needs_compaction(self, student_count):
+        return self.journal_entries >= max(self.compact_min, student_count * self.compact_ratio)
+
+    def compact(self, records):
+        '''Atomically replace the snapshot with records and empty the journal'''
+        with self._lock:
+            self._compact(records)
+
+    def _compact(self, records):
+        tmp_file = self.data_file + '.tmp'
+        ids = []
+        starts = array('Q')
+        ends = array('Q')
+        # Binary, so offsets are the bytes actually written (text mode on Windows turns
+        # every \n into \r\n behind our back)
+        with open(tmp_file, 'wb') as file:
+            # One record per line keeps the snapshot valid JSON and cheap to scan
+            file.write(b'{\n')
+            offset = 2
+            if self.meta:
+                # Always the first line, so a lazy open finds it without the index
+                line = f"{json.dumps(META_KEY)}: {json.dumps(self.meta)}{',' if records else ''}\n".encode('utf-8')
+                file.write(line)
+                offset += len(line)
+            for i, (student_id, record) in enumerate(records.items()):
+                separator = b',\n' if i < len(records) - 1 else b'\n'
+                key = (json.dumps(student_id) + ': ').encode('utf-8')
+                value = json.dumps(record).encode('utf-8')
+                file.write(key + value + separator)
+                ids.append(student_id)
+                starts.append(offset + len(key))
+                ends.append(offset + len(key) + len(value))
+                offset += len(key) + len(value) + len(separator)
+            file.write(b'}\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, self.data_file)
+        _fsync_dir(self.data_file)
+        SnapshotIndex.save(self.data_file + '.idx', os.stat(self.data_file), *SnapshotIndex.sort(ids, starts, ends))
+
+        if self._journal is not None:
+            self._journal.close()
+        # Append mode, not 'w': other processes append too, and every write must land at the end
+        self._journal = open(self.journal_file, 'a')
+        self._journal.truncate(0)
+        os.fsync(self._journal.fileno())
+        self.journal_entries = 0
+        self._unsynced = 0
+        self._snapshot_id = _file_id(self.data_file)
+        self._journal_offset = 0
+
+    def close(self):
+        self.sync()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._lock.close()
+
+
+class SnapshotIndex:
+    '''Byte offsets of every record in a memory-mapped snapshot, sorted by id.
+    
+    Lookups bisect the sorted id list, so opening never builds a per-record dict.
+    Persisted next to the snapshot as <data_file>.idx (written by compact, or by
+    the first scan of a snapshot that has none) and tagged with the snapshot's
+    size and mtime so a stale index is rebuilt instead of trusted. Layout:
+    magic, (size, mtime_ns, count) as uint64, value start and end offsets as
+    uint64 arrays, then the ids as newline-separated UTF-8.
+    '''
+    MAGIC = b'STIDX1\n'
+
+    def __init__(self, file, mm, ids, starts, ends):
+        self._file = file
+        self._mm = mm
+        self.meta = self._read_meta(mm)
+        self.ids = ids
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def open(cls, data_file, index_file):
+        if not os.path.exists(data_file) or os.path.getsize(data_file) == 0:
+            return None
+        file = open(data_file, 'rb')
+        try:
+            stat = os.fstat(file.fileno())
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            file.close()
+            return None
+        columns = cls._load(index_file, stat)
+        if columns is None:
+            columns = cls._scan(mm)
+            if columns is None:
+                mm.close()
+                file.close()
+                return None
+            cls.save(index_file, stat, *columns)
+        return cls(file, mm, *columns)
+
+    @staticmethod
+    def _read_meta(mm):
+        mm.seek(0)
+        mm.readline()
+        line = mm.readline()
+        prefix = json.dumps(META_KEY).encode('utf-8') + b': '
+        if not line.startswith(prefix):
+            return {}
+        return json.loads(line[len(prefix):].rstrip(b',\r\n'))
+
+    @classmethod
+    def _load(cls, index_file, stat):
+        try:
+            with open(index_file, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        header = len(cls.MAGIC) + 24
+        if not data.startswith(cls.MAGIC) or len(data) < header:
+            return None
+        size, mtime_ns, count = struct.unpack_from('<QQQ', data, len(cls.MAGIC))
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        starts, ends = array('Q'), array('Q')
+        starts.frombytes(data[header:header + 8 * count])
+        ends.frombytes(data[header + 8 * count:header + 16 * count])
+        blob = data[header + 16 * count:]
+        ids = blob.decode('utf-8').split('\n') if count else []
+        if len(starts) != count or len(ends) != count or len(ids) != count:
+            return None
+        return ids, starts, ends
+
+    @staticmethod
+    def _scan(mm):
+        '''Find each record's offsets by reading the snapshot line by line'''
+        decoder = json.JSONDecoder()
+        ids, starts, ends = [], array('Q'), array('Q')
+        if mm.readline().strip() != b'{':
+            return None
+        offset = mm.tell()
+        for line in iter(mm.readline, b''):
+            stripped = line.rstrip(b',\r\n')
+            if stripped == b'}':
+                break
+            try:
+                text = stripped.decode('utf-8')
+                student_id, key_end = decoder.raw_decode(text)
+            except ValueError:
+                return None
+            if text[key_end:key_end + 2] != ': ' or not text.endswith('}'):
+                return None
+            if student_id == META_KEY:
+                offset += len(line)
+                continue
+            ids.append(student_id)
+            starts.append(offset + len(text[:key_end + 2].encode('utf-8')))
+            ends.append(offset + len(stripped))
+            offset += len(line)
+        return SnapshotIndex.sort(ids, starts, ends)
+
+    @staticmethod
+    def sort(ids, starts, ends):
+        '''Reorder the three columns by id'''
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        return ([ids[i] for i in order], array('Q', (starts[i] for i in order)),
+                array('Q', (ends[i] for i in order)))
+
+    @classmethod
+    def save(cls, index_file, stat, ids, starts, ends):
+        tmp_file = index_file + '.tmp'
+        try:
+            with open(tmp_file, 'wb') as file:
+                file.write(cls.MAGIC)
+                file.write(struct.pack('<QQQ', stat.st_size, stat.st_mtime_ns, len(ids)))
+                file.write(starts.tobytes())
+                file.write(ends.tobytes())
+                file.write('\n'.join(ids).encode('utf-8'))
+            os.replace(tmp_file, index_file)
+        except OSError:
+            pass  # only a cache, the next start rescans
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, student_id):
+        '''Position of student_id in the index, or None'''
+        position = bisect_left(self.ids, student_id)
+        if position < len(self.ids) and self.ids[position] == student_id:
+            return position
+        return None
+
+    def record(self, position):
+        '''Parse and return the student dict at a position from find'''
+        return json.loads(self._mm[self.starts[position]:self.ends[position]])
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def _fsync_dir(path):
+    '''Make a rename durable by syncing its directory (not supported on Windows)'''
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,143 @@
+"""Fixtures for the API tests: each test gets the app on its own throwaway database"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth, database, events, main, models
+from dependencies import get_db, get_async_db, task_cache, user_cache
+
+
+def create_user(session_factory, username, password=None):
+    '''Create a user (password defaults to the username), returns auth headers for them'''
+    with session_factory() as db:
+        db.add(models.User(username=username, hashed_password=auth.get_password_hash(password or username)))
+        db.commit()
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+
+
+class ASGIWebSocket:
+    '''In-process WebSocket client for the app (httpx only speaks HTTP to ASGI apps)
+
+    async with ASGIWebSocket("/ws", "token=...") as ws: await ws.receive_text()
+    '''
+
+    def __init__(self, path, query_string=""):
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(),
+            "headers": [(b"host", b"test")], "client": ("127.0.0.1", 50000), "server": ("test", 80),
+            "subprotocols": [],
+        }
+        self._to_app = asyncio.Queue()
+        self._to_client = asyncio.Queue()
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(main.app(self.scope, self._to_app.get, self._to_client.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._to_client.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+        return self
+
+    async def receive_text(self):
+        message = await self._to_client.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"WebSocket closed with code {message.get('code')}")
+        return message["text"] if message.get("text") is not None else message["bytes"].decode()
+
+    async def send_text(self, text):
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def __aexit__(self, *exc_info):
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    '''Sync engine on an empty database with the app's schema'''
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def app_db(tmp_path):
+    '''(sync sessionmaker, auth headers for the user "alice") with the app's sessions
+    pointed at a fresh database'''
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    sync_engine = database.make_engine(url)
+    async_engine = database.make_async_engine(url)
+    models.Base.metadata.create_all(bind=sync_engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    TestAsyncSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def test_async_db():
+        async with TestAsyncSession() as db:
+            yield db
+
+    main.app.dependency_overrides[get_db] = test_db
+    main.app.dependency_overrides[get_async_db] = test_async_db
+    # The NDJSON stream and /ws open their own sessions rather than using the dependencies
+    session_factories = main.SessionLocal, main.AsyncSessionLocal
+    main.SessionLocal, main.AsyncSessionLocal = TestSession, TestAsyncSession
+    # Cached users and tasks from an earlier test would share ids with this database
+    user_cache.clear()
+    task_cache.clear()
+
+    headers = create_user(TestSession, "alice")
+    try:
+        yield TestSession, headers
+    finally:
+        main.app.dependency_overrides.clear()
+        main.SessionLocal, main.AsyncSessionLocal = session_factories
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
+
+
+@pytest.fixture
+def add_user():
+    '''create_user, for tests that need a second account'''
+    return create_user
+
+
+@pytest.fixture
+def asgi_websocket():
+    '''ASGIWebSocket, to open in-process WebSockets to the app'''
+    return ASGIWebSocket
+
+
+@pytest.fixture
+def asgi_client():
+    '''Factory for in-process HTTP clients talking to the app'''
+    return lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+@pytest.fixture
+def run():
+    '''Run an async test body on a fresh loop with the broker started, as the lifespan does'''
+    def run(scenario):
+        async def with_app():
+            events.bus.bind(asyncio.get_running_loop())
+            await main.manager.broker.start()
+            try:
+                return await scenario()
+            finally:
+                await main.manager.broker.stop()
+        return asyncio.run(with_app())
+    return run
@@ -0,0 +1,75 @@
+import pytest
+
+from calculator_engine import ExpressionError, evaluate, evaluate_columns, evaluate_many, parse
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1 + 2 * 3", 7.0),
+    ("10 - 4 - 3", 3.0),
+    ("10 - (4 - 3)", 9.0),
+    ("8 / (2 / 2)", 8.0),
+    ("-2 ** 2", -4.0),
+    ("(-2) ** 2", 4.0),
+    ("2 ^ 3 ^ 2", 512.0),
+    ("(2 ^ 3) ^ 2", 64.0),
+    ("2 ^ -1", 0.5),
+    ("--3", 3.0),
+    ("-(2 + 3)", -5.0),
+    ("7 // 2 % 3", 0.0),
+])
+def test_precedence_and_grouping(expression, expected):
+    assert evaluate(expression) == expected
+
+
+def test_long_sum():
+    assert evaluate(" + ".join(["1"] * 250)) == 250.0
+    assert evaluate(" + ".join(["x"] * 1000), x=0.5) == 500.0
+
+
+def test_deep_parentheses():
+    assert evaluate("(" * 150 + "1" + ")" * 150) == 1.0
+
+
+@pytest.mark.parametrize("expression", [
+    " + ".join(["x"] * 5000),
+    "(" * 1000 + "1" + ")" * 1000,
+])
+def test_too_big_to_compile_is_an_expression_error(expression):
+    with pytest.raises(ExpressionError):
+        evaluate(expression, x=1)
+
+
+@pytest.mark.parametrize("expression", ["(-8) ^ 0.5", "((-8) ^ 0.5) // 2", "(0 - 1) ** 0.25 * 0"])
+def test_complex_results_are_rejected(expression):
+    with pytest.raises(ExpressionError, match="not a real number"):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", ["", "1 +", "(1 + 2", "1 $ 2", "2 3"])
+def test_parse_errors(expression):
+    with pytest.raises(ExpressionError):
+        parse(expression)
+
+
+def test_missing_variable():
+    with pytest.raises(ExpressionError, match="'y'"):
+        evaluate("x + y", x=1)
+
+
+def test_evaluate_many_reports_errors_per_line():
+    lines = ["1 + 1", "", "# comment", "1 / 0", "(-8) ^ 0.5", "(" * 1000 + "1" + ")" * 1000, "2 *", "2 ^ 10"]
+    results = {line_number: (result, error) for line_number, _, result, error in evaluate_many(lines)}
+    assert results[1] == (2.0, None)
+    assert results[4] == (None, "Cannot divide by zero")
+    assert results[5] == (None, "Result is not a real number")
+    assert results[6][0] is None and results[6][1]
+    assert results[7][0] is None and results[7][1]
+    assert results[8] == (1024.0, None)
+    assert set(results) == {1, 4, 5, 6, 7, 8}
+
+
+def test_evaluate_columns_flags_division_by_zero():
+    np = pytest.importorskip("numpy")
+    values, errors = evaluate_columns("a / (b - 1) ^ 2", a=[1, 2], b=[1, 3])
+    assert np.isnan(values[0]) and values[1] == 0.5
+    assert errors.tolist() == [True, False]
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+import database
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_in_memory_sqlite_engines(url):
+    engine = database.make_engine(url)
+    with engine.connect() as connection:
+        assert connection.execute(text("select 1")).scalar() == 1
+    engine.dispose()
+
+    async def query():
+        async_engine = database.make_async_engine(url)
+        async with async_engine.connect() as connection:
+            value = (await connection.execute(text("select 1"))).scalar()
+        await async_engine.dispose()
+        return value
+
+    assert asyncio.run(query()) == 1
+
+
+def test_file_sqlite_engines_are_pooled(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pooled.db'}"
+    engine = database.make_engine(url)
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    engine.dispose()
+    async_engine = database.make_async_engine(url)
+    assert async_engine.pool.size() == database.DB_POOL_SIZE
+    asyncio.run(async_engine.dispose())
+
+
+def test_app_imports_with_an_in_memory_database():
+    env = {**os.environ, "DATABASE_URL": "sqlite://"}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", "import main"], cwd=root, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///x.db", "sqlite+aiosqlite:///x.db"),
+    ("sqlite+pysqlite:///x.db", "sqlite+aiosqlite:///x.db"),
+    ("postgresql+psycopg2://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+    ("postgresql://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+])
+def test_async_url(url, expected):
+    assert database.async_url(url) == expected
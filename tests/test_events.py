@@ -0,0 +1,90 @@
+from sqlalchemy import event, insert, select
+
+import events, models
+
+
+def user_id(session_factory, username):
+    with session_factory() as db:
+        return db.execute(select(models.User.id).filter(models.User.username == username)).scalar_one()
+
+
+def commit_during_insert(session_factory, commit):
+    '''Run commit() in another session just before the next INSERT into tasks executes'''
+    engine = session_factory.kw["bind"]
+    done = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not done and statement.startswith("INSERT INTO tasks"):
+            done.append(True)
+            commit()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return lambda: event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_concurrent_inserts_are_attributed_to_their_own_transaction(app_db, add_user):
+    session_factory, _ = app_db
+    add_user(session_factory, "bob")
+    alice, bob = user_id(session_factory, "alice"), user_id(session_factory, "bob")
+    other = {}
+
+    def bob_commits():
+        with session_factory() as db:
+            db.add(models.Task(title="bob's", owner_id=bob))
+            db.commit()
+            other["events"] = events.committed(db)
+
+    stop = commit_during_insert(session_factory, bob_commits)
+    try:
+        with session_factory() as db:
+            db.execute(insert(models.Task), [{"title": f"alice {i}", "owner_id": alice} for i in range(3)])
+            db.commit()
+            mine = events.committed(db)
+    finally:
+        stop()
+
+    with session_factory() as db:
+        alice_ids = set(db.execute(select(models.Task.id).filter(models.Task.owner_id == alice)).scalars())
+        changes = db.execute(select(models.TaskChange.owner_id, models.TaskChange.task_id)).all()
+
+    assert len(alice_ids) == 3
+    assert {(e.owner_id, e.task_id, e.op) for e in mine} == {(alice, task_id, events.CREATED) for task_id in alice_ids}
+    assert [(e.owner_id, e.op) for e in other["events"]] == [(bob, events.CREATED)]
+    assert sorted(changes) == sorted([(alice, task_id) for task_id in alice_ids] + [(bob, other["events"][0].task_id)])
+
+
+def test_insert_returning_tasks_still_returns_them(app_db):
+    session_factory, _ = app_db
+    alice = user_id(session_factory, "alice")
+
+    with session_factory() as db:
+        tasks = db.execute(insert(models.Task).returning(models.Task),
+                           [{"title": "a", "owner_id": alice}, {"title": "b", "owner_id": alice}]).scalars().all()
+        returned = [(task.id, task.title) for task in tasks]
+        db.commit()
+        committed = events.committed(db)
+
+    assert [title for _, title in returned] == ["a", "b"]
+    assert [(e.task_id, e.op, e.task["title"]) for e in committed] == [(task_id, events.CREATED, title)
+                                                                        for task_id, title in returned]
+
+
+def test_events_carry_the_previous_seq_of_their_owner(app_db):
+    session_factory, _ = app_db
+    alice = user_id(session_factory, "alice")
+
+    with session_factory() as db:
+        task = models.Task(title="one", owner_id=alice)
+        db.add(task)
+        db.commit()
+        first = events.committed(db)
+        task.completed = True
+        db.commit()
+        second = events.committed(db)
+        db.delete(task)
+        db.commit()
+        third = events.committed(db)
+
+    assert [(e.op, e.previous_seq) for e in first] == [(events.CREATED, 0)]
+    assert [(e.op, e.previous_seq) for e in second] == [(events.UPDATED, first[0].seq)]
+    assert [(e.op, e.previous_seq, e.task) for e in third] == [(events.DELETED, second[0].seq, None)]
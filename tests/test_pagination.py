@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import crud, models
+
+
+def add_tasks(session_factory, owner_id, count):
+    start = datetime(2024, 1, 1)
+    with session_factory() as db:
+        db.add_all(models.Task(title=f"task {i}", owner_id=owner_id, created_at=start + timedelta(minutes=i))
+                   for i in range(count))
+        db.commit()
+
+
+def test_no_limit_returns_every_task(app_db, run, asgi_client):
+    session_factory, headers = app_db
+    add_tasks(session_factory, 1, 250)
+
+    async def scenario():
+        async with asgi_client() as client:
+            return await client.get("/tasks/", headers=headers)
+
+    response = run(scenario)
+    assert response.status_code == 200
+    assert len(response.json()) == 250
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_pages_cover_every_task_once(app_db, run, asgi_client):
+    session_factory, headers = app_db
+    add_tasks(session_factory, 1, 250)
+
+    async def scenario():
+        async with asgi_client() as client:
+            everything = (await client.get("/tasks/", headers=headers)).json()
+            pages = []
+            params = {"limit": 100}
+            while True:
+                response = await client.get("/tasks/", headers=headers, params=params)
+                pages.append(response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    return everything, pages
+                params = {"limit": 100, "cursor": cursor}
+
+    everything, pages = run(scenario)
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert [task["id"] for page in pages for task in page] == [task["id"] for task in everything]
+
+
+def test_cursor_without_limit_returns_a_default_page(app_db, run, asgi_client):
+    session_factory, headers = app_db
+    add_tasks(session_factory, 1, crud.DEFAULT_PAGE_SIZE + 50)
+
+    async def scenario():
+        async with asgi_client() as client:
+            first = await client.get("/tasks/", headers=headers, params={"limit": 10})
+            return await client.get("/tasks/", headers=headers, params={"cursor": first.headers["X-Next-Cursor"]})
+
+    response = run(scenario)
+    assert len(response.json()) == crud.DEFAULT_PAGE_SIZE
+    assert response.json()[0]["title"] == "task 10"
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_filters_apply_across_pages(app_db, run, asgi_client):
+    session_factory, headers = app_db
+    add_tasks(session_factory, 1, 30)
+    with session_factory() as db:
+        db.query(models.Task).filter(models.Task.id % 3 == 0).update({"completed": True})
+        db.commit()
+
+    async def scenario():
+        async with asgi_client() as client:
+            first = await client.get("/tasks/", headers=headers, params={"limit": 4, "completed": True})
+            rest = await client.get("/tasks/", headers=headers,
+                                    params={"completed": True, "cursor": first.headers["X-Next-Cursor"]})
+            return first.json() + rest.json()
+
+    tasks = run(scenario)
+    assert len(tasks) == 10
+    assert all(task["completed"] for task in tasks)
+
+
+def test_stream_honours_limit(app_db, run, asgi_client):
+    session_factory, headers = app_db
+    add_tasks(session_factory, 1, 30)
+
+    async def scenario():
+        async with asgi_client() as client:
+            everything = await client.get("/tasks/", headers=headers, params={"stream": True})
+            limited = await client.get("/tasks/", headers=headers, params={"stream": True, "limit": 7})
+            return everything.text.splitlines(), limited.text.splitlines()
+
+    everything, limited = run(scenario)
+    assert len(everything) == 30
+    assert limited == everything[:7]
+
+
+def test_invalid_cursor_is_rejected(app_db, run, asgi_client):
+    _, headers = app_db
+
+    async def scenario():
+        async with asgi_client() as client:
+            return await client.get("/tasks/", headers=headers, params={"cursor": "not-a-cursor"})
+
+    assert run(scenario).status_code == 400
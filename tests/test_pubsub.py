@@ -0,0 +1,86 @@
+import asyncio
+import errno
+import json
+import logging
+import os
+
+import pubsub
+
+
+def brokers(directory):
+    '''Two unix brokers in one process, standing in for two workers'''
+    first, second = pubsub.UnixSocketBroker(str(directory)), pubsub.UnixSocketBroker(str(directory))
+    first.path, second.path = os.path.join(str(directory), "1.sock"), os.path.join(str(directory), "2.sock")
+    return first, second
+
+
+def event(seq):
+    return json.dumps({"type": "task_updated", "seq": seq})
+
+
+def test_peers_get_events_and_resync_after_a_gap(tmp_path):
+    async def scenario():
+        sender, receiver = brokers(tmp_path)
+        received, invalidated = [], []
+        receiver.set_handler(lambda text, user_id: received.append((user_id, json.loads(text)["type"])))
+        receiver.on_remote(invalidated.append)
+        await sender.start()
+        await receiver.start()
+        try:
+            sender.publish(event(1), 7, seq=1, previous_seq=0)
+            sender.publish(event(2), 7, seq=2, previous_seq=1)
+            # seq 3 never reaches the receiver
+            sender.publish(event(4), 7, seq=4, previous_seq=3)
+            sender.publish(event(1), 8, seq=1, previous_seq=0)
+            await asyncio.sleep(0.05)
+        finally:
+            await sender.stop()
+            await receiver.stop()
+        return received, invalidated, receiver.gaps
+
+    received, invalidated, gaps = asyncio.run(scenario())
+    assert received == [(7, "task_updated"), (7, "task_updated"), (7, "resync_required"), (8, "task_updated")]
+    assert invalidated == [7, 7, 7, 8]
+    assert gaps == 1
+
+
+def test_own_events_count_as_seen(tmp_path):
+    async def scenario():
+        first, second = brokers(tmp_path)
+        received = []
+        second.set_handler(lambda text, user_id: received.append(json.loads(text)["type"]))
+        await first.start()
+        await second.start()
+        try:
+            first.publish(event(1), 7, seq=1, previous_seq=0)
+            await asyncio.sleep(0.02)
+            # Worker two writes seq 2 itself, then worker one follows on from it
+            second.publish(event(2), 7, seq=2, previous_seq=1)
+            first.publish(event(3), 7, seq=3, previous_seq=2)
+            await asyncio.sleep(0.02)
+        finally:
+            await first.stop()
+            await second.stop()
+        return received
+
+    assert asyncio.run(scenario()) == ["task_updated", "task_updated", "task_updated"]
+
+
+def test_dropped_datagrams_are_logged(tmp_path, monkeypatch, caplog):
+    class FullSocket:
+        def sendto(self, datagram, peer):
+            raise BlockingIOError(errno.EAGAIN, "Resource temporarily unavailable")
+
+    async def scenario():
+        sender, receiver = brokers(tmp_path)
+        await receiver.start()
+        try:
+            monkeypatch.setattr(sender, "_send_sock", FullSocket())
+            with caplog.at_level(logging.WARNING, logger="task_manager.pubsub"):
+                sender.publish(event(1), 7, seq=1, previous_seq=0)
+        finally:
+            await receiver.stop()
+        return sender.send_errors
+
+    assert asyncio.run(scenario()) == 1
+    assert "Dropped event for user 7" in caplog.text
@@ -0,0 +1,55 @@
+"""Query plans: every statement the API and its change log issue must use an index"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+import crud
+import events
+import models
+
+SAMPLE_CURSOR = crud.encode_cursor(models.Task(id=1, created_at=datetime(2024, 1, 1)))
+SAMPLE_IDS = [1, 2, 3]
+PAGE = crud.DEFAULT_PAGE_SIZE + 1
+
+# (description, function building the statement the API issues). Every entry calls the
+# builder the code itself executes, so a query changed there is checked here as well.
+QUERIES = [
+    ("user by username", lambda db: crud.user_by_username_stmt("alice")),
+    ("task by id", lambda db: crud.task_stmt(1, 1)),
+    ("all tasks (initial_tasks)", lambda db: crud.all_tasks_stmt(1)),
+    ("task page", lambda db: crud.filter_tasks_stmt(1).limit(PAGE)),
+    ("task page after cursor", lambda db: crud.filter_tasks_stmt(1, cursor=SAMPLE_CURSOR).limit(PAGE)),
+    ("task page by completed", lambda db: crud.filter_tasks_stmt(1, completed=False).limit(PAGE)),
+    ("task page by completed after cursor", lambda db: crud.filter_tasks_stmt(1, completed=True, cursor=SAMPLE_CURSOR).limit(PAGE)),
+    ("task page by created range", lambda db: crud.filter_tasks_stmt(1, created_after=datetime(2024, 1, 1), created_before=datetime(2025, 1, 1)).limit(PAGE)),
+    ("task page by title prefix", lambda db: crud.filter_tasks_stmt(1, title_prefix="abc").limit(PAGE)),
+    ("batch owned ids", lambda db: crud.owned_task_ids_stmt(1, SAMPLE_IDS)),
+    ("batch update", lambda db: crud.update_tasks_stmt(1, SAMPLE_IDS, {"completed": True})),
+    ("batch delete", lambda db: crud.delete_tasks_stmt(1, SAMPLE_IDS)),
+    ("tasks by ids (batch reload, changed tasks)", lambda db: crud.tasks_by_ids_stmt(1, SAMPLE_IDS)),
+    ("latest change seq", lambda db: crud.latest_seq_stmt(1)),
+    ("change log bounds", lambda db: crud.change_log_bounds_stmt(1)),
+    ("changes since seq", lambda db: crud.changes_since_stmt(1, 10)),
+    ("change log trim", lambda db: crud.trim_change_log_stmt(1)),
+    ("event latest seq per owner", lambda db: crud.latest_seqs_stmt([1, 2])),
+    ("event bulk update targets", lambda db: events.targets_stmt(crud.update_tasks_stmt(1, SAMPLE_IDS, {"completed": True}))),
+    ("event bulk delete targets", lambda db: events.targets_stmt(crud.delete_tasks_stmt(1, SAMPLE_IDS))),
+    ("event task reload", lambda db: events.reload_stmt(SAMPLE_IDS)),
+]
+
+BAD_PLAN_STEPS = ("SCAN", "USE TEMP B-TREE")
+
+
+def explain(db, query):
+    '''Return the EXPLAIN QUERY PLAN detail lines for a statement'''
+    compiled = query.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("build_query", [build for _, build in QUERIES], ids=[name for name, _ in QUERIES])
+def test_query_uses_an_index(engine, build_query):
+    with Session(engine) as db:
+        plan = explain(db, build_query(db))
+    assert not [step for step in plan if step.startswith(BAD_PLAN_STEPS)], plan
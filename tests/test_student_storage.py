@@ -0,0 +1,76 @@
+import pytest
+
+import student_storage
+from student_storage import JournalStorage, SnapshotIndex
+
+
+def records(count):
+    return {f"STU{i:08d}": {"student_id": f"STU{i:08d}", "name": f"Student {i} é", "age": 20,
+                            "grade": 90.0, "department": "CS", "email": "e", "phone": "p",
+                            "enrollment_date": "2024-01-01 00:00:00"}
+            for i in range(count)}
+
+
+def test_snapshot_offsets_match_the_bytes_written(tmp_path):
+    data_file = str(tmp_path / "students.json")
+    storage = JournalStorage(data_file)
+    storage.meta = {"next_student_id": 42}
+    storage.compact(records(50))
+    storage.close()
+
+    with open(data_file, "rb") as file:
+        assert b"\r\n" not in file.read()
+    snapshot = SnapshotIndex.open(data_file, data_file + ".idx")
+    try:
+        assert snapshot.meta == {"next_student_id": 42}
+        assert [snapshot.record(position) for position in range(len(snapshot))] == list(records(50).values())
+    finally:
+        snapshot.close()
+
+
+def test_rescanned_index_matches_the_saved_one(tmp_path):
+    data_file = str(tmp_path / "students.json")
+    storage = JournalStorage(data_file)
+    storage.compact(records(20))
+    storage.close()
+    saved = SnapshotIndex.open(data_file, data_file + ".idx")
+    rescanned = SnapshotIndex.open(data_file, str(tmp_path / "missing.idx"))
+    try:
+        assert (saved.ids, saved.starts, saved.ends) == (rescanned.ids, rescanned.starts, rescanned.ends)
+    finally:
+        saved.close()
+        rescanned.close()
+
+
+class FakeMsvcrt:
+    LK_LOCK, LK_UNLCK = 1, 0
+
+    def __init__(self):
+        self.calls = []
+        self.busy = 0
+
+    def locking(self, fd, mode, nbytes):
+        if mode == self.LK_LOCK and self.busy:
+            self.busy -= 1
+            raise OSError("locked by another process")
+        self.calls.append((mode, nbytes))
+
+
+def test_file_lock_uses_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    fake = FakeMsvcrt()
+    fake.busy = 2
+    monkeypatch.setattr(student_storage, "fcntl", None)
+    monkeypatch.setattr(student_storage, "msvcrt", fake)
+    lock = student_storage.FileLock(str(tmp_path / "students.json.lock"))
+    with lock:
+        with lock:
+            assert fake.calls == [(fake.LK_LOCK, 1)]
+    lock.close()
+    assert fake.calls == [(fake.LK_LOCK, 1), (fake.LK_UNLCK, 1)]
+
+
+def test_file_lock_refuses_to_run_unlocked(tmp_path, monkeypatch):
+    monkeypatch.setattr(student_storage, "fcntl", None)
+    monkeypatch.setattr(student_storage, "msvcrt", None)
+    with pytest.raises(RuntimeError):
+        student_storage.FileLock(str(tmp_path / "students.json.lock"))
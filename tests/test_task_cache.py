@@ -0,0 +1,68 @@
+import events, main, models
+
+
+def test_unchanged_list_gets_304(app_db, run, asgi_client):
+    _, headers = app_db
+
+    async def scenario():
+        async with asgi_client() as client:
+            await client.post("/tasks/", headers=headers, json={"title": "one"})
+            first = await client.get("/tasks/", headers=headers)
+            again = await client.get("/tasks/", headers={**headers, "If-None-Match": first.headers["ETag"]})
+            return first, again
+
+    first, again = run(scenario)
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert again.content == b""
+
+
+def test_write_changes_the_etag(app_db, run, asgi_client):
+    _, headers = app_db
+
+    async def scenario():
+        async with asgi_client() as client:
+            task = (await client.post("/tasks/", headers=headers, json={"title": "one"})).json()
+            first = await client.get("/tasks/", headers=headers)
+            single = await client.get(f"/tasks/{task['id']}", headers=headers)
+            await client.put(f"/tasks/{task['id']}", headers=headers, json={"completed": True})
+            after = await client.get("/tasks/", headers={**headers, "If-None-Match": first.headers["ETag"]})
+            single_after = await client.get(f"/tasks/{task['id']}",
+                                            headers={**headers, "If-None-Match": single.headers["ETag"]})
+            return first, after, single_after
+
+    first, after, single_after = run(scenario)
+    assert after.status_code == 200
+    assert after.headers["ETag"] != first.headers["ETag"]
+    assert after.json()[0]["completed"] is True
+    assert single_after.status_code == 200
+    assert single_after.json()["completed"] is True
+
+
+def test_lost_invalidation_is_caught_by_the_change_log_seq(app_db, run, monkeypatch, asgi_client):
+    session_factory, headers = app_db
+    monkeypatch.setattr(main.manager.broker, "cross_process", True)
+
+    async def scenario():
+        async with asgi_client() as client:
+            task = (await client.post("/tasks/", headers=headers, json={"title": "one"})).json()
+            first = await client.get("/tasks/", headers=headers)
+            await client.get(f"/tasks/{task['id']}", headers=headers)
+
+            # Another worker updates the task and its invalidation never arrives here
+            with monkeypatch.context() as patch:
+                patch.setattr(events.bus, "inline", [])
+                patch.setattr(events.bus, "deferred", [])
+                with session_factory() as db:
+                    db.get(models.Task, task["id"]).title = "renamed"
+                    db.commit()
+
+            listed = await client.get("/tasks/", headers={**headers, "If-None-Match": first.headers["ETag"]})
+            single = await client.get(f"/tasks/{task['id']}", headers=headers)
+            return listed, single
+
+    listed, single = run(scenario)
+    assert listed.status_code == 200
+    assert listed.json()[0]["title"] == "renamed"
+    assert single.json()["title"] == "renamed"
@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import crud
+from connection_manager import SocketSender
+
+
+def token(headers):
+    return headers["Authorization"].split()[1]
+
+
+async def receive(ws):
+    return json.loads(await asyncio.wait_for(ws.receive_text(), timeout=5))
+
+
+def test_snapshot_then_live_events(app_db, run, asgi_client, asgi_websocket):
+    _, headers = app_db
+
+    async def scenario():
+        async with asgi_client() as client:
+            await client.post("/tasks/", headers=headers, json={"title": "before"})
+            async with asgi_websocket("/ws", f"token={token(headers)}") as ws:
+                snapshot = await receive(ws)
+                await client.post("/tasks/", headers=headers, json={"title": "after"})
+                return snapshot, await receive(ws)
+
+    snapshot, live = run(scenario)
+    assert snapshot["type"] == "initial_tasks"
+    assert [task["title"] for task in snapshot["tasks"]] == ["before"]
+    assert live["type"] == "task_created"
+    assert live["task"]["title"] == "after"
+    assert live["seq"] > snapshot["seq"]
+
+
+def test_reconnect_resyncs_from_the_change_log(app_db, run, asgi_client, asgi_websocket):
+    _, headers = app_db
+
+    async def scenario():
+        async with asgi_client() as client:
+            kept = (await client.post("/tasks/", headers=headers, json={"title": "kept"})).json()
+            async with asgi_websocket("/ws", f"token={token(headers)}") as ws:
+                seen = (await receive(ws))["seq"]
+            # Missed while disconnected
+            await client.put(f"/tasks/{kept['id']}", headers=headers, json={"completed": True})
+            added = (await client.post("/tasks/", headers=headers, json={"title": "added"})).json()
+            gone = (await client.post("/tasks/", headers=headers, json={"title": "gone"})).json()
+            await client.delete(f"/tasks/{gone['id']}", headers=headers)
+            async with asgi_websocket("/ws", f"token={token(headers)}&since={seen}") as ws:
+                return kept, added, gone, await receive(ws)
+
+    kept, added, gone, changes = run(scenario)
+    assert changes["type"] == "changes"
+    assert {task["id"]: task["completed"] for task in changes["tasks"]} == {kept["id"]: True, added["id"]: False}
+    assert changes["deleted"] == [gone["id"]]
+
+
+def test_reconnect_past_the_retained_log_gets_a_snapshot(app_db, run, monkeypatch, asgi_client, asgi_websocket):
+    _, headers = app_db
+    monkeypatch.setattr(crud, "CHANGE_LOG_SIZE", 3)
+
+    async def scenario():
+        async with asgi_client() as client:
+            for i in range(6):
+                await client.post("/tasks/", headers=headers, json={"title": f"task {i}"})
+            async with asgi_websocket("/ws", f"token={token(headers)}&since=1") as ws:
+                return await receive(ws)
+
+    message = run(scenario)
+    assert message["type"] == "initial_tasks"
+    assert len(message["tasks"]) == 6
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code):
+        pass
+
+
+def test_events_held_during_the_snapshot_are_not_sent_twice():
+    async def scenario():
+        websocket = RecordingSocket()
+        sender = SocketSender(websocket)
+        sender.start()
+        # Live events that arrive while the snapshot is read, some already in it
+        for seq in (4, 5, 6):
+            sender.offer(json.dumps({"type": "task_updated", "seq": seq}))
+        await asyncio.sleep(0)
+        assert websocket.sent == []
+        sender.release(json.dumps({"type": "initial_tasks", "seq": 5, "tasks": []}), 5)
+        await asyncio.sleep(0.01)
+        sender.stop()
+        return [json.loads(text)["seq"] for text in websocket.sent]
+
+    assert asyncio.run(scenario()) == [5, 6]
+
+
+class StalledSocket(RecordingSocket):
+    closed_with = None
+
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+    async def close(self, code):
+        self.closed_with = code
+
+
+def test_disconnect_policy_closes_and_unregisters_the_socket():
+    async def scenario():
+        websocket = StalledSocket()
+        unregistered = []
+        sender = SocketSender(websocket, queue_size=1, policy="disconnect", on_close=lambda: unregistered.append(True))
+        sender.start()
+        sender.release("snapshot")
+        await asyncio.sleep(0)  # the writer takes the snapshot and stalls on it
+        sender.offer("one")
+        assert sender.offer("two") is False
+        assert sender._closing is not None
+        await asyncio.sleep(0.01)
+        return websocket.closed_with, unregistered, sender._closing
+
+    assert asyncio.run(scenario()) == (1013, [True], None)